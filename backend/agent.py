@@ -1,8 +1,18 @@
 import google.generativeai as genai
-from model import Profile, CareerRecommendationsResponse, CareerKeywordsResponse, HexacoScores, HollandScores
+from model import Profile, CareerRecommendation, CareerRecommendationsResponse, CareerKeywordsResponse, HexacoScores, HollandScores
+from json_stream import JsonArrayStream
 import json
 import random
-from setup import model
+from llm_client import llm_client, CircuitOpenError
+from career_catalog import career_catalog, HOLLAND_WEIGHT, HEXACO_WEIGHT
+from local_extractor import local_extractor, LOCAL_PROFILE_EXTRACTION
+from prompt_budget import PromptBuilder, compact_profile, QUESTION_PROMPT_TOKEN_BUDGET
+from telemetry import span, traced
+
+# How many locally ranked catalog careers the recommendations prompt offers
+RECOMMENDATION_CANDIDATES = 8
+# Catalog careers returned when recommendations cannot be generated by the model
+RECOMMENDATION_FALLBACK_COUNT = 5
 
 
 class DynamicCareerGuidanceAgent:
@@ -44,10 +54,47 @@ After every user response:
 Your ultimate goal is to gather enough context to create an accurate `user_profile` for personalized, research-backed career recommendations.
 """
 
-    def generate_question(self, conversation_history: list, hexaco_scores: HexacoScores = None, holland_scores: HollandScores = None) -> str:
+    @traced
+    async def generate_question(self, conversation_history: list, hexaco_scores: HexacoScores = None, holland_scores: HollandScores = None) -> str:
         """Generate a dynamic question based on conversation history using Gemini"""
         try:
-            prompt_parts = [self.system_prompt,
+            prompt = self._build_question_prompt(conversation_history, hexaco_scores, holland_scores)
+            response = await llm_client.generate(prompt)
+            return self._clean_question(response.text)
+
+        except Exception as e:
+            print("Error generating question:", e)
+            return self._fallback_question()
+
+    @traced
+    async def stream_question(self, conversation_history: list, hexaco_scores: HexacoScores = None, holland_scores: HollandScores = None):
+        """Stream the next question as it is generated.
+
+        Yields ("token", text) for each chunk and finally ("question", question)
+        with the same cleaned text generate_question would have returned. If
+        generation fails after tokens have gone out, ("reset", None) comes
+        before the fallback question so the client can discard them.
+        """
+        text = ""
+        sent_tokens = False
+        try:
+            prompt = self._build_question_prompt(conversation_history, hexaco_scores, holland_scores)
+            async for chunk in llm_client.stream(prompt):
+                text += chunk
+                sent_tokens = True
+                yield "token", chunk.replace('"', '').replace("'", "")
+            question = self._clean_question(text)
+            if not question:
+                raise ValueError("Empty question from Gemini")
+        except Exception as e:
+            print("Error generating question:", e)
+            if sent_tokens:
+                yield "reset", None
+            question = self._fallback_question()
+        yield "question", question
+
+    def _build_question_prompt(self, conversation_history: list, hexaco_scores: HexacoScores = None, holland_scores: HollandScores = None) -> str:
+        prompt = PromptBuilder("question", QUESTION_PROMPT_TOKEN_BUDGET).add(self.system_prompt,
     "You are a warm, engaging career guidance expert continuing a conversation to understand the user's background and preferences.",
     "",
     "Your task: Generate ONE thoughtful, open-ended question to help gather or refine the user's profile.",
@@ -62,64 +109,73 @@ Your ultimate goal is to gather enough context to create an accurate `user_profi
     "",
     "",
     "### Conversation so far:",
-]
-            
-            # Add relevant conversation context (last 3-4 exchanges)
-            recent_history = conversation_history[-6:] if len(conversation_history) > 6 else conversation_history
-            for item in recent_history:
-                if isinstance(item, dict):
-                    role = item.get("role", "")
-                    parts = item.get("parts", [])
-                    if parts:
-                        if role == "assistant":
-                            prompt_parts.append(f"You asked: {parts[0]}")
-                        elif role == "user":
-                            # Truncate long responses for context
-                            response = parts[0][:100] + "..." if len(parts[0]) > 100 else parts[0]
-                            prompt_parts.append(f"User responded: {response}")
-            
-            # Add personality assessment information if available (for context-aware questions)
-            context_info = []
-            if hexaco_scores:
-                context_info.append("User has completed HEXACO personality assessment")
-            if holland_scores:
-                context_info.append("User has completed Holland RIASEC career interest assessment")
-            
-            if context_info:
-                prompt_parts.append("")
-                prompt_parts.append("Additional context: " + ", ".join(context_info))
-            
-            prompt_parts.append("")
-            prompt_parts.append("Generate ONLY the question, nothing else. No explanations, no prefixes. Just the question:")
-            
-            prompt = "\n".join(prompt_parts)
-            response = model.generate_content(prompt)
-            question = response.text.strip()
-            
-            # Clean up the question (remove quotes, prefixes like "Question:" etc.)
-            question = question.replace('"', '').replace("'", "")
-            if question.lower().startswith("question:"):
-                question = question[9:].strip()
-            if question.lower().startswith("here's a question:"):
-                question = question[17:].strip()
-            
-            return question
-
-        except Exception as e:
-            # Fallback questions if API call fails - all open-ended and simple
-            fallback_questions = [
-                "Tell me about your current education level and what you're studying.",
-                "What subjects or topics do you find most interesting?",
-                "What activities do you enjoy doing in your free time?",
-                "What skills do you think you're naturally good at?",
-                "Describe the kind of work environment where you feel most comfortable.",
-                "What matters most to you when thinking about a future career?",
-                "What are some career goals you've been thinking about?"
-            ]
-            return random.choice(fallback_questions)
-
-    def extract_profile_info(self,question:str, response: str):
-        """Extract key information from user response to build profile"""
+)
+        
+        # Summary of older turns plus as many recent exchanges as the budget allows
+        prompt.add_history(conversation_history, self._render_question_turn)
+        
+        # Add personality assessment information if available (for context-aware questions)
+        context_info = []
+        if hexaco_scores:
+            context_info.append("User has completed HEXACO personality assessment")
+        if holland_scores:
+            context_info.append("User has completed Holland RIASEC career interest assessment")
+        
+        if context_info:
+            prompt.add("", "Additional context: " + ", ".join(context_info))
+        
+        prompt.add("", "Generate ONLY the question, nothing else. No explanations, no prefixes. Just the question:")
+        
+        return prompt.build()
+
+    @staticmethod
+    def _render_question_turn(role: str, text: str) -> str | None:
+        if role == "assistant":
+            return f"You asked: {text}"
+        if role == "user":
+            return f"User responded: {text}"
+        return None
+
+    def _clean_question(self, text: str) -> str:
+        question = text.strip()
+        
+        # Clean up the question (remove quotes, prefixes like "Question:" etc.)
+        question = question.replace('"', '').replace("'", "")
+        if question.lower().startswith("question:"):
+            question = question[9:].strip()
+        if question.lower().startswith("here's a question:"):
+            question = question[17:].strip()
+        
+        return question
+
+    def _fallback_question(self) -> str:
+        # Fallback questions if API call fails - all open-ended and simple
+        fallback_questions = [
+            "Tell me about your current education level and what you're studying.",
+            "What subjects or topics do you find most interesting?",
+            "What activities do you enjoy doing in your free time?",
+            "What skills do you think you're naturally good at?",
+            "Describe the kind of work environment where you feel most comfortable.",
+            "What matters most to you when thinking about a future career?",
+            "What are some career goals you've been thinking about?"
+        ]
+        return random.choice(fallback_questions)
+
+    @traced
+    async def extract_profile_info(self,question:str, response: str, fallback: bool = True):
+        """Extract key information from user response to build profile.
+
+        With fallback=False model errors (including an open circuit and
+        unparseable output) are raised instead of returning None or the
+        best-effort local result, so the extraction queue can retry.
+        """
+        # Short answers the rules fully understand skip the model call
+        if LOCAL_PROFILE_EXTRACTION:
+            extracted_data = local_extractor.extract(question, response)
+            if extracted_data is not None:
+                print(f"Extracted profile locally: {extracted_data}")
+                return extracted_data
+        
         try:
             prompt = f"""
             Extract key information from this user response for career guidance purposes:
@@ -156,7 +212,7 @@ Your ultimate goal is to gather enough context to create an accurate `user_profi
                 "required": []
             }
             
-            result = model.generate_content(
+            result = await llm_client.generate(
                 prompt,
                 generation_config=genai.GenerationConfig(
                 response_mime_type="application/json",
@@ -165,7 +221,8 @@ Your ultimate goal is to gather enough context to create an accurate `user_profi
 
             # Try to parse JSON from response
             try:
-                extracted_data = json.loads(result.text)
+                with span("parse", "profile"):
+                    extracted_data = json.loads(result.text)
                 
                 # Ensure all fields have proper defaults if missing
                 if "interests" not in extracted_data:
@@ -184,10 +241,13 @@ Your ultimate goal is to gather enough context to create an accurate `user_profi
                     extracted_data["experience_level"] = ""
                 
                 # Validate against Profile model
-                profile = Profile(**extracted_data)
+                with span("validate", "profile"):
+                    profile = Profile(**extracted_data)
                 print(f"Extracted profile: {extracted_data}")
                 return extracted_data
             except json.JSONDecodeError:
+                if not fallback:
+                    raise
                 # If JSON parsing fails, use keyword matching as fallback
                 print("JSON parsing failed. Using keyword matching.")
                 return None
@@ -196,10 +256,19 @@ Your ultimate goal is to gather enough context to create an accurate `user_profi
                 # Return the extracted data anyway, even if validation fails
                 return extracted_data
 
+        except CircuitOpenError as e:
+            if not fallback:
+                raise
+            # Keep whatever the rules can find rather than dropping the answer
+            print("Error extracting profile information:", e)
+            return local_extractor.extract(question, response, best_effort=True)
         except Exception as e:
-          print("Error extracting profile information:", e)
+            if not fallback:
+                raise
+            print("Error extracting profile information:", e)
 
-    def extract_career_keywords(self, user_profile: dict):
+    @traced
+    async def extract_career_keywords(self, user_profile: dict):
         """Use Gemini to map profile into concrete career/skill keywords for trend analysis"""
         try:
             prompt = f"""
@@ -208,93 +277,151 @@ Your ultimate goal is to gather enough context to create an accurate `user_profi
             Return only a JSON array of career keywords.
 
             User Profile:
-            {json.dumps(user_profile, indent=2)}
+            {compact_profile(user_profile) or "{}"}
             """
 
-            response = model.generate_content(
+            response = await llm_client.generate(
                 prompt,
                 generation_config=genai.GenerationConfig(
                 response_mime_type="application/json",
                 response_schema=CareerKeywordsResponse))
             print(response.text)
-            return json.loads(response.text)
+            with span("parse", "career_keywords"):
+                return json.loads(response.text)
 
         except Exception as e:
             print("Error extracting career keywords:", e)
             return []
 
-    def generate_recommendations(self, user_profile: dict, hexaco_scores: HexacoScores = None, holland_scores: HollandScores = None) -> CareerRecommendationsResponse:
-        """Generate career recommendations based on the user profile and personality assessments"""
+    @traced
+    async def generate_recommendations(self, user_profile: dict, hexaco_scores: HexacoScores = None, holland_scores: HollandScores = None, fallback: bool = True) -> CareerRecommendationsResponse:
+        """Generate career recommendations based on the user profile and personality assessments.
+
+        With fallback=False errors are raised instead of returning the fallback
+        response, so callers can retry.
+        """
         try:
             print(f"User Profile: {user_profile}")
             print(f"HEXACO scores: {hexaco_scores}")
             print(f"Holland RIASEC scores: {holland_scores}")
             
-            # Calculate influence breakdown
-            influence_breakdown = {}
-            available_inputs = 0
+            prompt, generation_config, influence_breakdown = self._build_recommendations_request(user_profile, hexaco_scores, holland_scores)
+            response = await llm_client.generate(prompt, generation_config=generation_config)
+            if response is None or response.text is None:
+                raise Exception("No response from Gemini")
+            recommendations = self._parse_recommendations(response.text, influence_breakdown)
+
+            print(recommendations)
+
+            return recommendations
+        
+        except Exception as e:
+            if not fallback:
+                raise
+            return self.recommendations_fallback(e, hexaco_scores, holland_scores)
+
+    @traced
+    async def stream_recommendations(self, user_profile: dict, hexaco_scores: HexacoScores = None, holland_scores: HollandScores = None):
+        """Stream career recommendations as the model produces them.
+
+        Yields ("recommendation", CareerRecommendation) as soon as each array item
+        is complete, then ("done", CareerRecommendationsResponse) parsed from the
+        full text exactly as generate_recommendations would, or ("fallback",
+        CareerRecommendationsResponse) if generation failed.
+        """
+        try:
+            prompt, generation_config, influence_breakdown = self._build_recommendations_request(user_profile, hexaco_scores, holland_scores)
+            parser = JsonArrayStream(["recommendations"])
+            async for chunk in llm_client.stream(prompt, generation_config=generation_config):
+                for _, item in parser.feed(chunk):
+                    try:
+                        yield "recommendation", CareerRecommendation(**item)
+                    except Exception as validation_error:
+                        print(f"Skipping invalid streamed recommendation: {validation_error}")
+            if not parser.text:
+                raise Exception("No response from Gemini")
+            recommendations = self._parse_recommendations(parser.text, influence_breakdown)
+        except Exception as e:
+            yield "fallback", self.recommendations_fallback(e, hexaco_scores, holland_scores)
+            return
+        yield "done", recommendations
+
+    def _build_recommendations_request(self, user_profile: dict, hexaco_scores: HexacoScores = None, holland_scores: HollandScores = None):
+        """Returns (prompt, generation_config, influence_breakdown)"""
+        # Calculate influence breakdown
+        influence_breakdown = {}
+        available_inputs = 0
+        
+        if hexaco_scores:
+            available_inputs += 1
+        if holland_scores:
+            available_inputs += 1
+        if user_profile and any(user_profile.values()):
+            available_inputs += 1
             
-            if hexaco_scores:
-                available_inputs += 1
-            if holland_scores:
-                available_inputs += 1
-            if user_profile and any(user_profile.values()):
-                available_inputs += 1
-                
-            # Distribute weights based on available inputs
-            if available_inputs == 3:
+        # Distribute weights based on available inputs
+        if available_inputs == 3:
+            influence_breakdown = {
+                "HEXACO": 25.0,
+                "Holland": 35.0,
+                "Interests": 40.0
+            }
+        elif available_inputs == 2:
+            if not hexaco_scores:
                 influence_breakdown = {
-                    "HEXACO": 25.0,
-                    "Holland": 35.0,
-                    "Interests": 40.0
+                    "Holland": 50.0,
+                    "Interests": 50.0
                 }
-            elif available_inputs == 2:
-                if not hexaco_scores:
-                    influence_breakdown = {
-                        "Holland": 50.0,
-                        "Interests": 50.0
-                    }
-                elif not holland_scores:
-                    influence_breakdown = {
-                        "HEXACO": 50.0,
-                        "Interests": 50.0
-                    }
-                else:
-                    influence_breakdown = {
-                        "HEXACO": 50.0,
-                        "Holland": 50.0
-                    }
-            elif available_inputs == 1:
-                if hexaco_scores:
-                    influence_breakdown = {"HEXACO": 100.0}
-                elif holland_scores:
-                    influence_breakdown = {"Holland": 100.0}
-                else:
-                    influence_breakdown = {"Interests": 100.0}
-            
-            # Build the prompt based on available assessment data
-            assessments = ""
+            elif not holland_scores:
+                influence_breakdown = {
+                    "HEXACO": 50.0,
+                    "Interests": 50.0
+                }
+            else:
+                influence_breakdown = {
+                    "HEXACO": 50.0,
+                    "Holland": 50.0
+                }
+        elif available_inputs == 1:
             if hexaco_scores:
-                assessments += "HEXACO Personality Assessment:\n" + hexaco_scores.model_dump_json()
-            if holland_scores:
-                if assessments:
-                    assessments += "\n"
-                assessments += "Holland RIASEC Career Interests:\n" + holland_scores.model_dump_json()
-
-            prompt = f"""
+                influence_breakdown = {"HEXACO": 100.0}
+            elif holland_scores:
+                influence_breakdown = {"Holland": 100.0}
+            else:
+                influence_breakdown = {"Interests": 100.0}
+        
+        # Build the prompt based on available assessment data
+        assessments = ""
+        if hexaco_scores:
+            assessments += "HEXACO Personality Assessment:\n" + hexaco_scores.model_dump_json()
+        if holland_scores:
+            if assessments:
+                assessments += "\n"
+            assessments += "Holland RIASEC Career Interests:\n" + holland_scores.model_dump_json()
+
+        # Rank the occupation catalog locally so the model picks from real, scored options
+        candidates = ""
+        matches = career_catalog.match(holland_scores, hexaco_scores, RECOMMENDATION_CANDIDATES)
+        if matches:
+            candidates = "\n### Best-Fitting Careers (ranked by assessment fit, 1.0 = perfect match):\n" + "\n".join(
+                f"{rank}. {match.title} ({match.holland_code}, fit {match.score:.2f})"
+                for rank, match in enumerate(matches, start=1)
+            ) + "\n"
+
+        prompt = f"""
 You are a highly analytical yet empathetic Career Advisor AI that recommends suitable career paths based on user data, personality assessments, and market trends.
 
 Use the following structured information to reason:
 
 ### User Profile:
-{json.dumps(user_profile, indent=2)}
+{compact_profile(user_profile) or "{}"}
 
 ### Influence Breakdown (relative importance of factors):
 {json.dumps(influence_breakdown, indent=2)}
 
 ### Assessments:
 {assessments}
-
+{candidates}
 ---
 
 ### Your Task:
@@ -305,61 +432,81 @@ Suggest **3–5 personalized career paths** that:
 4. **Reflect realistic and in-demand opportunities**
 
 Ensure recommendations are **holistic, personalized, and backed by clear reasoning** connecting the user's psychological and practical profile.
+{"Prefer careers from the Best-Fitting Careers list unless the user profile clearly points elsewhere." if candidates else ""}
 """
         
-            # Define JSON schema manually to avoid issues with Dict types (influence_breakdown)
-            recommendations_schema = {
-                "type": "object",
-                "properties": {
-                    "recommendations": {
-                        "type": "array",
-                        "items": {
-                            "type": "object",
-                            "properties": {
-                                "career_name": {"type": "string"},
-                                "fit_explanation": {"type": "string"},
-                                "required_skills_education": {"type": "string"},
-                                "potential_growth": {"type": "string"}
-                            },
-                            "required": ["career_name", "fit_explanation", "required_skills_education", "potential_growth"]
-                        }
-                    },
-                    "additional_advice": {"type": "string"}
+        # Define JSON schema manually to avoid issues with Dict types (influence_breakdown)
+        recommendations_schema = {
+            "type": "object",
+            "properties": {
+                "recommendations": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "career_name": {"type": "string"},
+                            "fit_explanation": {"type": "string"},
+                            "required_skills_education": {"type": "string"},
+                            "potential_growth": {"type": "string"}
+                        },
+                        "required": ["career_name", "fit_explanation", "required_skills_education", "potential_growth"]
+                    }
                 },
-                "required": ["recommendations", "additional_advice"]
-            }
+                "additional_advice": {"type": "string"}
+            },
+            "required": ["recommendations", "additional_advice"]
+        }
         
-            response = model.generate_content(
-                prompt,
-                generation_config=genai.GenerationConfig(
-                    response_mime_type="application/json",
-                    response_schema=recommendations_schema)
-            )
-            if response is None or response.text is None:
-                raise Exception("No response from Gemini")
-            elif not response.text.startswith('{') or not response.text.endswith('}'):
-                raise Exception("Invalid JSON response from Gemini")
-            else:
-                recommendations_dict = json.loads(response.text)
-                recommendations_dict["influence_breakdown"] = influence_breakdown
-                recommendations = CareerRecommendationsResponse(**recommendations_dict)
-
-            print(recommendations)
-
-            return recommendations
+        generation_config = genai.GenerationConfig(
+            response_mime_type="application/json",
+            response_schema=recommendations_schema)
+        return prompt, generation_config, influence_breakdown
+
+    def _parse_recommendations(self, text: str, influence_breakdown: dict) -> CareerRecommendationsResponse:
+        if not text.startswith('{') or not text.endswith('}'):
+            raise Exception("Invalid JSON response from Gemini")
+        with span("parse", "recommendations"):
+            recommendations_dict = json.loads(text)
+        recommendations_dict["influence_breakdown"] = influence_breakdown
+        with span("validate", "recommendations"):
+            return CareerRecommendationsResponse(**recommendations_dict)
+
+    def recommendations_fallback(self, e: Exception, hexaco_scores: HexacoScores = None, holland_scores: HollandScores = None) -> CareerRecommendationsResponse:
+        if "No response from Gemini" in str(e):
+            print("Gemini did not return any response")
+        elif "Invalid JSON response from Gemini" in str(e):
+            print("Gemini returned an invalid JSON response")
+        else:
+            print("An error occurred:", e)
         
-        except Exception as e:
-            if "No response from Gemini" in str(e):
-                print("Gemini did not return any response")
-            elif "Invalid JSON response from Gemini" in str(e):
-                print("Gemini returned an invalid JSON response")
-            else:
-                print("An error occurred:", e)
+        # Without the model, fall back to the locally ranked catalog careers
+        matches = career_catalog.match(holland_scores, hexaco_scores, RECOMMENDATION_FALLBACK_COUNT)
+        if matches:
+            influence_breakdown = {}
+            if holland_scores and matches[0].holland_fit is not None:
+                influence_breakdown["Holland"] = HOLLAND_WEIGHT
+            if hexaco_scores and matches[0].hexaco_fit is not None:
+                influence_breakdown["HEXACO"] = HEXACO_WEIGHT
+            total = sum(influence_breakdown.values())
             return CareerRecommendationsResponse(
-                recommendations=[], 
-                additional_advice="I apologize, but I'm having trouble generating recommendations at the moment. Please try again later.",
-                influence_breakdown={}
+                recommendations=[
+                    CareerRecommendation(
+                        career_name=match.title,
+                        fit_explanation=f"Your assessment results closely match the typical {match.holland_code} interest profile of this occupation (fit {match.score:.2f}).",
+                        required_skills_education=f"See O*NET occupation {match.onet_code} for typical education and skills.",
+                        potential_growth=""
+                    )
+                    for match in matches
+                ],
+                additional_advice="These matches are based on your assessment scores only. Please try again later for fully personalized recommendations.",
+                influence_breakdown={key: round(weight * 100 / total, 1) for key, weight in influence_breakdown.items()}
             )
+        
+        return CareerRecommendationsResponse(
+            recommendations=[], 
+            additional_advice="I apologize, but I'm having trouble generating recommendations at the moment. Please try again later.",
+            influence_breakdown={}
+        )
 
 if __name__ == "__main__":
     agent = DynamicCareerGuidanceAgent()
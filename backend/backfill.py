@@ -0,0 +1,112 @@
+"""One-off data migrations.
+
+Usage:
+    python backfill.py conversation-messages [--batch-size 100]
+    python backfill.py system-prompts [--batch-size 100]
+    python backfill.py profiles [--batch-size 100]
+"""
+import argparse
+import asyncio
+from sqlalchemy import select
+from sqlalchemy.orm.attributes import flag_modified
+from db import AsyncSessionLocal, init_db, dispose_engine, DBUser, DBConversation
+from conversation_store import backfill_conversation, compact_system_messages
+from prompt_registry import prompt_registry
+from profile_merge import canonical_profile
+
+
+async def _in_batches(model, batch_size: int, migrate) -> int:
+    """Await migrate(db, row) for every row of `model`, committing per batch.
+
+    Returns how many rows migrate() reported as changed.
+    """
+    changed = 0
+    last_id = ""
+    while True:
+        async with AsyncSessionLocal() as db:
+            batch = list(await db.scalars(select(model).where(
+                model.id > last_id
+            ).order_by(model.id).limit(batch_size)))
+            if not batch:
+                break
+            for row in batch:
+                if await migrate(db, row):
+                    changed += 1
+            await db.commit()
+            last_id = batch[-1].id
+        print(f"{model.__tablename__}: {changed} migrated (up to {last_id})")
+    return changed
+
+
+async def backfill_conversation_messages(batch_size: int = 100) -> int:
+    """Move every conversation's JSON history into conversation_messages"""
+    return await _in_batches(DBConversation, batch_size, backfill_conversation)
+
+
+async def _compact_json_history(db, row) -> bool:
+    if await prompt_registry.compact_history(row.conversation_history):
+        flag_modified(row, "conversation_history")
+        return True
+    return False
+
+
+async def _compact_conversation(db, db_conversation) -> bool:
+    changed = await _compact_json_history(db, db_conversation)
+    return await compact_system_messages(db, db_conversation.id) > 0 or changed
+
+
+async def compact_system_prompts(batch_size: int = 100) -> int:
+    """Replace inline system prompt text with prompt registry references"""
+    users = await _in_batches(DBUser, batch_size, _compact_json_history)
+    conversations = await _in_batches(DBConversation, batch_size, _compact_conversation)
+    return users + conversations
+
+
+async def _compact_user_profile(db, db_user) -> bool:
+    if not db_user.user_profile:
+        return False
+    profile, _ = canonical_profile(db_user.user_profile)
+    if profile == db_user.user_profile:
+        return False
+    db_user.user_profile = profile
+    return True
+
+
+async def _compact_conversation_profile(db, db_conversation) -> bool:
+    if not db_conversation.user_profile:
+        return False
+    profile, mentions = canonical_profile(db_conversation.user_profile, db_conversation.profile_mentions)
+    if profile == db_conversation.user_profile and mentions == (db_conversation.profile_mentions or {}):
+        return False
+    db_conversation.user_profile = profile
+    db_conversation.profile_mentions = mentions
+    return True
+
+
+async def compact_profiles(batch_size: int = 100) -> int:
+    """Deduplicate and cap stored profiles in the profile_merge canonical form"""
+    users = await _in_batches(DBUser, batch_size, _compact_user_profile)
+    conversations = await _in_batches(DBConversation, batch_size, _compact_conversation_profile)
+    return users + conversations
+
+
+async def run(task: str, batch_size: int) -> int:
+    try:
+        if task == "conversation-messages":
+            return await backfill_conversation_messages(batch_size)
+        if task == "profiles":
+            return await compact_profiles(batch_size)
+        return await compact_system_prompts(batch_size)
+    finally:
+        await dispose_engine()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a data backfill")
+    parser.add_argument("task", choices=["conversation-messages", "system-prompts", "profiles"])
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    init_db()
+    total = asyncio.run(run(args.task, args.batch_size))
+    print(f"Done: {total} rows migrated")
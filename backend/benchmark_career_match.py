@@ -0,0 +1,48 @@
+"""Career matching latency against a catalog of synthetic occupations.
+
+Builds a random catalog of the requested size, ranks it for a batch of random
+users and reports the per-match latency.
+
+    python benchmark_career_match.py --careers 5000 --users 1000 --top-k 10
+"""
+import argparse
+import time
+import numpy as np
+from career_catalog import CareerCatalog, HOLLAND_FIELDS, HEXACO_FIELDS
+from model import HexacoScores, HollandScores
+
+
+def main(careers: int, users: int, top_k: int):
+    rng = np.random.default_rng(0)
+    catalog = CareerCatalog(
+        [f"00-{i:04d}.00" for i in range(careers)],
+        [f"Career {i}" for i in range(careers)],
+        rng.uniform(1, 7, (careers, len(HOLLAND_FIELDS))),
+        rng.uniform(1, 5, (careers, len(HEXACO_FIELDS)))
+    )
+    profiles = [
+        (
+            HollandScores(**dict(zip(HOLLAND_FIELDS, rng.random(len(HOLLAND_FIELDS))))),
+            HexacoScores(**dict(zip(HEXACO_FIELDS, rng.random(len(HEXACO_FIELDS)))))
+        )
+        for _ in range(users)
+    ]
+
+    timings = []
+    for holland, hexaco in profiles:
+        started = time.perf_counter()
+        catalog.match(holland, hexaco, top_k)
+        timings.append(time.perf_counter() - started)
+
+    timings = np.array(timings) * 1000
+    print(f"{careers} careers, {users} users, top {top_k}")
+    print(f"  mean {timings.mean():.3f} ms   p50 {np.percentile(timings, 50):.3f} ms   p99 {np.percentile(timings, 99):.3f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--careers", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+    main(args.careers, args.users, args.top_k)
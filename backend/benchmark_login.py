@@ -0,0 +1,75 @@
+"""Login throughput under concurrent load: inline bcrypt vs. the hashing pool.
+
+Simulates a burst of /token password checks on one event loop and reports
+logins per second and the longest event-loop stall seen by a 10 ms heartbeat
+(how long every other request on the worker would have been frozen).
+
+    python benchmark_login.py --requests 64 --concurrency 32 --rounds 12
+"""
+import argparse
+import asyncio
+import time
+from passlib.context import CryptContext
+from passwords import PasswordHasher, PASSWORD_HASH_WORKERS
+
+HEARTBEAT_SECONDS = 0.01
+
+
+async def heartbeat(stop: asyncio.Event) -> float:
+    """Largest gap between scheduled ticks, in seconds"""
+    loop = asyncio.get_running_loop()
+    worst = 0.0
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(HEARTBEAT_SECONDS)
+        worst = max(worst, loop.time() - started - HEARTBEAT_SECONDS)
+    return worst
+
+
+async def run(verify, requests: int, concurrency: int) -> tuple[float, float]:
+    """Returns (logins per second, worst event-loop stall in ms)"""
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(heartbeat(stop))
+    await asyncio.sleep(0)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def login():
+        async with semaphore:
+            valid, _ = await verify()
+            assert valid
+
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    stall = await monitor
+    return requests / elapsed, stall * 1000
+
+
+async def main(requests: int, concurrency: int, rounds: int, workers: int):
+    context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+    stored_hash = context.hash("correct horse battery staple")
+    hasher = PasswordHasher(context, workers)
+
+    async def inline_verify():
+        # What /token used to do: bcrypt directly on the event loop
+        return context.verify_and_update("correct horse battery staple", stored_hash)
+
+    async def pooled_verify():
+        return await hasher.verify_and_update("correct horse battery staple", stored_hash)
+
+    print(f"{requests} logins, concurrency {concurrency}, bcrypt rounds {rounds}, {workers} hash workers")
+    for name, verify in [("inline", inline_verify), ("pool", pooled_verify)]:
+        throughput, stall = await run(verify, requests, concurrency)
+        print(f"{name:>8}: {throughput:8.1f} logins/s   worst event-loop stall {stall:8.1f} ms")
+    hasher.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--workers", type=int, default=PASSWORD_HASH_WORKERS)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency, args.rounds, args.workers))
@@ -0,0 +1,116 @@
+import csv
+import os
+import numpy as np
+from dotenv import load_dotenv
+from model import HexacoScores, HollandScores, CareerMatch
+
+load_dotenv()
+
+# O*NET-style occupation profiles: onet_code, title, six RIASEC and six HEXACO columns
+CAREER_CATALOG_PATH = os.getenv("CAREER_CATALOG_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "careers.csv"))
+
+HOLLAND_FIELDS = list(HollandScores.model_fields)
+HEXACO_FIELDS = list(HexacoScores.model_fields)
+HOLLAND_LETTERS = "RIASEC"
+
+# Relative weight of each assessment when both are available (same 35:25 split
+# the recommendation prompt's influence breakdown uses)
+HOLLAND_WEIGHT = 35.0
+HEXACO_WEIGHT = 25.0
+
+
+def _profile_matrix(values: np.ndarray) -> np.ndarray:
+    """Center each row and scale it to unit length.
+
+    A dot product of two such rows is their Pearson correlation, so the shape
+    of a profile matters rather than its scale: O*NET's 1-7 interest ratings
+    and the app's 0-1 slider scores compare directly.
+    """
+    centered = values - values.mean(axis=-1, keepdims=True)
+    norms = np.linalg.norm(centered, axis=-1, keepdims=True)
+    return np.divide(centered, norms, out=np.zeros_like(centered), where=norms > 0)
+
+
+class CareerCatalog:
+    """Occupation profiles held as NumPy matrices for fast fit ranking"""
+
+    def __init__(self, codes: list[str], titles: list[str], holland: np.ndarray, hexaco: np.ndarray):
+        self.codes = codes
+        self.titles = titles
+        self.holland = np.asarray(holland, dtype=np.float32)
+        self.hexaco = np.asarray(hexaco, dtype=np.float32)
+        self._holland_unit = _profile_matrix(self.holland)
+        self._hexaco_unit = _profile_matrix(self.hexaco)
+        # Top three interest letters per occupation, e.g. "IRC"
+        top_letters = np.argsort(-self.holland, axis=1)[:, :3]
+        self.holland_codes = ["".join(HOLLAND_LETTERS[i] for i in row) for row in top_letters]
+
+    @classmethod
+    def from_csv(cls, path: str = CAREER_CATALOG_PATH) -> "CareerCatalog":
+        codes, titles, holland, hexaco = [], [], [], []
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                codes.append(row["onet_code"])
+                titles.append(row["title"])
+                holland.append([float(row[field]) for field in HOLLAND_FIELDS])
+                hexaco.append([float(row[field]) for field in HEXACO_FIELDS])
+        return cls(codes, titles, np.array(holland), np.array(hexaco))
+
+    def __len__(self):
+        return len(self.codes)
+
+    def scores(self, holland_scores: HollandScores | None = None, hexaco_scores: HexacoScores | None = None):
+        """Fit of every occupation for one user.
+
+        Returns (combined, holland_similarity, hexaco_similarity); the per-assessment
+        arrays are None when that assessment is missing or flat (all sliders equal).
+        """
+        holland_similarity = self._similarity(self._holland_unit, holland_scores, HOLLAND_FIELDS)
+        hexaco_similarity = self._similarity(self._hexaco_unit, hexaco_scores, HEXACO_FIELDS)
+
+        combined = np.zeros(len(self), dtype=np.float32)
+        total_weight = 0.0
+        if holland_similarity is not None:
+            combined += HOLLAND_WEIGHT * holland_similarity
+            total_weight += HOLLAND_WEIGHT
+        if hexaco_similarity is not None:
+            combined += HEXACO_WEIGHT * hexaco_similarity
+            total_weight += HEXACO_WEIGHT
+        if total_weight:
+            combined /= total_weight
+        return combined, holland_similarity, hexaco_similarity
+
+    def match(self, holland_scores: HollandScores | None = None, hexaco_scores: HexacoScores | None = None, top_k: int = 10) -> list[CareerMatch]:
+        """The top_k occupations by combined fit, best first"""
+        combined, holland_similarity, hexaco_similarity = self.scores(holland_scores, hexaco_scores)
+        if holland_similarity is None and hexaco_similarity is None:
+            return []
+
+        top_k = min(top_k, len(self))
+        # argpartition is O(n); only the k winners get sorted
+        top = np.argpartition(-combined, top_k - 1)[:top_k]
+        top = top[np.argsort(-combined[top], kind="stable")]
+
+        return [
+            CareerMatch(
+                onet_code=self.codes[i],
+                title=self.titles[i],
+                holland_code=self.holland_codes[i],
+                score=round(float(combined[i]), 4),
+                holland_fit=round(float(holland_similarity[i]), 4) if holland_similarity is not None else None,
+                hexaco_fit=round(float(hexaco_similarity[i]), 4) if hexaco_similarity is not None else None
+            )
+            for i in top
+        ]
+
+    @staticmethod
+    def _similarity(unit_matrix: np.ndarray, scores, fields: list[str]) -> np.ndarray | None:
+        if scores is None:
+            return None
+        user = _profile_matrix(np.array([getattr(scores, field) for field in fields], dtype=np.float32))
+        if not user.any():
+            return None
+        return unit_matrix @ user
+
+
+career_catalog = CareerCatalog.from_csv()
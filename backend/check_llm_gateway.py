@@ -0,0 +1,126 @@
+"""Exercise the LLM gateway (llm_client.LLMClient) against a local fake model.
+
+Runs retry, circuit breaker, hedging and rate limiting scenarios with no
+network access and exits non-zero if any behaves unexpectedly.
+
+    python check_llm_gateway.py
+"""
+import asyncio
+import random
+import sys
+import time
+from google.api_core.exceptions import ServiceUnavailable
+from llm_client import LLMClient, CircuitOpenError
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FlakyModel:
+    """Stands in for genai.GenerativeModel with configurable latency and failures"""
+
+    def __init__(self, latency: float = 0.01, failure_rate: float = 0.0, slow_every: int = 0, slow_latency: float = 1.0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        # The first attempt at every `slow_every`th prompt is slow; retries and hedges of it are not
+        self.slow_every = slow_every
+        self.slow_latency = slow_latency
+        self.calls = 0
+        self._prompts = set()
+
+    async def generate_content_async(self, prompt, generation_config=None, stream=False):
+        self.calls += 1
+        slow = bool(self.slow_every) and prompt not in self._prompts and len(self._prompts) % self.slow_every == 0
+        self._prompts.add(prompt)
+        await asyncio.sleep(self.slow_latency if slow else self.latency)
+        if random.random() < self.failure_rate:
+            raise ServiceUnavailable("fake upstream unavailable")
+        return FakeResponse("ok")
+
+
+async def run_calls(client: LLMClient, count: int) -> tuple[int, list[float]]:
+    """Returns (successes, per-call latencies in seconds)"""
+    async def one(index: int):
+        started = time.perf_counter()
+        try:
+            await client.generate(f"prompt {index}")
+            return True, time.perf_counter() - started
+        except Exception:
+            return False, time.perf_counter() - started
+    results = await asyncio.gather(*(one(index) for index in range(count)))
+    return sum(ok for ok, _ in results), [latency for _, latency in results]
+
+
+def percentile(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def check_retries() -> bool:
+    random.seed(0)
+    model = FlakyModel(failure_rate=0.3)
+    client = LLMClient(model=model, max_retries=3, failure_threshold=1000)
+    successes, _ = await run_calls(client, 200)
+    print(f"retries: {successes}/200 succeeded with 30% upstream failures ({client.retries} retries)")
+    return successes >= 195
+
+
+async def check_circuit_breaker() -> bool:
+    model = FlakyModel(failure_rate=1.0)
+    client = LLMClient(model=model, max_retries=0, failure_threshold=5, reset_seconds=0.5)
+    for _ in range(5):
+        await run_calls(client, 1)
+    started = time.perf_counter()
+    try:
+        await client.generate("prompt")
+        rejected = False
+    except CircuitOpenError:
+        rejected = True
+    fail_fast_ms = (time.perf_counter() - started) * 1000
+    calls_while_open = model.calls
+
+    # After the reset period one trial call goes through and closes the circuit
+    await asyncio.sleep(0.6)
+    model.failure_rate = 0.0
+    recovered, _ = await run_calls(client, 1)
+    print(
+        f"circuit breaker: open={rejected} after 5 failures, rejected in {fail_fast_ms:.2f} ms, "
+        f"upstream calls while open={calls_while_open - 5}, state after recovery={client.breaker.state}"
+    )
+    return rejected and fail_fast_ms < 5 and calls_while_open == 5 and recovered == 1 and client.breaker.state == "closed"
+
+
+async def check_hedging() -> bool:
+    # Enough concurrency that no call waits for a slot; only the slow tail should be hedged
+    plain = LLMClient(model=FlakyModel(latency=0.02, slow_every=20, slow_latency=1.0), max_concurrency=500)
+    _, plain_latencies = await run_calls(plain, 200)
+    hedged = LLMClient(model=FlakyModel(latency=0.02, slow_every=20, slow_latency=1.0), max_concurrency=500, hedge_after=0.1)
+    _, hedged_latencies = await run_calls(hedged, 200)
+    plain_p99, hedged_p99 = percentile(plain_latencies, 0.99), percentile(hedged_latencies, 0.99)
+    print(f"hedging: p99 {plain_p99 * 1000:.0f} ms -> {hedged_p99 * 1000:.0f} ms with {hedged.hedges} hedged calls")
+    return hedged_p99 < plain_p99 / 2
+
+
+async def check_rate_limit() -> bool:
+    client = LLMClient(model=FlakyModel(latency=0.0), rate_per_minute=600, burst=5)
+    started = time.perf_counter()
+    await run_calls(client, 20)
+    elapsed = time.perf_counter() - started
+    # 5 calls from the burst, the other 15 at 10 per second
+    print(f"rate limit: 20 calls at 600/min (burst 5) took {elapsed:.2f} s")
+    return 1.3 <= elapsed <= 2.0
+
+
+async def main() -> int:
+    failures = 0
+    for check in [check_retries, check_circuit_breaker, check_hedging, check_rate_limit]:
+        ok = await check()
+        print(f"[{'ok' if ok else 'FAIL'}] {check.__name__}")
+        failures += not ok
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
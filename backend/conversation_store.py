@@ -0,0 +1,194 @@
+import uuid
+from datetime import datetime
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from db import DBConversation, DBConversationMessage
+from prompt_registry import prompt_registry, system_entry, CAREER_GUIDANCE_SYSTEM_PROMPT
+from prompt_budget import summary_entry
+
+
+class ConversationLog:
+    """Append-only message log for one conversation (the conversation_messages table).
+
+    Each turn inserts rows instead of rewriting the conversation's JSON columns,
+    and reads of recent history are an indexed range scan on (conversation_id, seq).
+    History entries use the same {"role": ..., "parts": [...]} shape as the old
+    conversation_history JSON so the agents can consume them unchanged; system
+    prompts are stored as {"role": "system", "prompt_id": ...} references.
+
+    Appended messages are held until save(), which the caller runs right
+    before committing.
+    """
+
+    def __init__(self, db: AsyncSession, conversation_id: str):
+        self.db = db
+        self.conversation_id = conversation_id
+        self._pending: list[DBConversationMessage] = []
+
+    async def append(self, role: str, content: str) -> dict:
+        """Add a message (role is "assistant" or "user"); the caller saves and commits"""
+        self._add(role, content, None)
+        return {"role": role, "parts": [content]}
+
+    async def append_prompt(self, prompt_id: str) -> dict:
+        """Add a system message that references a registered prompt"""
+        self._add("system", "", prompt_id)
+        return system_entry(prompt_id)
+
+    def _add(self, role: str, content: str, prompt_id: str | None):
+        self._pending.append(DBConversationMessage(
+            conversation_id=self.conversation_id,
+            message_id=str(uuid.uuid4()),
+            role=role,
+            content=content,
+            prompt_id=prompt_id,
+            created_at=datetime.utcnow()
+        ))
+
+    async def save(self):
+        """Number the appended messages and add them to the session.
+
+        Seqs are reserved with one atomic increment of
+        conversations.next_message_seq, so overlapping turns on the same
+        conversation never collide. Run it just before committing: the
+        increment keeps the conversation row locked until then.
+        """
+        if not self._pending:
+            return
+        # The conversation may not have been inserted yet
+        await self.db.flush()
+        end = await self.db.scalar(update(DBConversation).where(
+            DBConversation.id == self.conversation_id
+        ).values(
+            next_message_seq=DBConversation.next_message_seq + len(self._pending)
+        ).returning(DBConversation.next_message_seq).execution_options(synchronize_session=False))
+        for seq, row in enumerate(self._pending, start=end - len(self._pending)):
+            row.seq = seq
+        self.db.add_all(self._pending)
+        self._pending = []
+
+    async def recent(self, limit: int) -> list[dict]:
+        """The last `limit` history entries, oldest first"""
+        result = await self.db.execute(select(
+            DBConversationMessage.role, DBConversationMessage.content, DBConversationMessage.prompt_id
+        ).where(
+            DBConversationMessage.conversation_id == self.conversation_id
+        ).order_by(DBConversationMessage.seq.desc()).limit(limit))
+        return [history_entry(*row) for row in reversed(result.all())]
+
+    async def since(self, after_seq: int, limit: int | None = None) -> list[tuple[int, dict]]:
+        """(seq, entry) for entries after `after_seq`, oldest first; only the newest `limit` if given"""
+        query = select(
+            DBConversationMessage.seq, DBConversationMessage.role, DBConversationMessage.content, DBConversationMessage.prompt_id
+        ).where(
+            DBConversationMessage.conversation_id == self.conversation_id,
+            DBConversationMessage.seq > after_seq
+        ).order_by(DBConversationMessage.seq.desc())
+        if limit is not None:
+            query = query.limit(limit)
+        result = await self.db.execute(query)
+        return [(seq, history_entry(role, content, prompt_id)) for seq, role, content, prompt_id in reversed(result.all())]
+
+    async def context(self, db_conversation: DBConversation, limit: int) -> list[dict]:
+        """Prompt history: the rolling summary (if any) followed by the newest
+        `limit` entries it does not cover yet"""
+        entries = [entry for _, entry in await self.since(db_conversation.summary_through_seq, limit)]
+        if db_conversation.history_summary:
+            entries.insert(0, summary_entry(db_conversation.history_summary))
+        return entries
+
+    async def history(self) -> list[dict]:
+        return [history_entry(row.role, row.content, row.prompt_id) for row in await self.rows()]
+
+    async def rows(self) -> list[DBConversationMessage]:
+        result = await self.db.scalars(select(DBConversationMessage).where(
+            DBConversationMessage.conversation_id == self.conversation_id
+        ).order_by(DBConversationMessage.seq))
+        return list(result)
+
+    async def is_empty(self) -> bool:
+        seq = await self.db.scalar(select(DBConversationMessage.seq).where(
+            DBConversationMessage.conversation_id == self.conversation_id
+        ).limit(1))
+        return seq is None
+
+    async def delete_all(self):
+        await self.db.execute(delete(DBConversationMessage).where(
+            DBConversationMessage.conversation_id == self.conversation_id
+        ))
+
+
+def history_entry(role: str, content: str, prompt_id: str | None = None) -> dict:
+    if prompt_id:
+        return system_entry(prompt_id)
+    return {"role": role, "parts": [content]}
+
+
+async def backfill_conversation(db: AsyncSession, db_conversation: DBConversation) -> bool:
+    """Move a conversation's legacy JSON history into conversation_messages.
+
+    conversation_history is the source of truth; ids and timestamps are taken
+    from the matching `messages` entries where they line up. The JSON columns
+    are emptied afterwards. Returns True if anything was migrated; the caller commits.
+    """
+    history = db_conversation.conversation_history or []
+    messages = db_conversation.messages or []
+    if not history and not messages:
+        return False
+
+    if await ConversationLog(db, db_conversation.id).is_empty():
+        if not history:
+            # Only the UI messages survived; rebuild history from them
+            history = [
+                {"role": "assistant" if msg.get("type") == "agent" else "user", "parts": [msg.get("content", "")]}
+                for msg in messages
+            ]
+        pending_messages = list(messages)
+        for seq, item in enumerate(history):
+            role = item.get("role", "")
+            content = item.get("parts", [""])[0] if item.get("parts") else ""
+            prompt_id = item.get("prompt_id")
+            if role == "system" and prompt_id is None:
+                prompt_id = await prompt_registry.register(CAREER_GUIDANCE_SYSTEM_PROMPT, content)
+            row = DBConversationMessage(
+                conversation_id=db_conversation.id,
+                seq=seq,
+                message_id=str(uuid.uuid4()),
+                role=role,
+                content="" if prompt_id else content,
+                prompt_id=prompt_id,
+                created_at=db_conversation.created_at or datetime.utcnow()
+            )
+            # Keep the UI message id/timestamp when the next UI message is this one
+            if role in ("assistant", "user") and pending_messages:
+                msg = pending_messages[0]
+                expected_type = "agent" if role == "assistant" else "user"
+                if msg.get("type") == expected_type and msg.get("content") == content:
+                    pending_messages.pop(0)
+                    row.message_id = msg.get("id") or row.message_id
+                    try:
+                        row.created_at = datetime.fromisoformat(msg["timestamp"])
+                    except (KeyError, TypeError, ValueError):
+                        pass
+            db.add(row)
+        db_conversation.next_message_seq = len(history)
+
+    db_conversation.conversation_history = []
+    db_conversation.messages = []
+    return True
+
+
+async def compact_system_messages(db: AsyncSession, conversation_id: str) -> int:
+    """Swap inline system prompt text in stored rows for registry references.
+
+    Returns the number of rows changed; the caller commits.
+    """
+    rows = list(await db.scalars(select(DBConversationMessage).where(
+        DBConversationMessage.conversation_id == conversation_id,
+        DBConversationMessage.role == "system",
+        DBConversationMessage.prompt_id.is_(None)
+    )))
+    for row in rows:
+        row.prompt_id = await prompt_registry.register(CAREER_GUIDANCE_SYSTEM_PROMPT, row.content)
+        row.content = ""
+    return len(rows)
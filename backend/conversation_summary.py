@@ -0,0 +1,117 @@
+import asyncio
+import os
+import weakref
+from dotenv import load_dotenv
+from sqlalchemy import select, update
+from db import AsyncSessionLocal, DBConversation
+from conversation_store import ConversationLog
+from llm_client import llm_client
+from prompt_budget import count_tokens, truncate_tokens, PROMPT_TURN_MAX_TOKENS
+
+load_dotenv()
+
+# Once this many turns are not covered by the summary, the older ones are folded into it
+HISTORY_SUMMARY_TRIGGER = int(os.getenv("HISTORY_SUMMARY_TRIGGER", "12"))
+# Newest turns left out of the summary (they are still sent verbatim)
+HISTORY_SUMMARY_KEEP_RECENT = int(os.getenv("HISTORY_SUMMARY_KEEP_RECENT", "6"))
+HISTORY_SUMMARY_MAX_TOKENS = int(os.getenv("HISTORY_SUMMARY_MAX_TOKENS", "250"))
+# Most unsummarized turns loaded for a prompt if the summary has fallen behind
+PROMPT_HISTORY_MAX_ENTRIES = HISTORY_SUMMARY_TRIGGER * 2
+
+
+class ConversationSummarizer:
+    """Keeps conversations.history_summary up to date in the background.
+
+    After a turn is committed, schedule() folds the turns that have dropped out
+    of the verbatim window into the stored summary with one model call. The
+    previous summary is extended rather than rebuilt, so each turn is only ever
+    summarized once.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal, trigger: int = HISTORY_SUMMARY_TRIGGER, keep_recent: int = HISTORY_SUMMARY_KEEP_RECENT):
+        self.session_factory = session_factory
+        self.trigger = trigger
+        self.keep_recent = keep_recent
+        self._tasks: set[asyncio.Task] = set()
+        self._conversation_locks = weakref.WeakValueDictionary()
+
+    def schedule(self, conversation_id: str, history: list):
+        """Summarize in the background if `history` (the prompt context) has too many raw turns"""
+        turns = [item for item in history if item.get("role") in ("assistant", "user")]
+        if len(turns) < self.trigger:
+            return
+        task = asyncio.create_task(self.update(conversation_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def stop(self):
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def update(self, conversation_id: str) -> bool:
+        """Fold all but the newest keep_recent entries into the summary. Returns True if it changed."""
+        lock = self._conversation_locks.get(conversation_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._conversation_locks[conversation_id] = lock
+        async with lock:
+            try:
+                return await self._update(conversation_id)
+            except Exception as e:
+                # The prompt builder still drops turns that do not fit, so this only costs context
+                print(f"Conversation summary error: {e}")
+                return False
+
+    async def _update(self, conversation_id: str) -> bool:
+        async with self.session_factory() as db:
+            row = (await db.execute(select(DBConversation.history_summary, DBConversation.summary_through_seq).where(
+                DBConversation.id == conversation_id
+            ))).first()
+            if row is None:
+                return False
+            summary, through_seq = row
+            entries = await ConversationLog(db, conversation_id).since(through_seq)
+            # Re-check under the lock: an earlier scheduled update may already have run
+            if len(entries) < self.trigger:
+                return False
+            fold = entries[:-self.keep_recent] if self.keep_recent else entries
+
+            new_summary = await self._summarize(summary, [entry for _, entry in fold])
+            # Only apply if nobody else moved the summary on in the meantime
+            updated = await db.execute(update(DBConversation).where(
+                DBConversation.id == conversation_id,
+                DBConversation.summary_through_seq == through_seq
+            ).values(history_summary=new_summary, summary_through_seq=fold[-1][0]))
+            await db.commit()
+            print(f"Summarized {len(fold)} messages of conversation {conversation_id} ({count_tokens(new_summary)} tokens)")
+            return bool(updated.rowcount)
+
+    async def _summarize(self, summary: str, entries: list) -> str:
+        lines = []
+        for item in entries:
+            role = item.get("role")
+            text = item.get("parts", [""])[0] if item.get("parts") else ""
+            if role == "assistant" and text:
+                lines.append(f"Advisor: {truncate_tokens(text, PROMPT_TURN_MAX_TOKENS)}")
+            elif role == "user" and text:
+                lines.append(f"User: {truncate_tokens(text, PROMPT_TURN_MAX_TOKENS)}")
+        if not lines:
+            return summary
+
+        prompt = "\n".join([
+            "You maintain a running summary of a career guidance conversation.",
+            f"Update the summary with the new messages. Keep every fact about the user's education, interests, skills, personality, values, dislikes and goals; drop small talk. Write plain prose under {HISTORY_SUMMARY_MAX_TOKENS * 3 // 4} words.",
+            "",
+            "Current summary:",
+            summary or "(none yet)",
+            "",
+            "New messages:",
+            *lines,
+            "",
+            "Return ONLY the updated summary:"
+        ])
+        response = await llm_client.generate(prompt)
+        if response is None or not response.text or not response.text.strip():
+            raise Exception("No summary from Gemini")
+        return truncate_tokens(response.text.strip(), HISTORY_SUMMARY_MAX_TOKENS)
@@ -1,21 +1,134 @@
 import os
 import sqlalchemy
-from sqlalchemy import Column, String, Float, ForeignKey, Text, JSON, DateTime
+import sqlalchemy.ext.asyncio
+from sqlalchemy import Column, String, Float, ForeignKey, Text, JSON, DateTime, Integer, Index
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship, sessionmaker
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import relationship
 from datetime import datetime
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Connection pool settings (ignored by SQLite)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+# Recycle connections before Cloud SQL / proxies drop idle ones
+DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+# When set, connect through the Cloud SQL Python Connector instead of DATABASE_URL
+CLOUD_SQL_CONNECTION_NAME = os.getenv("CLOUD_SQL_CONNECTION_NAME", "")
+CLOUD_SQL_IP_TYPE = os.getenv("CLOUD_SQL_IP_TYPE", "public")
+
+# Async drivers used by the application for each sync DATABASE_URL scheme
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+
+connector = None
+async_connector = None
+
+
+def _cloud_sql_credentials() -> dict:
+    return {
+        "user": os.getenv("DB_USER"),
+        "password": os.getenv("DB_PASS"),
+        "db": os.getenv("DB_NAME"),
+        "ip_type": CLOUD_SQL_IP_TYPE,
+    }
+
+
 def getconn():
-    url = os.getenv("DATABASE_URL")
-    return url
+    """New pg8000 connection through the Cloud SQL connector"""
+    return connector.connect(CLOUD_SQL_CONNECTION_NAME, "pg8000", **_cloud_sql_credentials())
+
+
+async def getconn_async():
+    """New asyncpg connection through the Cloud SQL connector"""
+    global async_connector
+    if async_connector is None:
+        # The async connector binds to the running event loop, so create it lazily
+        from google.cloud.sql.connector import create_async_connector
+        async_connector = await create_async_connector()
+    return await async_connector.connect_async(CLOUD_SQL_CONNECTION_NAME, "asyncpg", **_cloud_sql_credentials())
+
+
+def async_database_url(url: str) -> str:
+    scheme, sep, rest = url.partition("://")
+    return ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
+
+def _pool_options(url: str) -> dict:
+    options = {"pool_pre_ping": DB_POOL_PRE_PING}
+    if not url.startswith("sqlite"):
+        options.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT_SECONDS,
+            pool_recycle=DB_POOL_RECYCLE_SECONDS
+        )
+    return options
+
+
+def create_engine():
+    """Sync engine for migrations and maintenance scripts.
 
+    Uses Cloud SQL when CLOUD_SQL_CONNECTION_NAME is set, else DATABASE_URL
+    (e.g. a local Postgres or SQLite).
+    """
+    global connector
+    if CLOUD_SQL_CONNECTION_NAME:
+        from google.cloud.sql.connector import Connector
+        connector = Connector()
+        url, options = "postgresql+pg8000://", {"creator": getconn}
+    else:
+        url, options = os.getenv("DATABASE_URL"), {}
+    return sqlalchemy.create_engine(url, **options, **_pool_options(url))
 
-engine = sqlalchemy.create_engine(getconn())
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def create_async_engine():
+    """Async engine the API serves requests with (asyncpg or aiosqlite)"""
+    if CLOUD_SQL_CONNECTION_NAME:
+        url, options = "postgresql+asyncpg://", {"async_creator": getconn_async}
+    else:
+        url, options = async_database_url(os.getenv("DATABASE_URL")), {}
+    return sqlalchemy.ext.asyncio.create_async_engine(url, **options, **_pool_options(url))
+
+
+def pool_status() -> dict:
+    """Connection pool counters for /health"""
+    pool = async_engine.pool
+    status = {"pool": type(pool).__name__}
+    if isinstance(pool, sqlalchemy.pool.QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow()
+        )
+    return status
+
+
+async def dispose_engine():
+    await async_engine.dispose()
+    engine.dispose()
+    if async_connector is not None:
+        await async_connector.close_async()
+    if connector is not None:
+        connector.close()
+
+
+# Sync engine for migrations and scripts only; request handlers use AsyncSessionLocal
+engine = create_engine()
+async_engine = create_async_engine()
+
+# expire_on_commit=False: attributes stay readable after commit without an implicit (sync) reload
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 JsonType = JSON
@@ -40,7 +153,7 @@ class DBHexacoScores(Base):
     __tablename__ = "hexaco_scores"
     
     id = Column(String, primary_key=True)
-    user_id = Column(String, ForeignKey("users.id"), nullable=False)
+    user_id = Column(String, ForeignKey("users.id"), nullable=False, unique=True, index=True)
     honesty_humility = Column(Float, default=0.0)
     emotionality = Column(Float, default=0.0)
     extraversion = Column(Float, default=0.0)
@@ -54,7 +167,7 @@ class DBHollandScores(Base):
     __tablename__ = "holland_scores"
     
     id = Column(String, primary_key=True)
-    user_id = Column(String, ForeignKey("users.id"), nullable=False)
+    user_id = Column(String, ForeignKey("users.id"), nullable=False, unique=True, index=True)
     realistic = Column(Float, default=0.0)
     investigative = Column(Float, default=0.0)
     artistic = Column(Float, default=0.0)
@@ -68,7 +181,7 @@ class DBRoadmap(Base):
     __tablename__ = "roadmaps"
     
     id = Column(String, primary_key=True)
-    user_id = Column(String, ForeignKey("users.id"), nullable=False)
+    user_id = Column(String, ForeignKey("users.id"), nullable=False, index=True)
     career_goal = Column(String, nullable=False)
     career_start = Column(String, nullable=False)
     nodes = Column(JsonType, default=list)
@@ -88,17 +201,137 @@ class DBConversation(Base):
     career_recommendations = Column(JsonType, default=list)
     additional_advice = Column(Text, default="")
     influence_breakdown = Column(JsonType, default=dict)
+    # recommendation_fingerprint() of the profile and scores career_recommendations were generated from
+    recommendations_fingerprint = Column(String(64), nullable=True)
+    recommendations_generated_at = Column(DateTime, nullable=True)
+    # profile_merge mention counts behind user_profile's ordering: {field: {normalized value: count}}
+    profile_mentions = Column(JsonType, default=dict)
+    # Rolling summary of conversation_messages up to and including summary_through_seq
+    history_summary = Column(Text, nullable=False, default="")
+    summary_through_seq = Column(Integer, nullable=False, default=-1)
+    # seq for the next conversation_messages row; see ConversationLog.save()
+    next_message_seq = Column(Integer, nullable=False, default=0)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     user = relationship("DBUser", back_populates="conversations")
 
-def get_db():
-    db = SessionLocal()
-    try:
+    # Sidebar listing: a user's conversations, most recently updated first
+    __table_args__ = (Index("ix_conversations_user_id_updated_at_id", "user_id", "updated_at", "id"),)
+
+class DBConversationMessage(Base):
+    __tablename__ = "conversation_messages"
+
+    conversation_id = Column(String, ForeignKey("conversations.id", ondelete="CASCADE"), primary_key=True)
+    seq = Column(Integer, primary_key=True)
+    # Stable id for the UI message list
+    message_id = Column(String, nullable=False)
+    # system | assistant | user
+    role = Column(String, nullable=False)
+    content = Column(Text, nullable=False, default="")
+    # System rows reference the prompt registry instead of carrying the text
+    prompt_id = Column(String, ForeignKey("prompts.id"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class DBPrompt(Base):
+    __tablename__ = "prompts"
+
+    # "<name>@<version>", e.g. "career_guidance.system@1"
+    id = Column(String, primary_key=True)
+    name = Column(String, nullable=False)
+    version = Column(Integer, nullable=False)
+    # sha256 of content; the same text is only stored once per name
+    content_hash = Column(String(64), nullable=False)
+    content = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (Index("ix_prompts_name_content_hash", "name", "content_hash", unique=True),)
+
+class DBProfileExtractionJob(Base):
+    __tablename__ = "profile_extraction_jobs"
+
+    id = Column(String, primary_key=True)
+    conversation_id = Column(String, ForeignKey("conversations.id", ondelete="CASCADE"), nullable=False, index=True)
+    question = Column(Text, default="")
+    answer = Column(Text, nullable=False)
+    # pending -> running -> done | failed
+    status = Column(String, nullable=False, default="pending", index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(Text, default="")
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class DBRecommendationJob(Base):
+    __tablename__ = "recommendation_jobs"
+
+    id = Column(String, primary_key=True)
+    user_id = Column(String, ForeignKey("users.id"), nullable=False, index=True)
+    # conversations | csv
+    source = Column(String, nullable=False)
+    # pending -> running -> done
+    status = Column(String, nullable=False, default="pending", index=True)
+    total = Column(Integer, nullable=False, default=0)
+    completed = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class DBRecommendationJobItem(Base):
+    __tablename__ = "recommendation_job_items"
+
+    id = Column(String, primary_key=True)
+    job_id = Column(String, ForeignKey("recommendation_jobs.id", ondelete="CASCADE"), nullable=False)
+    # Order of the item in the request / CSV
+    position = Column(Integer, nullable=False)
+    label = Column(String, nullable=False, default="")
+    # Set for conversation items; recommendations are also saved on the conversation
+    conversation_id = Column(String, ForeignKey("conversations.id", ondelete="SET NULL"), nullable=True)
+    # CSV items: {"user_profile": ..., "hexaco_scores": ..., "holland_scores": ...}
+    inputs = Column(JsonType, nullable=True)
+    # pending -> running -> done | failed
+    status = Column(String, nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(Text, default="")
+    # CareerRecommendationsResponse
+    result = Column(JsonType, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (Index("ix_recommendation_job_items_job_id_status", "job_id", "status"),)
+
+class DBStepDetailsCache(Base):
+    __tablename__ = "step_details_cache"
+
+    # sha256 of the normalized step title, skills and overall goal
+    key = Column(String(64), primary_key=True)
+    step_title = Column(String, nullable=False)
+    overall_goal = Column(String, nullable=False)
+    payload = Column(JsonType, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=True)
+
+class DBRoadmapCacheEntry(Base):
+    __tablename__ = "roadmap_cache"
+
+    id = Column(String, primary_key=True)
+    user_id = Column(String, ForeignKey("users.id"), nullable=False)
+    # sha256 of the normalized career goal, career start and profile fingerprint
+    cache_key = Column(String(64), nullable=False)
+    roadmap_id = Column(String, ForeignKey("roadmaps.id", ondelete="CASCADE"), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    roadmap = relationship("DBRoadmap")
+
+    __table_args__ = (Index("ix_roadmap_cache_user_id_cache_key", "user_id", "cache_key"),)
+
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 def init_db():
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    """Apply pending schema migrations (alembic upgrade head)"""
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini"))
+    config.attributes["configure_logging"] = False
+    command.upgrade(config, "head")
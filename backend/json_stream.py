@@ -0,0 +1,66 @@
+import json
+
+
+class JsonArrayStream:
+    """Incremental parser for streamed JSON model output.
+
+    Feed text chunks as they arrive; feed() returns (key, item) for every object
+    in a top-level array (e.g. "recommendations", "nodes", "edges") as soon as
+    its closing brace has been seen. Anything before the first "{" (such as a
+    ```json fence) is ignored.
+    """
+
+    def __init__(self, array_keys):
+        self.array_keys = set(array_keys)
+        self.text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_string = None
+        self._current_key = None
+        self._array_key = None
+        self._item_start = None
+
+    def feed(self, chunk: str) -> list[tuple[str, dict]]:
+        self.text += chunk
+        items = []
+        text = self.text
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_string = text[self._string_start + 1:i]
+                continue
+
+            if ch == '"':
+                if self._depth > 0:
+                    self._in_string = True
+                    self._string_start = i
+            elif ch == ":" and self._depth == 1:
+                self._current_key = self._last_string
+            elif ch in "{[":
+                if ch == "[" and self._depth == 1 and self._current_key in self.array_keys:
+                    self._array_key = self._current_key
+                elif ch == "{" and self._depth == 2 and self._array_key is not None:
+                    self._item_start = i
+                self._depth += 1
+            elif ch in "}]" and self._depth > 0:
+                self._depth -= 1
+                if ch == "}" and self._depth == 2 and self._item_start is not None:
+                    try:
+                        items.append((self._array_key, json.loads(text[self._item_start:i + 1])))
+                    except json.JSONDecodeError:
+                        pass
+                    self._item_start = None
+                elif ch == "]" and self._depth == 1:
+                    self._array_key = None
+        self._pos = len(text)
+        return items
@@ -0,0 +1,320 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+from dotenv import load_dotenv
+from google.api_core.exceptions import ServiceUnavailable
+
+load_dotenv()
+
+# Which model LLMClient talks to: gemini, fake or replay
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini").lower()
+# Append every prompt and response to this JSONL file (any backend); replay reads the same format
+LLM_RECORD_PATH = os.getenv("LLM_RECORD_PATH", "")
+LLM_REPLAY_PATH = os.getenv("LLM_REPLAY_PATH", "llm_recording.jsonl")
+# Fake backend: response latency (mean +/- uniform jitter), share of calls that fail with a 503,
+# and streaming chunk size
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "800"))
+FAKE_LLM_JITTER_MS = float(os.getenv("FAKE_LLM_JITTER_MS", "200"))
+FAKE_LLM_FAILURE_RATE = float(os.getenv("FAKE_LLM_FAILURE_RATE", "0"))
+FAKE_LLM_CHUNK_CHARS = int(os.getenv("FAKE_LLM_CHUNK_CHARS", "40"))
+
+FAKE_QUESTIONS = [
+    "What subjects or activities make you lose track of time?",
+    "How do you usually approach a problem you have never seen before?",
+    "What kind of work environment helps you do your best work?",
+    "Tell me about a project you are proud of.",
+    "What matters most to you in a future career?",
+]
+FAKE_CAREERS = ["Data Scientist", "Software Engineer", "UX Designer", "Product Manager", "Biomedical Engineer", "Teacher"]
+# Sample values for string fields of a response schema, by field name
+FAKE_FIELD_VALUES = {
+    "keywords": ["Data Analysis", "Machine Learning", "Cloud Computing", "UX Research", "Project Management"],
+    "interests": ["technology", "music", "robotics"],
+    "skills": ["python", "communication", "problem solving"],
+    "personality_traits": ["curious", "analytical"],
+    "values": ["growth", "work-life balance"],
+    "dislikes": ["repetitive tasks"],
+    "education": ["12th grade", "Bachelor's degree"],
+    "experience_level": ["Student", "Entry level"],
+    "career_name": FAKE_CAREERS,
+}
+
+
+class BackendResponse:
+    """The part of a Gemini response the agents use"""
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+def request_kind(prompt, generation_config=None) -> str:
+    """Which agent call a prompt belongs to, used to pick fake and replayed responses"""
+    text = prompt if isinstance(prompt, str) else str(prompt)
+    schema = _response_schema(generation_config)
+    if schema is not None:
+        properties = _json_schema(schema).get("properties", {})
+        if "recommendations" in properties:
+            return "recommendations"
+        if "keywords" in properties:
+            return "keywords"
+        if "interests" in properties:
+            return "profile"
+        return "json"
+    if "roadmap generator" in text:
+        return "roadmap"
+    if "learning specialist" in text:
+        return "step_details"
+    if "running summary" in text:
+        return "summary"
+    return "question"
+
+
+def request_key(prompt, generation_config=None) -> str:
+    schema = _response_schema(generation_config)
+    content = json.dumps([
+        prompt if isinstance(prompt, str) else str(prompt),
+        _json_schema(schema) if schema is not None else None
+    ], sort_keys=True, default=str)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def _response_schema(generation_config):
+    if generation_config is None:
+        return None
+    if isinstance(generation_config, dict):
+        return generation_config.get("response_schema")
+    return getattr(generation_config, "response_schema", None)
+
+
+def _json_schema(schema) -> dict:
+    """Plain JSON schema for a dict schema or a pydantic model class"""
+    if hasattr(schema, "model_json_schema"):
+        return schema.model_json_schema()
+    return schema if isinstance(schema, dict) else {}
+
+
+class FakeBackend:
+    """Offline stand-in for the Gemini model, for load tests and local runs.
+
+    Responses are schema-valid for every agent call (recommendations,
+    keywords, profile extraction, roadmap, step details, summaries and
+    questions) and depend only on the prompt, so runs are repeatable. Latency
+    and failures are configurable so the stack's own overhead can be measured
+    against a known model time.
+    """
+
+    def __init__(self, latency_ms: float = FAKE_LLM_LATENCY_MS, jitter_ms: float = FAKE_LLM_JITTER_MS,
+                 failure_rate: float = FAKE_LLM_FAILURE_RATE, chunk_chars: int = FAKE_LLM_CHUNK_CHARS):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self.chunk_chars = max(chunk_chars, 1)
+        self.calls = 0
+
+    async def generate_content_async(self, prompt, generation_config=None, stream=False):
+        self.calls += 1
+        text = self.respond(prompt, generation_config)
+        latency = max(self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms), 0) / 1000
+        if stream:
+            return self._stream(text, latency)
+        await asyncio.sleep(latency)
+        if random.random() < self.failure_rate:
+            raise ServiceUnavailable("Fake backend failure")
+        return BackendResponse(text)
+
+    async def _stream(self, text: str, latency: float):
+        # Spread the latency over the chunks like a real streamed response
+        chunks = [text[i:i + self.chunk_chars] for i in range(0, len(text), self.chunk_chars)] or [""]
+        if random.random() < self.failure_rate:
+            await asyncio.sleep(latency)
+            raise ServiceUnavailable("Fake backend failure")
+        for chunk in chunks:
+            await asyncio.sleep(latency / len(chunks))
+            yield BackendResponse(chunk)
+
+    def respond(self, prompt, generation_config=None) -> str:
+        """Response text for a prompt (no latency)"""
+        text = prompt if isinstance(prompt, str) else str(prompt)
+        rng = random.Random(request_key(prompt, generation_config))
+        kind = request_kind(prompt, generation_config)
+        if kind == "recommendations":
+            careers = self._candidate_careers(text) or FAKE_CAREERS
+            return json.dumps({
+                "recommendations": [
+                    {
+                        "career_name": career,
+                        "fit_explanation": f"{career} matches the interests and strengths in the profile.",
+                        "required_skills_education": "A relevant degree or certificate and a portfolio of projects.",
+                        "potential_growth": "Steady demand with room to move into senior and lead roles."
+                    }
+                    for career in rng.sample(careers, min(len(careers), rng.randint(3, 5)))
+                ],
+                "additional_advice": "Try a short course or project in your top choice before committing."
+            })
+        if kind in ("keywords", "profile", "json"):
+            return json.dumps(self._sample(_json_schema(_response_schema(generation_config)), rng))
+        if kind == "roadmap":
+            return json.dumps(self._roadmap(text, rng))
+        if kind == "step_details":
+            return json.dumps(self._step_details(text))
+        if kind == "summary":
+            return "The user is a student interested in technology and problem solving and wants a creative, well-paid career."
+        return rng.choice(FAKE_QUESTIONS)
+
+    def _sample(self, schema: dict, rng: random.Random, name: str = "", defs: dict | None = None):
+        """A value that satisfies a (Gemini-subset) JSON schema"""
+        defs = defs if defs is not None else schema.get("$defs", {})
+        if "$ref" in schema:
+            schema = defs.get(schema["$ref"].split("/")[-1], {})
+        kind = str(schema.get("type", "object")).lower()
+        if kind == "object":
+            return {
+                key: self._sample(value, rng, key, defs)
+                for key, value in schema.get("properties", {}).items()
+            }
+        if kind == "array":
+            items = schema.get("items", {})
+            values = FAKE_FIELD_VALUES.get(name)
+            if values and str(items.get("type", "string")).lower() == "string":
+                # Distinct values, like a real list of skills or keywords
+                return rng.sample(values, rng.randint(1, len(values)))
+            return [self._sample(items, rng, name, defs) for _ in range(rng.randint(1, 3))]
+        if kind in ("number", "integer"):
+            return rng.randint(0, 10)
+        if kind == "boolean":
+            return rng.random() < 0.5
+        return rng.choice(FAKE_FIELD_VALUES.get(name, ["example"]))
+
+    @staticmethod
+    def _candidate_careers(text: str) -> list[str]:
+        # "1. Title (RIA, fit 0.91)" lines of the Best-Fitting Careers list
+        return re.findall(r"^\d+\. (.+?) \([A-Z]{1,3}, fit", text, re.MULTILINE)
+
+    @staticmethod
+    def _roadmap(text: str, rng: random.Random) -> dict:
+        match = re.search(r'Goal: "(.*?)"', text)
+        goal = match.group(1) if match else "Career goal"
+        labels = ["Current position", "Foundations", "Core skills", "Projects and portfolio", "First role", goal][-rng.randint(4, 6):]
+        labels[0] = "Current position"
+        nodes = [
+            {
+                "id": str(i + 1),
+                "data": {"label": label, "skills": [] if i == 0 else rng.sample(FAKE_FIELD_VALUES["skills"], 2), "experience": f"{i * 3} months"},
+                "position": {"x": i * 300, "y": 0}
+            }
+            for i, label in enumerate(labels)
+        ]
+        edges = [{"id": f"e{i}-{i + 1}", "source": str(i), "target": str(i + 1)} for i in range(1, len(nodes))]
+        return {"nodes": nodes, "edges": edges}
+
+    @staticmethod
+    def _step_details(text: str) -> dict:
+        match = re.search(r'Step: "(.*?)"', text)
+        title = match.group(1) if match else "Step"
+        return {
+            "step": {"id": "1", "title": title, "description": f"Work through {title}."},
+            "skillDetails": [{
+                "name": title,
+                "description": f"What {title} involves and why it matters.",
+                "learningPath": ["Learn the basics", "Practice on small exercises", "Apply it to a project"],
+                "practiceProjects": ["A small beginner project", "A portfolio project"],
+                "resources": [{"type": "course", "title": f"Introduction to {title}"}],
+                "timeToLearn": "2-4 weeks",
+                "difficulty": "Beginner"
+            }],
+            "tips": ["Practice a little every day"],
+            "commonMistakes": ["Skipping the fundamentals"],
+            "successMetrics": ["You can explain it to someone else"]
+        }
+
+
+class ReplayBackend:
+    """Serves responses recorded with LLM_RECORD_PATH.
+
+    A prompt that was recorded gets its own response back; otherwise the
+    recorded responses for the same kind of call are served in turn, so a
+    recording of one session can drive a load test with different users.
+    Raises LookupError if nothing of that kind was recorded.
+    """
+
+    def __init__(self, path: str = LLM_REPLAY_PATH, chunk_chars: int = FAKE_LLM_CHUNK_CHARS):
+        self.chunk_chars = max(chunk_chars, 1)
+        self._by_key: dict[str, str] = {}
+        self._by_kind: dict[str, list[str]] = {}
+        self._next: dict[str, int] = {}
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    self._by_key[record["key"]] = record["text"]
+                    self._by_kind.setdefault(record["kind"], []).append(record["text"])
+        print(f"Loaded {len(self._by_key)} recorded LLM responses from {path}")
+
+    async def generate_content_async(self, prompt, generation_config=None, stream=False):
+        text = self._by_key.get(request_key(prompt, generation_config))
+        if text is None:
+            kind = request_kind(prompt, generation_config)
+            texts = self._by_kind.get(kind)
+            if not texts:
+                raise LookupError(f"No recorded LLM response for a {kind} call")
+            index = self._next.get(kind, 0)
+            self._next[kind] = index + 1
+            text = texts[index % len(texts)]
+        if stream:
+            return self._stream(text)
+        return BackendResponse(text)
+
+    async def _stream(self, text: str):
+        for i in range(0, len(text), self.chunk_chars):
+            yield BackendResponse(text[i:i + self.chunk_chars])
+
+
+class RecordingBackend:
+    """Wraps a backend and appends each completed call to a JSONL file"""
+
+    def __init__(self, backend, path: str = LLM_RECORD_PATH):
+        self.backend = backend
+        self.path = path
+
+    async def generate_content_async(self, prompt, generation_config=None, stream=False):
+        response = await self.backend.generate_content_async(prompt, generation_config=generation_config, stream=stream)
+        if stream:
+            return self._stream(response, prompt, generation_config)
+        self._record(prompt, generation_config, response.text)
+        return response
+
+    async def _stream(self, response, prompt, generation_config):
+        parts = []
+        async for chunk in response:
+            try:
+                parts.append(chunk.text or "")
+            except ValueError:
+                pass
+            yield chunk
+        self._record(prompt, generation_config, "".join(parts))
+
+    def _record(self, prompt, generation_config, text: str):
+        record = {"key": request_key(prompt, generation_config), "kind": request_kind(prompt, generation_config), "text": text}
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+
+def create_backend(name: str = LLM_BACKEND):
+    """The model object LLMClient calls, chosen by LLM_BACKEND"""
+    if name == "fake":
+        backend = FakeBackend()
+    elif name == "replay":
+        backend = ReplayBackend()
+    elif name == "gemini":
+        # Imported here so other backends need neither the API key nor the SDK setup
+        from setup import create_gemini_model
+        backend = create_gemini_model()
+    else:
+        raise ValueError(f"Unknown LLM_BACKEND: {name}")
+    print(f"LLM backend: {name}")
+    if LLM_RECORD_PATH:
+        return RecordingBackend(backend, LLM_RECORD_PATH)
+    return backend
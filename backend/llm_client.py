@@ -0,0 +1,319 @@
+import asyncio
+import os
+import random
+import time
+from dotenv import load_dotenv
+from prometheus_client import Gauge
+from google.api_core.exceptions import ServerError, TooManyRequests
+from llm_backends import create_backend
+from prompt_budget import count_tokens
+from telemetry import span, record_span, record_llm_tokens
+
+load_dotenv()
+
+# Per-call timeout (seconds) and max number of in-flight model calls per worker
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+# Token bucket in front of the model: sustained calls per minute (0 = unlimited) and burst size
+LLM_RATE_LIMIT_PER_MINUTE = float(os.getenv("LLM_RATE_LIMIT_PER_MINUTE", "0"))
+LLM_RATE_LIMIT_BURST = int(os.getenv("LLM_RATE_LIMIT_BURST", "10"))
+# Retries for timeouts, 429s and 5xx, with full-jitter exponential backoff
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.5"))
+LLM_RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", "8"))
+# Consecutive failures that open the circuit, and how long it stays open before a trial call
+LLM_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("LLM_CIRCUIT_FAILURE_THRESHOLD", "5"))
+LLM_CIRCUIT_RESET_SECONDS = float(os.getenv("LLM_CIRCUIT_RESET_SECONDS", "30"))
+# Send a duplicate generate() call if the first has not answered after this long (0 = off)
+LLM_HEDGE_AFTER_SECONDS = float(os.getenv("LLM_HEDGE_AFTER_SECONDS", "0"))
+
+
+class CircuitOpenError(Exception):
+    """The model has been failing; calls are rejected until the circuit resets"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"LLM circuit open, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+def is_retryable(e: Exception) -> bool:
+    return isinstance(e, (asyncio.TimeoutError, TooManyRequests, ServerError))
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second on average and up to `capacity` at once"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = None
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        loop = asyncio.get_running_loop()
+        # Waiters queue on the lock so they are served in arrival order
+        async with self._lock:
+            while True:
+                now = loop.time()
+                if self._updated is not None:
+                    self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class CircuitBreaker:
+    """closed -> open after `threshold` consecutive failures -> half-open after
+    `reset_seconds`, when one trial call decides whether it closes again"""
+
+    def __init__(self, threshold: int, reset_seconds: float):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go out now"""
+        if self.state == "closed":
+            return
+        now = asyncio.get_running_loop().time()
+        if self.state == "open":
+            remaining = self._opened_at + self.reset_seconds - now
+            if remaining > 0:
+                raise CircuitOpenError(remaining)
+            self.state = "half_open"
+        if self._trial_in_flight:
+            raise CircuitOpenError(self.reset_seconds)
+        self._trial_in_flight = True
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+        self._trial_in_flight = False
+
+    def record_cancelled(self):
+        self._trial_in_flight = False
+
+    def record_error(self, e: Exception):
+        """Only upstream trouble counts towards opening the circuit; a bad
+        request from one caller (4xx) must not lock out everyone else"""
+        if is_retryable(e):
+            self.record_failure()
+        else:
+            self.record_cancelled()
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.state == "half_open" or (self.state == "closed" and self.failures >= self.threshold):
+            self.state = "open"
+            self.opened += 1
+            self._opened_at = asyncio.get_running_loop().time()
+            print(f"LLM circuit opened after {self.failures} consecutive failures")
+
+
+class LLMClient:
+    """Non-blocking, resilient access to the shared model backend.
+
+    All agent calls go through here so they never block the event loop and share
+    a single concurrency limit and rate limit. Each attempt has a timeout;
+    timeouts, 429s and 5xx are retried with jittered backoff, and repeated
+    failures open a circuit so callers fall back locally instead of queueing
+    behind a struggling upstream. generate() can optionally hedge slow calls.
+    """
+
+    def __init__(self, model=None, timeout: float = LLM_TIMEOUT_SECONDS, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 rate_per_minute: float = LLM_RATE_LIMIT_PER_MINUTE, burst: int = LLM_RATE_LIMIT_BURST,
+                 max_retries: int = LLM_MAX_RETRIES, hedge_after: float = LLM_HEDGE_AFTER_SECONDS,
+                 failure_threshold: int = LLM_CIRCUIT_FAILURE_THRESHOLD, reset_seconds: float = LLM_CIRCUIT_RESET_SECONDS):
+        # Any object with Gemini's generate_content_async (see llm_backends)
+        self.model = model if model is not None else create_backend()
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.hedge_after = hedge_after
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.rate_limiter = TokenBucket(rate_per_minute / 60, burst)
+        self.breaker = CircuitBreaker(failure_threshold, reset_seconds)
+        self.retries = 0
+        self.hedges = 0
+
+    async def generate(self, prompt, generation_config=None, timeout: float | None = None):
+        """Run generate_content_async with rate limiting, retries, the circuit
+        breaker and (if enabled) hedging.
+
+        Raises CircuitOpenError while the circuit is open, otherwise the last
+        error once retries are exhausted (asyncio.TimeoutError on timeouts).
+        """
+        async def attempt():
+            return await self._call(
+                lambda: self.model.generate_content_async(prompt, generation_config=generation_config),
+                timeout or self.timeout
+            )
+        with span("llm", "generate") as handle:
+            response = await self._with_retries(lambda: self._hedged(attempt))
+            record_llm_tokens(*_token_counts(prompt, _chunk_text(response), getattr(response, "usage_metadata", None)), handle)
+        return response
+
+    async def stream(self, prompt, generation_config=None, timeout: float | None = None):
+        """Yield text chunks from a streaming generate_content_async call.
+
+        The timeout applies to the whole stream, and the concurrency slot is
+        held until the stream is exhausted or closed (but not while backing off
+        between attempts). Only opening the stream is retried; an error after
+        the first chunk is raised to the caller.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (timeout or self.timeout)
+        started, started_ns = time.perf_counter(), time.time_ns()
+
+        async def open_stream():
+            self.breaker.before_call()
+            try:
+                await self.rate_limiter.acquire()
+                await self._semaphore.acquire()
+                try:
+                    return await asyncio.wait_for(
+                        self.model.generate_content_async(prompt, generation_config=generation_config, stream=True),
+                        max(deadline - loop.time(), 0)
+                    )
+                except BaseException:
+                    self._semaphore.release()
+                    raise
+            except asyncio.CancelledError:
+                self.breaker.record_cancelled()
+                raise
+            except Exception as e:
+                self.breaker.record_error(e)
+                raise
+
+        # A successful open_stream() hands over its concurrency slot, released once the stream ends
+        response = await self._with_retries(open_stream)
+        text, usage = "", None
+        try:
+            chunks = response.__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), max(deadline - loop.time(), 0))
+                except StopAsyncIteration:
+                    break
+                except Exception as e:
+                    self.breaker.record_error(e)
+                    raise
+                # Gemini reports usage on the last chunk
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                chunk_text = _chunk_text(chunk)
+                if chunk_text:
+                    text += chunk_text
+                    yield chunk_text
+        except (asyncio.CancelledError, GeneratorExit):
+            # Client went away; the upstream did nothing wrong
+            self.breaker.record_cancelled()
+            raise
+        finally:
+            self._semaphore.release()
+            prompt_tokens, response_tokens = _token_counts(prompt, text, usage)
+            record_llm_tokens(prompt_tokens, response_tokens)
+            record_span("llm", "stream", started, started_ns, **{
+                "llm.prompt_tokens": prompt_tokens, "llm.response_tokens": response_tokens
+            })
+        self.breaker.record_success()
+
+    def status(self) -> dict:
+        return {
+            "backend": type(self.model).__name__,
+            "circuit": self.breaker.state,
+            "circuit_opened": self.breaker.opened,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "in_flight": self.max_concurrency - self._semaphore._value
+        }
+
+    async def _call(self, make_request, timeout: float):
+        """One attempt under the breaker, rate limit and concurrency limit"""
+        self.breaker.before_call()
+        # Everything after before_call() must end in a record_* call, or a
+        # half-open circuit would wait for its trial call forever
+        try:
+            await self.rate_limiter.acquire()
+            async with self._semaphore:
+                response = await asyncio.wait_for(make_request(), timeout)
+        except asyncio.CancelledError:
+            # A losing hedge, or a caller that went away while queued, says nothing about the upstream
+            self.breaker.record_cancelled()
+            raise
+        except Exception as e:
+            self.breaker.record_error(e)
+            raise
+        self.breaker.record_success()
+        return response
+
+    async def _with_retries(self, attempt):
+        retries = 0
+        while True:
+            try:
+                return await attempt()
+            except Exception as e:
+                if isinstance(e, CircuitOpenError) or not is_retryable(e) or retries >= self.max_retries:
+                    raise
+                retries += 1
+                self.retries += 1
+                # Full jitter keeps retrying workers from hitting the upstream in lockstep
+                delay = random.uniform(0, min(LLM_RETRY_MAX_SECONDS, LLM_RETRY_BASE_SECONDS * 2 ** retries))
+                print(f"LLM call failed ({type(e).__name__}); retry {retries}/{self.max_retries} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def _hedged(self, attempt):
+        if self.hedge_after <= 0:
+            return await attempt()
+        tasks = {asyncio.create_task(attempt())}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_after)
+            if not done:
+                self.hedges += 1
+                tasks.add(asyncio.create_task(attempt()))
+            error = None
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+def _token_counts(prompt, text: str, usage) -> tuple[int, int]:
+    """(prompt, response) tokens from the backend's usage metadata, else estimated"""
+    prompt_tokens = getattr(usage, "prompt_token_count", 0) or count_tokens(prompt if isinstance(prompt, str) else str(prompt))
+    response_tokens = getattr(usage, "candidates_token_count", 0) or count_tokens(text)
+    return prompt_tokens, response_tokens
+
+
+def _chunk_text(chunk) -> str:
+    # .text raises on chunks without text parts (e.g. the final finish_reason chunk)
+    try:
+        return chunk.text or ""
+    except ValueError:
+        return ""
+
+
+# Shared client so every agent counts against the same limit
+llm_client = LLMClient()
+
+# Exposed on /metrics next to the request and span metrics
+Gauge("llm_in_flight", "LLM calls currently holding a concurrency slot").set_function(lambda: llm_client.status()["in_flight"])
+Gauge("llm_circuit_open", "1 while the LLM circuit breaker rejects calls").set_function(lambda: float(llm_client.breaker.state != "closed"))
+Gauge("llm_retries", "LLM call retries since start").set_function(lambda: llm_client.retries)
+Gauge("llm_hedges", "Hedged LLM calls since start").set_function(lambda: llm_client.hedges)
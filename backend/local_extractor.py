@@ -0,0 +1,184 @@
+import os
+import re
+from dotenv import load_dotenv
+from profile_merge import empty_profile
+
+load_dotenv()
+
+# Try the rule-based extractor before calling the model for profile extraction
+LOCAL_PROFILE_EXTRACTION = os.getenv("LOCAL_PROFILE_EXTRACTION", "true").lower() in ("1", "true", "yes")
+# Longer answers always go to the model; they rarely consist of lexicon terms only
+LOCAL_EXTRACTION_MAX_WORDS = int(os.getenv("LOCAL_EXTRACTION_MAX_WORDS", "15"))
+# Share of an answer's content words the rules must account for to skip the model
+LOCAL_EXTRACTION_MIN_CONFIDENCE = float(os.getenv("LOCAL_EXTRACTION_MIN_CONFIDENCE", "0.75"))
+
+
+def _ordinal(number: str, suffix: str | None) -> str:
+    """Keeps the user's own ordinal ("2nd"), otherwise adds the right one"""
+    if suffix:
+        return number + suffix
+    value = int(number)
+    suffix = "th" if value % 100 in (11, 12, 13) else {1: "st", 2: "nd", 3: "rd"}.get(value % 10, "th")
+    return f"{value}{suffix}"
+
+
+def _grade(number: str, suffix: str | None = None) -> str:
+    return f"{_ordinal(number, suffix)} grade"
+
+
+# "bachelor", "master" and the short B.E./B.A./M.S. forms are also ordinary words ("be",
+# "master a skill"), so they only count right after a word about studying or right
+# before one about degrees ("doing my bachelors", "B.A. in history", "master's degree")
+_STUDY_BEFORE = r"\b(?:studying|study|pursuing|doing|completed|finished|did|earned|year\s+of)\s+(?:(?:a|an|my|the)\s+)?"
+_DEGREE_AFTER = r"\s*(?:degree|programme|program|course|student|graduate|in\s+\w|of\s+(?:science|arts|engineering|technology|commerce|business|computer))"
+
+
+def _degree(names: str) -> str:
+    return rf"(?:{_STUDY_BEFORE}(?:{names})(?![\w.])|(?<![\w.])(?:{names}){_DEGREE_AFTER})"
+
+
+# (pattern, label); a callable label gets the match groups, a string one is formatted with them
+EDUCATION_PATTERNS = [
+    (r"\b(\d{1,2})(st|nd|rd|th)?\s*(?:grade|std|standard|class)\b", _grade),
+    (r"\b(?:grade|class|std|standard)\s*(\d{1,2})(st|nd|rd|th)?\b", _grade),
+    (r"\bhigh\s*school\b", "High school"),
+    (r"\bsecondary\s*school\b", "Secondary school"),
+    (r"\b(?:ph\.?\s?d|doctorate)\b", "PhD"),
+    (r"\b(?:m\.?\s?tech|m\.?\s?sc|mba)\b", "Master's degree"),
+    (_degree(r"master(?:'?s)?|m\.\s?[sa]\.?"), "Master's degree"),
+    (r"\b(?:undergrad(?:uate)?|b\.?\s?tech|b\.?\s?sc|b\.?\s?com|bca)\b", "Bachelor's degree"),
+    (_degree(r"bachelor(?:'?s)?|b\.\s?[ea]\.?"), "Bachelor's degree"),
+    (r"\b(?:college|university)\b", "College"),
+    (r"\bdiploma\b", "Diploma"),
+    (r"\bbootcamp\b", "Bootcamp"),
+]
+
+EXPERIENCE_PATTERNS = [
+    (r"\b(\d{1,2})\+?\s*(?:years?|yrs?)\b(?:\s*(?:of\s*)?(?:work\s*)?experience)?", "{0} years"),
+    (r"\b(?:fresher|fresh\s*graduate|no\s*(?:work\s*)?experience)\b", "Entry level"),
+    (r"\binternships?\b", "Internship"),
+    (r"\bstudent\b", "Student"),
+]
+
+# Terms that are usually skills; "good at X" / strength questions also route interests here
+SKILL_TERMS = [
+    "python", "java", "javascript", "typescript", "c++", "c#", "sql", "html", "css", "react", "excel",
+    "programming", "coding", "web development", "data analysis", "machine learning", "statistics",
+    "math", "maths", "mathematics", "problem solving", "communication", "public speaking", "leadership",
+    "teamwork", "writing", "editing", "drawing", "painting", "design", "graphic design", "photography",
+    "video editing", "sales", "marketing", "accounting", "teaching", "research", "negotiation", "cooking",
+]
+# Terms that are usually interests
+INTEREST_TERMS = [
+    "music", "art", "arts", "sports", "football", "cricket", "basketball", "gaming", "video games", "games",
+    "reading", "books", "movies", "films", "travel", "travelling", "traveling", "dance", "dancing", "singing",
+    "science", "physics", "chemistry", "biology", "history", "geography", "economics", "psychology",
+    "technology", "computers", "robotics", "electronics", "space", "astronomy", "nature", "animals",
+    "environment", "fashion", "business", "finance", "politics", "law", "medicine", "health", "fitness",
+    "cars", "engineering", "helping people", "social work", "languages", "literature", "poetry", "theatre",
+]
+
+NEGATION = re.compile(r"\b(?:don'?t|do not|dont|hate|hated|dislike|not (?:a fan of|into|interested in|good at)|never liked|can'?t stand|bored by|boring)\b")
+CLAUSE_SPLIT = re.compile(r"[,.;!?]|\bbut\b|\bhowever\b")
+SKILL_QUESTION = re.compile(r"\b(?:good at|skills?|strengths?|abilities|ability|talents?|excel)\b")
+
+# Words that carry no profile information by themselves
+FILLER_WORDS = {
+    "i", "im", "i'm", "am", "is", "are", "was", "a", "an", "the", "and", "or", "of", "in", "on", "at", "to",
+    "my", "me", "it", "its", "that", "this", "with", "for", "about", "also", "too", "very", "really", "quite",
+    "currently", "now", "right", "like", "love", "enjoy", "enjoying", "prefer", "doing", "do", "playing", "play",
+    "studying", "study", "pursuing", "completed", "finished", "year", "final", "first", "second", "third",
+    "fourth", "yes", "yeah", "yep", "no", "nope", "not", "sure", "ok", "okay", "maybe", "some", "things",
+    "thing", "stuff", "lot", "lots", "much", "good", "great", "well", "pretty", "bit", "kind", "sort", "mostly",
+    "mainly", "think", "guess", "know", "don't", "dont", "hate", "dislike", "fan", "into",
+    "interested", "never", "liked", "can't", "stand", "bored", "by", "boring", "have", "has", "had", "been",
+    "working", "work", "worked", "as", "student", "experience", "degree", "from", "school", "but", "however",
+    "would", "say", "probably", "definitely", "especially", "something", "anything", "all", "any",
+}
+
+
+def _compile_terms(terms: list[str]) -> re.Pattern:
+    # Longest first so "graphic design" wins over "design"
+    alternatives = "|".join(re.escape(term) for term in sorted(terms, key=len, reverse=True))
+    return re.compile(rf"(?<![\w+#])(?:{alternatives})(?![\w+#])")
+
+
+class LocalProfileExtractor:
+    """Rule- and lexicon-based profile extraction for short answers.
+
+    extract() returns the same shape as extract_profile_info, or None when the
+    answer is too long or too much of it is not understood by the rules, in
+    which case the model should be asked instead.
+    """
+
+    def __init__(self, max_words: int = LOCAL_EXTRACTION_MAX_WORDS, min_confidence: float = LOCAL_EXTRACTION_MIN_CONFIDENCE):
+        self.max_words = max_words
+        self.min_confidence = min_confidence
+        self._education = [(re.compile(pattern), label) for pattern, label in EDUCATION_PATTERNS]
+        self._experience = [(re.compile(pattern), label) for pattern, label in EXPERIENCE_PATTERNS]
+        self._skills = _compile_terms(SKILL_TERMS)
+        self._interests = _compile_terms(INTEREST_TERMS)
+
+    def extract(self, question: str, answer: str, best_effort: bool = False) -> dict | None:
+        """best_effort skips the length and confidence checks (used when the model is unavailable)"""
+        text = " ".join((answer or "").lower().split())
+        words = re.findall(r"[\w+#']+", text)
+        if len(words) > self.max_words and not best_effort:
+            return None
+
+        profile = empty_profile()
+        # Character spans the rules have accounted for
+        covered = []
+
+        for pattern, label in self._education:
+            match = pattern.search(text)
+            if match:
+                profile["education"] = label(*match.groups()) if callable(label) else label.format(*match.groups())
+                covered.append(match.span())
+                break
+        for pattern, label in self._experience:
+            match = pattern.search(text)
+            if match:
+                profile["experience_level"] = label.format(*match.groups())
+                covered.append(match.span())
+                break
+
+        skills_question = bool(SKILL_QUESTION.search((question or "").lower()))
+        offset = 0
+        for clause in CLAUSE_SPLIT.split(text):
+            start = text.find(clause, offset)
+            offset = start + len(clause)
+            negated = bool(NEGATION.search(clause))
+            for lexicon, field in [(self._skills, "skills"), (self._interests, "interests")]:
+                for match in lexicon.finditer(clause):
+                    if negated:
+                        target = "dislikes"
+                    elif skills_question:
+                        target = "skills"
+                    else:
+                        target = field
+                    if match.group() not in profile[target]:
+                        profile[target].append(match.group())
+                    covered.append((start + match.start(), start + match.end()))
+
+        if not best_effort and self._confidence(text, covered) < self.min_confidence:
+            return None
+        return profile
+
+    @staticmethod
+    def _confidence(text: str, covered: list[tuple[int, int]]) -> float:
+        """Share of content words that fall inside a matched span (1.0 if there are none)"""
+        content = [
+            match for match in re.finditer(r"[\w+#']+", text)
+            if match.group() not in FILLER_WORDS
+        ]
+        if not content:
+            return 1.0
+        understood = sum(
+            1 for match in content
+            if any(start <= match.start() and match.end() <= end for start, end in covered)
+        )
+        return understood / len(content)
+
+
+local_extractor = LocalProfileExtractor()
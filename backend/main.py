@@ -1,21 +1,38 @@
-from fastapi import FastAPI, HTTPException, Depends, Body
+from fastapi import FastAPI, HTTPException, Depends, Body, Header, Query, Response, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from pydantic import BaseModel, Field
 import jwt
 import os
+import json
+import csv
+import asyncio
+import base64
+import secrets
 from datetime import datetime, timedelta
-from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from typing import List, Optional
+from sqlalchemy import and_, delete, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm.attributes import flag_modified
 from agent import DynamicCareerGuidanceAgent
 from roadmap_agent import RoadmapAgent
-from model import User, UserCreate, UserResponse, AnswerRequest, HexacoScores, HollandScores, Roadmap, RoadmapRequest, RoadmapStep, StepDetailsRequest, Conversation, ConversationCreate, ConversationResponse, GenerateRecommendationsRequest, Message
-from db import get_db, init_db, DBUser, DBHexacoScores, DBHollandScores, DBRoadmap, DBConversation
+from model import User, UserCreate, UserResponse, AnswerRequest, HexacoScores, HollandScores, Roadmap, RoadmapRequest, RoadmapStep, StepDetails, StepDetailsRequest, Conversation, ConversationCreate, ConversationResponse, CareerRecommendationsResponse, GenerateRecommendationsRequest, Message, CareerMatchResponse, RecommendationJob, RecommendationJobItem, RecommendationJobRequest, RecommendationJobResults
+from db import AsyncSessionLocal, async_engine, get_db, init_db, pool_status, dispose_engine, DBUser, DBHexacoScores, DBHollandScores, DBRoadmap, DBConversation, DBProfileExtractionJob, DBRecommendationJob, DBRecommendationJobItem
+from profile_merge import empty_profile, merge_profile
+from career_catalog import career_catalog
+from passwords import password_hasher
+from llm_client import llm_client, CircuitOpenError
+from conversation_store import ConversationLog, backfill_conversation, history_entry
+from conversation_summary import ConversationSummarizer, PROMPT_HISTORY_MAX_ENTRIES
+from prompt_registry import prompt_registry, system_entry, CAREER_GUIDANCE_SYSTEM_PROMPT
+from profile_queue import ProfileExtractionQueue, DEFERRED_PROFILE_EXTRACTION
+from recommendation_jobs import RecommendationJobRunner, parse_profiles_csv, RECOMMENDATION_JOB_MAX_ITEMS
+from recommendation_snapshots import RecommendationPregenerator, load_assessment_scores, recommendation_fingerprint
+from response_cache import LRUCache, StepDetailsCache, RoadmapCache, roadmap_cache_key
+from telemetry import TelemetryMiddleware, instrument_engine, metrics_response, shutdown_tracing
 import uuid
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 # JWT settings
@@ -23,6 +40,17 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "43200"))  # Default: 30 days
 
+# Operations endpoints (cache invalidation) require this in an X-Admin-Token header; empty disables them
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# Short-lived per-worker cache of authenticated users
+AUTH_CACHE_TTL_SECONDS = int(os.getenv("AUTH_CACHE_TTL_SECONDS", "30"))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+
+# GET /conversations page size
+CONVERSATION_PAGE_SIZE = 50
+CONVERSATION_PAGE_SIZE_MAX = 200
+
 app = FastAPI()
 
 app.add_middleware(
@@ -31,17 +59,61 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
+# Request latency per route template, and the request span for tracing
+app.add_middleware(TelemetryMiddleware)
 
 # Initialize database
 init_db()
+instrument_engine(async_engine.sync_engine)
+
+def sse_event(event: str, data) -> str:
+    """Format one server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def encode_conversation_cursor(updated_at: datetime, conversation_id: str) -> str:
+    raw = f"{updated_at.isoformat()}|{conversation_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_conversation_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        updated_at, conversation_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|", 1)
+        return datetime.fromisoformat(updated_at), conversation_id
+    except (ValueError, UnicodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def require_admin_token(x_admin_token: Optional[str] = Header(default=None)):
+    """Dependency for operations endpoints that act on data shared by all users"""
+    if not ADMIN_TOKEN or not x_admin_token or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+def sse_response(events) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        # Disable proxy buffering so events reach the client as they are produced
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 class CareerGuidanceRouter:
     def __init__(self):
         self.agent = DynamicCareerGuidanceAgent()  # Your existing agent class
         self.roadmap_agent = RoadmapAgent() # Initialize RoadmapAgent
+        self.profile_queue = ProfileExtractionQueue(self.agent)
+        self.summarizer = ConversationSummarizer()
+        self.recommendation_jobs = RecommendationJobRunner(self.agent, self.profile_queue)
+        self.pregenerator = RecommendationPregenerator(self.agent, self.profile_queue)
+        self.step_details_cache = StepDetailsCache()
+        self.roadmap_cache = RoadmapCache()
+        # Resolved principals keyed by token subject, per worker
+        self.auth_cache = LRUCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL_SECONDS)
     
-    async def get_current_user(self, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    async def system_prompt_id(self) -> str:
+        """Registry id of the agent's current system prompt"""
+        return await prompt_registry.register(CAREER_GUIDANCE_SYSTEM_PROMPT, self.agent.system_prompt)
+    
+    async def get_current_user(self, token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
         credentials_exception = HTTPException(
             status_code=401,
             detail="Could not validate credentials",
@@ -53,51 +125,70 @@ class CareerGuidanceRouter:
             if user_email is None:
                 raise credentials_exception
             
-            # Query user from database
-            db_user = db.query(DBUser).filter(DBUser.email == user_email).first()
-            if db_user is None:
-                raise credentials_exception
-                
-            # Convert DB user to Pydantic model
-            user = User(
-                id=db_user.id,
-                username=db_user.username,
-                email=db_user.email,
-                hashed_password=db_user.hashed_password,
-                conversation_history=db_user.conversation_history,
-                user_profile=db_user.user_profile,
-                career_recommendations=db_user.career_recommendations,
-                additional_advice=db_user.additional_advice
-            )
-            
-            # Get hexaco scores if they exist
-            db_hexaco = db.query(DBHexacoScores).filter(DBHexacoScores.user_id == db_user.id).first()
-            if db_hexaco:
-                user.hexaco_scores = HexacoScores(
-                    honesty_humility=db_hexaco.honesty_humility,
-                    emotionality=db_hexaco.emotionality,
-                    extraversion=db_hexaco.extraversion,
-                    agreeableness=db_hexaco.agreeableness,
-                    conscientiousness=db_hexaco.conscientiousness,
-                    openness_to_experience=db_hexaco.openness_to_experience
-                )
+            cached_user = self.auth_cache.get(user_email)
+            if cached_user is not None:
+                # Copy so handlers that set scores on current_user don't touch the cache
+                return cached_user.model_copy()
             
-            # Get holland scores if they exist
-            db_holland = db.query(DBHollandScores).filter(DBHollandScores.user_id == db_user.id).first()
-            if db_holland:
-                user.holland_scores = HollandScores(
-                    realistic=db_holland.realistic,
-                    investigative=db_holland.investigative,
-                    artistic=db_holland.artistic,
-                    social=db_holland.social,
-                    enterprising=db_holland.enterprising,
-                    conventional=db_holland.conventional
-                )
+            user = await self._load_principal(user_email, db)
+            if user is None:
+                raise credentials_exception
+            self.auth_cache.set(user_email, user)
                 
-            return user
+            return user.model_copy()
         except jwt.PyJWTError:
             raise credentials_exception
 
+    async def _load_principal(self, user_email: str, db: AsyncSession) -> User | None:
+        """Load the authenticated user and both score rows in one query.
+
+        The large JSON columns (conversation_history, user_profile, ...) and the
+        password hash are not loaded; use load_user() where they are needed.
+        """
+        result = await db.execute(select(
+            DBUser.id,
+            DBUser.username,
+            DBUser.email,
+            DBHexacoScores.id.label("hexaco_id"),
+            *[getattr(DBHexacoScores, field) for field in HexacoScores.model_fields],
+            DBHollandScores.id.label("holland_id"),
+            *[getattr(DBHollandScores, field) for field in HollandScores.model_fields]
+        ).outerjoin(
+            DBHexacoScores, DBHexacoScores.user_id == DBUser.id
+        ).outerjoin(
+            DBHollandScores, DBHollandScores.user_id == DBUser.id
+        ).where(DBUser.email == user_email))
+        row = result.first()
+        
+        if row is None:
+            return None
+        
+        user = User(id=row.id, username=row.username, email=row.email, hashed_password="")
+        if row.hexaco_id is not None:
+            user.hexaco_scores = HexacoScores(**{field: getattr(row, field) for field in HexacoScores.model_fields})
+        if row.holland_id is not None:
+            user.holland_scores = HollandScores(**{field: getattr(row, field) for field in HollandScores.model_fields})
+        return user
+
+    def invalidate_user(self, user_email: str):
+        """Drop a cached principal after its user row or scores change"""
+        self.auth_cache.delete(user_email)
+
+    async def load_user(self, current_user: User, db: AsyncSession) -> User:
+        """The full User model, including the columns get_current_user skips"""
+        db_user = await db.get(DBUser, current_user.id)
+        return current_user.model_copy(update={
+            "hashed_password": db_user.hashed_password,
+            "conversation_history": db_user.conversation_history or [],
+            "user_profile": db_user.user_profile or {},
+            "career_recommendations": db_user.career_recommendations or [],
+            "additional_advice": db_user.additional_advice or ""
+        })
+
+    async def load_user_profile(self, current_user: User, db: AsyncSession) -> dict:
+        user_profile = await db.scalar(select(DBUser.user_profile).where(DBUser.id == current_user.id))
+        return user_profile or {}
+
     async def generate_career_roadmap(self, conversation_history: list | None, user_profile: dict | None, career_goal: str) -> Roadmap:
         """Generate a career roadmap using conversation context and user profile when available.
 
@@ -107,8 +198,105 @@ class CareerGuidanceRouter:
         """
         return await self.roadmap_agent.generate_career_roadmap(conversation_history, user_profile, career_goal)
 
-    async def get_roadmap_step_details(self, step_details_request: StepDetailsRequest) -> dict:
-        return await self.roadmap_agent.get_roadmap_step_details(step_details_request.step, step_details_request.overall_goal)
+    async def stream_cached_roadmap(self, roadmap: Roadmap):
+        """Replay a cached roadmap as the same SSE events a generated one produces"""
+        for node in roadmap.nodes:
+            yield sse_event("node", node.model_dump())
+        for edge in roadmap.edges:
+            yield sse_event("edge", edge.model_dump())
+        yield sse_event("roadmap", roadmap.model_dump())
+
+    async def stream_career_roadmap(self, conversation_history: list | None, user_profile: dict | None, career_goal: str, current_user: User):
+        """SSE events for a roadmap; the roadmap is persisted once the model stream closes"""
+        try:
+            async for event, data in self.roadmap_agent.stream_career_roadmap(conversation_history, user_profile, career_goal):
+                if event == "roadmap":
+                    roadmap = data
+                else:
+                    yield sse_event(event, data.model_dump())
+        except Exception:
+            yield sse_event("error", {"detail": "Failed to generate roadmap"})
+            return
+
+        async with AsyncSessionLocal() as db:
+            await self.save_roadmap(career_goal, user_profile, roadmap, current_user, db)
+            await db.commit()
+
+        yield sse_event("roadmap", roadmap.model_dump())
+
+    async def load_roadmap_context(self, request: RoadmapRequest, current_user: User, db: AsyncSession):
+        """Returns (conversation_history, user_profile) to generate a roadmap from"""
+        conversation_history = None
+        user_profile = {}
+
+        if getattr(request, "conversation_id", None):
+            db_conversation = await db.scalar(select(DBConversation).where(
+                DBConversation.id == request.conversation_id,
+                DBConversation.user_id == current_user.id
+            ))
+            if db_conversation:
+                # Wait for background profile extraction before reading the profile
+                if await self.profile_queue.wait_for_conversation(db_conversation.id):
+                    await db.refresh(db_conversation)
+                if await backfill_conversation(db, db_conversation):
+                    await db.commit()
+                conversation_history = await ConversationLog(db, db_conversation.id).context(db_conversation, PROMPT_HISTORY_MAX_ENTRIES)
+                # prefer conversation-scoped user_profile if present
+                user_profile = db_conversation.user_profile or user_profile
+
+        if not user_profile:
+            user_profile = await self.load_user_profile(current_user, db)
+
+        return conversation_history, user_profile
+
+    async def find_cached_roadmap(self, career_goal: str, user_profile: dict, current_user: User, db: AsyncSession) -> Roadmap | None:
+        """Return the user's previous roadmap for the same goal, start and profile, if any"""
+        cache_key = roadmap_cache_key(career_goal, self._career_start(user_profile), user_profile)
+        db_roadmap = await self.roadmap_cache.lookup(db, current_user.id, cache_key)
+        if db_roadmap is None:
+            return None
+        return Roadmap(nodes=db_roadmap.nodes or [], edges=db_roadmap.edges or [])
+
+    async def save_roadmap(self, career_goal: str, user_profile: dict, roadmap: Roadmap, current_user: User, db: AsyncSession) -> DBRoadmap:
+        # Persist roadmap; derive career_start from the profile if available
+        career_start = self._career_start(user_profile)
+
+        db_roadmap = DBRoadmap(
+            id=str(uuid.uuid4()),
+            user_id=current_user.id,
+            career_goal=career_goal,
+            career_start=career_start,
+            nodes=[node.model_dump() for node in roadmap.nodes],
+            edges=[edge.model_dump() for edge in roadmap.edges]
+        )
+
+        db.add(db_roadmap)
+        await db.flush()
+        await self.roadmap_cache.store(db, current_user.id, roadmap_cache_key(career_goal, career_start, user_profile), db_roadmap)
+        return db_roadmap
+
+    def _career_start(self, user_profile: dict | None) -> str:
+        career_start = ""
+        try:
+            if isinstance(user_profile, dict):
+                career_start = user_profile.get("education_level", "") or user_profile.get("education", "")
+        except Exception:
+            career_start = ""
+        return career_start
+
+    async def get_roadmap_step_details(self, step_details_request: StepDetailsRequest, db: AsyncSession) -> StepDetails:
+        step = step_details_request.step
+        overall_goal = step_details_request.overall_goal
+
+        async def generate():
+            details = await self.roadmap_agent.get_roadmap_step_details(step, overall_goal)
+            return details.model_dump()
+
+        payload = await self.step_details_cache.get_or_generate(step.title, step.skills, overall_goal, db, generate)
+        details = StepDetails(**payload)
+        # Cached details may have been generated for another roadmap's copy of this step
+        details.step = step
+        return details
 
     def create_access_token(self, data: dict):
         to_encode = data.copy()
@@ -117,18 +305,18 @@ class CareerGuidanceRouter:
         encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
         return encoded_jwt
 
-    async def register_user(self, user: UserCreate, db: Session):
+    async def register_user(self, user: UserCreate, db: AsyncSession):
         # Check if user already exists
-        existing_user = db.query(DBUser).filter(DBUser.email == user.email).first()
+        existing_user = await db.scalar(select(DBUser.id).where(DBUser.email == user.email))
         if existing_user:
             raise HTTPException(status_code=400, detail="Email already registered")
         
         # Create new user
         user_id = str(uuid.uuid4())
-        hashed_password = pwd_context.hash(user.password)
+        hashed_password = await password_hasher.hash(user.password)
         
-        # Initialize conversation history with system prompt
-        conversation_history = [{"role": "system", "parts": [self.agent.system_prompt]}]
+        # Initialize conversation history with a reference to the system prompt
+        conversation_history = [system_entry(await self.system_prompt_id())]
         
         # Create default user profile
         user_profile = {
@@ -155,170 +343,194 @@ class CareerGuidanceRouter:
         
         # Add to database and commit
         db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
+        await db.commit()
+        self.invalidate_user(user.email)
         
         return {"message": "User created successfully"}
 
-    async def get_next_question(self, conversation_id: str, current_user: User, db: Session):
-        # Get conversation from database
-        db_conversation = db.query(DBConversation).filter(
-            DBConversation.id == conversation_id,
-            DBConversation.user_id == current_user.id
-        ).first()
-        
-        if not db_conversation:
-            raise HTTPException(status_code=404, detail="Conversation not found")
-        
-        # Initialize conversation history if empty
-        if not db_conversation.conversation_history:
-            db_conversation.conversation_history = [{"role": "system", "parts": [self.agent.system_prompt]}]
-            flag_modified(db_conversation, "conversation_history")
+    async def get_next_question(self, conversation_id: str, current_user: User, db: AsyncSession):
+        db_conversation, log, history = await self._load_conversation_for_turn(conversation_id, current_user, db)
         
         # Generate next question
-        question = self.agent.generate_question(
-            db_conversation.conversation_history,
+        question = await self.agent.generate_question(
+            history,
             current_user.hexaco_scores,
             current_user.holland_scores
         )
         
-        # Initialize messages array if needed
-        if not db_conversation.messages:
-            db_conversation.messages = []
-            flag_modified(db_conversation, "messages")
-        
-        # Add agent message to messages array
-        agent_message = {
-            "id": str(uuid.uuid4()),
-            "type": "agent",
-            "content": question,
-            "timestamp": datetime.utcnow().isoformat()
-        }
-        db_conversation.messages.append(agent_message)
-        flag_modified(db_conversation, "messages")
+        await self._append_agent_message(db_conversation, log, question)
+        await db.commit()
+        self.summarizer.schedule(db_conversation.id, history)
         
-        db_conversation.conversation_history.append({
-            "role": "assistant",
-            "parts": [question]
-        })
-        flag_modified(db_conversation, "conversation_history")
+        return UserResponse(question=question)
+
+    async def stream_next_question(self, conversation_id: str, current_user: User):
+        """SSE version of get_next_question; persists the same state once the question is complete"""
+        async with AsyncSessionLocal() as db:
+            db_conversation, log, history = await self._load_conversation_for_turn(conversation_id, current_user, db)
+            
+            async for event, data in self.agent.stream_question(
+                history,
+                current_user.hexaco_scores,
+                current_user.holland_scores
+            ):
+                if event == "token":
+                    yield sse_event("token", {"text": data})
+                elif event == "reset":
+                    # The streamed text is being replaced by a fallback question
+                    yield sse_event("reset", {})
+                else:
+                    question = data
+            
+            await self._append_agent_message(db_conversation, log, question)
+            await db.commit()
+            self.summarizer.schedule(db_conversation.id, history)
+            
+            yield sse_event("question", UserResponse(question=question).model_dump())
+
+    async def submit_answer(self, answer: str, conversation_id: str, current_user: User, db: AsyncSession):
+        db_conversation, log, history = await self._load_conversation_for_turn(conversation_id, current_user, db)
+        history, last_question = await self._append_user_answer(log, history, answer)
         
-        db_conversation.updated_at = datetime.utcnow()
-        db.commit()
+        extraction_job = None
+        if DEFERRED_PROFILE_EXTRACTION:
+            # Only the next question is on the critical path; extraction runs from the queue
+            next_question = await self.agent.generate_question(
+                history,
+                current_user.hexaco_scores,
+                current_user.holland_scores
+            )
+            extraction_job = self.profile_queue.enqueue(db, db_conversation.id, last_question, answer)
+        else:
+            # Profile extraction and the next question are independent (generate_question
+            # only reads the conversation history), so run both model calls concurrently
+            response, next_question = await asyncio.gather(
+                self.agent.extract_profile_info(last_question, answer),
+                self.agent.generate_question(
+                    history,
+                    current_user.hexaco_scores,
+                    current_user.holland_scores
+                )
+            )
+            self._merge_extracted_profile(db_conversation, response)
         
-        return UserResponse(question=question)
+        # Persist the answer, profile update and next question in a single commit
+        await self._append_agent_message(db_conversation, log, next_question)
+        await db.commit()
+        self.summarizer.schedule(db_conversation.id, history)
+        
+        if extraction_job is not None:
+            self.profile_queue.submit(extraction_job.id, db_conversation.id)
+        self.pregenerator.schedule(db_conversation.id)
+            
+        return UserResponse(question=next_question)
 
-    async def submit_answer(self, answer: str, conversation_id: str, current_user: User, db: Session):
-        # Get conversation from database
-        db_conversation = db.query(DBConversation).filter(
+    async def stream_answer(self, answer: str, conversation_id: str, current_user: User):
+        """SSE version of submit_answer; profile extraction runs while the question streams"""
+        db = AsyncSessionLocal()
+        extraction = None
+        try:
+            db_conversation, log, history = await self._load_conversation_for_turn(conversation_id, current_user, db)
+            history, last_question = await self._append_user_answer(log, history, answer)
+            
+            extraction_job = None
+            if DEFERRED_PROFILE_EXTRACTION:
+                extraction_job = self.profile_queue.enqueue(db, db_conversation.id, last_question, answer)
+            else:
+                extraction = asyncio.create_task(self.agent.extract_profile_info(last_question, answer))
+            
+            async for event, data in self.agent.stream_question(
+                history,
+                current_user.hexaco_scores,
+                current_user.holland_scores
+            ):
+                if event == "token":
+                    yield sse_event("token", {"text": data})
+                elif event == "reset":
+                    yield sse_event("reset", {})
+                else:
+                    next_question = data
+            
+            if extraction is not None:
+                self._merge_extracted_profile(db_conversation, await extraction)
+            
+            await self._append_agent_message(db_conversation, log, next_question)
+            await db.commit()
+            self.summarizer.schedule(db_conversation.id, history)
+            
+            if extraction_job is not None:
+                self.profile_queue.submit(extraction_job.id, db_conversation.id)
+            self.pregenerator.schedule(db_conversation.id)
+            
+            yield sse_event("question", UserResponse(question=next_question).model_dump())
+        finally:
+            # Client went away mid-stream: don't leave the extraction running unobserved
+            if extraction is not None and not extraction.done():
+                extraction.cancel()
+            await db.close()
+
+    async def _load_conversation_for_turn(self, conversation_id: str, current_user: User, db: AsyncSession):
+        """Returns (db_conversation, log, history) where history is the recent
+        context the agent needs to generate the next question."""
+        db_conversation = await db.scalar(select(DBConversation).where(
             DBConversation.id == conversation_id,
             DBConversation.user_id == current_user.id
-        ).first()
+        ))
         
         if not db_conversation:
             raise HTTPException(status_code=404, detail="Conversation not found")
         
-        # Update conversation history
-        if not db_conversation.conversation_history:
-            db_conversation.conversation_history = [{"role": "system", "parts": [self.agent.system_prompt]}]
-            flag_modified(db_conversation, "conversation_history")
-        
-        # Initialize messages array if needed
-        if not db_conversation.messages:
-            db_conversation.messages = []
-            flag_modified(db_conversation, "messages")
-        
-        # Add user message to messages array
-        user_message = {
-            "id": str(uuid.uuid4()),
-            "type": "user",
-            "content": answer,
-            "timestamp": datetime.utcnow().isoformat()
-        }
-        db_conversation.messages.append(user_message)
-        flag_modified(db_conversation, "messages")
+        # Conversations from before conversation_messages existed are moved over on first use
+        await backfill_conversation(db, db_conversation)
         
-        db_conversation.conversation_history.append({
-            "role": "user",
-            "parts": [answer]
-        })
-        flag_modified(db_conversation, "conversation_history")
+        log = ConversationLog(db, db_conversation.id)
+        # Rolling summary plus the turns it does not cover; the prompt builder trims to budget
+        history = await log.context(db_conversation, PROMPT_HISTORY_MAX_ENTRIES)
         
-        # Extract profile information
+        # Initialize conversation history if empty
+        if not history:
+            history = [await log.append_prompt(await self.system_prompt_id())]
+        
+        return db_conversation, log, history
+
+    async def ensure_conversation_exists(self, conversation_id: str, current_user: User, db: AsyncSession):
+        """Raise 404 unless the conversation belongs to the user (loads only the id)"""
+        exists = await db.scalar(select(DBConversation.id).where(
+            DBConversation.id == conversation_id,
+            DBConversation.user_id == current_user.id
+        ))
+        if not exists:
+            raise HTTPException(status_code=404, detail="Conversation not found")
+
+    async def _append_user_answer(self, log: ConversationLog, history: list, answer: str):
+        """Record the user's answer. Returns (history, last_question)."""
         last_question = ""
-        if len(db_conversation.conversation_history) >= 2:
-            last_item = db_conversation.conversation_history[-2]
+        if history:
+            last_item = history[-1]
             if last_item.get("role") == "assistant" or last_item.get("role") == "user":
                 last_question = last_item.get("parts", [""])[0] if last_item.get("parts") else ""
         
-        response = self.agent.extract_profile_info(last_question, answer)
-        
-        if response is not None:
-            if not db_conversation.user_profile:
-                db_conversation.user_profile = {
-                    "interests": [],
-                    "skills": [],
-                    "personality_traits": [],
-                    "values": [],
-                    "education":"",
-                    "experience_level": "",
-                    "dislikes": []
-                }
-                flag_modified(db_conversation, "user_profile")
-            
-            profile_updated = False
-            for key, value in response.items():
-                if key in db_conversation.user_profile:
-                    if isinstance(value, list):
-                        if value:  # Only update if list is not empty
-                            db_conversation.user_profile[key].extend(value)
-                            profile_updated = True
-                    elif isinstance(value, str) and value:
-                        if key in ["education", "experience_level"]:
-                            db_conversation.user_profile[key] = value
-                            profile_updated = True
-                        else:
-                            if isinstance(db_conversation.user_profile[key], list):
-                                db_conversation.user_profile[key].append(value)
-                                profile_updated = True
-            
-            if profile_updated:
-                flag_modified(db_conversation, "user_profile")
-        
-        # Update conversation timestamp
-        db_conversation.updated_at = datetime.utcnow()
-        db.commit()
-        
-        # Generate next question (no automatic recommendations)
-        next_question = self.agent.generate_question(
-            db_conversation.conversation_history,
-            current_user.hexaco_scores,
-            current_user.holland_scores
-        )
-        
-        # Add agent message to messages array
-        agent_message = {
-            "id": str(uuid.uuid4()),
-            "type": "agent",
-            "content": next_question,
-            "timestamp": datetime.utcnow().isoformat()
-        }
-        db_conversation.messages.append(agent_message)
-        flag_modified(db_conversation, "messages")
-        
-        db_conversation.conversation_history.append({
-            "role": "assistant",
-            "parts": [next_question]
-        })
-        flag_modified(db_conversation, "conversation_history")
-        
-        # Update database
+        history = history + [await log.append("user", answer)]
+        return history, last_question
+
+    async def _append_agent_message(self, db_conversation: DBConversation, log: ConversationLog, question: str):
+        """Record the agent's message and save the turn's messages; the caller commits"""
+        await log.append("assistant", question)
         db_conversation.updated_at = datetime.utcnow()
-        db.commit()
-            
-        return UserResponse(question=next_question)
+        await log.save()
+
+    def _merge_extracted_profile(self, db_conversation: DBConversation, response: dict | None):
+        if response is None:
+            return
+        if not db_conversation.user_profile:
+            db_conversation.user_profile = empty_profile()
+        if db_conversation.profile_mentions is None:
+            db_conversation.profile_mentions = {}
+        if merge_profile(db_conversation.user_profile, response, db_conversation.profile_mentions):
+            flag_modified(db_conversation, "user_profile")
+            flag_modified(db_conversation, "profile_mentions")
     
-    async def create_conversation(self, title: str, current_user: User, db: Session):
+    async def create_conversation(self, title: str, current_user: User, db: AsyncSession):
         """Create a new conversation for the user"""
         conversation_id = str(uuid.uuid4())
         
@@ -327,7 +539,7 @@ class CareerGuidanceRouter:
             user_id=current_user.id,
             title=title or "New Chat",
             messages=[],
-            conversation_history=[{"role": "system", "parts": [self.agent.system_prompt]}],
+            conversation_history=[],
             user_profile={
                 "interests": [],
                 "skills": [],
@@ -345,8 +557,10 @@ class CareerGuidanceRouter:
         )
         
         db.add(db_conversation)
-        db.commit()
-        db.refresh(db_conversation)
+        log = ConversationLog(db, conversation_id)
+        await log.append_prompt(await self.system_prompt_id())
+        await log.save()
+        await db.commit()
         
         return ConversationResponse(
             id=db_conversation.id,
@@ -355,105 +569,266 @@ class CareerGuidanceRouter:
             updated_at=db_conversation.updated_at.isoformat() if db_conversation.updated_at else None
         )
     
-    async def list_conversations(self, current_user: User, db: Session):
-        """List all conversations for the user"""
-        db_conversations = db.query(DBConversation).filter(
+    async def list_conversations(self, current_user: User, db: AsyncSession, limit: int = CONVERSATION_PAGE_SIZE, cursor: str | None = None):
+        """One page of the user's conversations, most recently updated first.
+
+        Only the listing columns are loaded. Returns (conversations, next_cursor);
+        next_cursor is None on the last page.
+        """
+        query = select(
+            DBConversation.id,
+            DBConversation.title,
+            DBConversation.created_at,
+            DBConversation.updated_at
+        ).where(
             DBConversation.user_id == current_user.id
-        ).order_by(DBConversation.updated_at.desc()).all()
+        )
+        
+        if cursor:
+            cursor_updated_at, cursor_id = decode_conversation_cursor(cursor)
+            query = query.where(or_(
+                DBConversation.updated_at < cursor_updated_at,
+                and_(DBConversation.updated_at == cursor_updated_at, DBConversation.id < cursor_id)
+            ))
+        
+        result = await db.execute(query.order_by(
+            DBConversation.updated_at.desc(), DBConversation.id.desc()
+        ).limit(limit + 1))
+        rows = result.all()
         
-        return [
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_conversation_cursor(rows[-1].updated_at, rows[-1].id)
+        
+        conversations = [
             ConversationResponse(
                 id=conv.id,
                 title=conv.title,
                 created_at=conv.created_at.isoformat() if conv.created_at else None,
                 updated_at=conv.updated_at.isoformat() if conv.updated_at else None
             )
-            for conv in db_conversations
+            for conv in rows
         ]
+        return conversations, next_cursor
     
-    async def get_conversation(self, conversation_id: str, current_user: User, db: Session):
+    async def get_conversation(self, conversation_id: str, current_user: User, db: AsyncSession):
         """Get a specific conversation with all its data"""
-        db_conversation = db.query(DBConversation).filter(
+        db_conversation = await db.scalar(select(DBConversation).where(
             DBConversation.id == conversation_id,
             DBConversation.user_id == current_user.id
-        ).first()
+        ))
         
         if not db_conversation:
             raise HTTPException(status_code=404, detail="Conversation not found")
         
-        # Convert messages from conversation_history to Message format
+        if await backfill_conversation(db, db_conversation):
+            await db.commit()
+        
+        # Convert stored messages to Message format
+        conversation_history = []
         messages = []
-        for i, item in enumerate(db_conversation.conversation_history or []):
-            if item.get("role") == "assistant" or item.get("role") == "user":
-                role = item.get("role")
-                if role == "assistant":
-                    role = "agent"
-                content = item.get("parts", [""])[0] if item.get("parts") else ""
-                if content and role != "system":
-                    messages.append({
-                        "id": str(i),
-                        "type": role,
-                        "content": content,
-                        "timestamp": datetime.utcnow().isoformat()
-                    })
+        for row in await ConversationLog(db, db_conversation.id).rows():
+            conversation_history.append(history_entry(row.role, row.content, row.prompt_id))
+            if (row.role == "assistant" or row.role == "user") and row.content:
+                messages.append(Message(
+                    id=row.message_id,
+                    type="agent" if row.role == "assistant" else "user",
+                    content=row.content,
+                    timestamp=row.created_at.isoformat() if row.created_at else ""
+                ))
         
         return Conversation(
             id=db_conversation.id,
             user_id=db_conversation.user_id,
             title=db_conversation.title,
-            messages=[Message(**msg) for msg in messages],
-            conversation_history=db_conversation.conversation_history or [],
+            messages=messages,
+            conversation_history=conversation_history,
             user_profile=db_conversation.user_profile or {},
             career_recommendations=db_conversation.career_recommendations or [],
             additional_advice=db_conversation.additional_advice or "",
             influence_breakdown=db_conversation.influence_breakdown or {},
+            recommendations_stale=await self._recommendations_stale(db_conversation, db),
             created_at=db_conversation.created_at.isoformat() if db_conversation.created_at else None,
             updated_at=db_conversation.updated_at.isoformat() if db_conversation.updated_at else None
         )
     
-    async def generate_recommendations_for_conversation(self, conversation_id: str, current_user: User, db: Session):
+    async def generate_recommendations_for_conversation(self, conversation_id: str, current_user: User, db: AsyncSession):
         """Manually generate recommendations for a conversation"""
-        db_conversation = db.query(DBConversation).filter(
+        db_conversation, hexaco_scores, holland_scores = await self._load_recommendation_inputs(conversation_id, current_user, db)
+        fingerprint = recommendation_fingerprint(db_conversation.user_profile, hexaco_scores, holland_scores)
+        snapshot = self._recommendations_snapshot(db_conversation, fingerprint)
+        if snapshot is not None:
+            return snapshot
+        
+        # Generate recommendations
+        try:
+            recommendations = await self.agent.generate_recommendations(
+                db_conversation.user_profile or {},
+                hexaco_scores,
+                holland_scores,
+                fallback=False
+            )
+        except Exception as e:
+            # Shown once but not snapshotted, so the next call tries the model again
+            recommendations = self.agent.recommendations_fallback(e, hexaco_scores, holland_scores)
+            fingerprint = None
+        
+        self._save_recommendations(db_conversation, recommendations, fingerprint)
+        await db.commit()
+        
+        return recommendations
+
+    async def stream_recommendations_for_conversation(self, conversation_id: str, current_user: User):
+        """SSE version of generate_recommendations_for_conversation.
+
+        Emits each recommendation as soon as it has been parsed, then the full
+        response once it has been saved exactly as the non-streaming path does.
+        An up-to-date snapshot is replayed the same way without a model call.
+        """
+        async with AsyncSessionLocal() as db:
+            db_conversation, hexaco_scores, holland_scores = await self._load_recommendation_inputs(conversation_id, current_user, db)
+            fingerprint = recommendation_fingerprint(db_conversation.user_profile, hexaco_scores, holland_scores)
+            snapshot = self._recommendations_snapshot(db_conversation, fingerprint)
+            if snapshot is not None:
+                for recommendation in snapshot.recommendations:
+                    yield sse_event("recommendation", recommendation.model_dump())
+                yield sse_event("done", snapshot.model_dump())
+                return
+            
+            async for event, data in self.agent.stream_recommendations(
+                db_conversation.user_profile or {},
+                hexaco_scores,
+                holland_scores
+            ):
+                if event == "recommendation":
+                    yield sse_event("recommendation", data.model_dump())
+                else:
+                    recommendations = data
+                    if event == "fallback":
+                        fingerprint = None
+            
+            self._save_recommendations(db_conversation, recommendations, fingerprint)
+            await db.commit()
+            
+            yield sse_event("done", recommendations.model_dump())
+
+    async def _load_recommendation_inputs(self, conversation_id: str, current_user: User, db: AsyncSession):
+        """Returns (db_conversation, hexaco_scores, holland_scores)"""
+        db_conversation = await db.scalar(select(DBConversation).where(
             DBConversation.id == conversation_id,
             DBConversation.user_id == current_user.id
-        ).first()
+        ))
         
         if not db_conversation:
             raise HTTPException(status_code=404, detail="Conversation not found")
         
-        # Get hexaco and holland scores from user
-        db_hexaco = db.query(DBHexacoScores).filter(DBHexacoScores.user_id == current_user.id).first()
-        db_holland = db.query(DBHollandScores).filter(DBHollandScores.user_id == current_user.id).first()
-        
-        hexaco_scores = None
-        if db_hexaco:
-            hexaco_scores = HexacoScores(
-                honesty_humility=db_hexaco.honesty_humility,
-                emotionality=db_hexaco.emotionality,
-                extraversion=db_hexaco.extraversion,
-                agreeableness=db_hexaco.agreeableness,
-                conscientiousness=db_hexaco.conscientiousness,
-                openness_to_experience=db_hexaco.openness_to_experience
-            )
+        # Make sure background profile extraction has caught up with the conversation
+        if await self.profile_queue.wait_for_conversation(conversation_id):
+            await db.refresh(db_conversation)
         
-        holland_scores = None
-        if db_holland:
-            holland_scores = HollandScores(
-                realistic=db_holland.realistic,
-                investigative=db_holland.investigative,
-                artistic=db_holland.artistic,
-                social=db_holland.social,
-                enterprising=db_holland.enterprising,
-                conventional=db_holland.conventional
-            )
+        # Not the principal's scores: those can be stale in other workers' auth caches
+        hexaco_scores, holland_scores = await load_assessment_scores(db, current_user.id)
+        return db_conversation, hexaco_scores, holland_scores
+
+    async def create_recommendation_job(self, conversation_ids: List[str], current_user: User, db: AsyncSession) -> RecommendationJob:
+        """Queue recommendation generation for several of the user's conversations"""
+        conversation_ids = list(dict.fromkeys(conversation_ids))
+        if not conversation_ids:
+            raise HTTPException(status_code=400, detail="No conversation IDs given")
         
-        # Generate recommendations
-        recommendations = self.agent.generate_recommendations(
-            db_conversation.user_profile or {},
-            hexaco_scores,
-            holland_scores
-        )
+        result = await db.execute(select(DBConversation.id, DBConversation.title).where(
+            DBConversation.id.in_(conversation_ids),
+            DBConversation.user_id == current_user.id
+        ))
+        titles = dict(result.all())
+        missing = [cid for cid in conversation_ids if cid not in titles]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Conversations not found: {', '.join(missing)}")
         
+        items = [{"conversation_id": cid, "label": titles[cid] or ""} for cid in conversation_ids]
+        return await self._enqueue_recommendation_job("conversations", items, current_user, db)
+
+    async def create_csv_recommendation_job(self, csv_text: str, current_user: User, db: AsyncSession) -> RecommendationJob:
+        """Queue recommendation generation for every profile row of a cohort CSV"""
+        try:
+            items = parse_profiles_csv(csv_text)
+        except (ValueError, csv.Error) as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if not items:
+            raise HTTPException(status_code=400, detail="CSV has no profile rows")
+        return await self._enqueue_recommendation_job("csv", items, current_user, db)
+
+    async def _enqueue_recommendation_job(self, source: str, items: List[dict], current_user: User, db: AsyncSession) -> RecommendationJob:
+        if len(items) > RECOMMENDATION_JOB_MAX_ITEMS:
+            raise HTTPException(status_code=413, detail=f"A job can have at most {RECOMMENDATION_JOB_MAX_ITEMS} items")
+        
+        db_job = self.recommendation_jobs.enqueue(db, current_user.id, source, items)
+        await db.commit()
+        self.recommendation_jobs.submit(db_job.id)
+        return self._recommendation_job_response(db_job)
+
+    async def get_recommendation_job(self, job_id: str, current_user: User, db: AsyncSession) -> RecommendationJob:
+        return self._recommendation_job_response(await self._load_recommendation_job(job_id, current_user, db))
+
+    async def get_recommendation_job_results(self, job_id: str, current_user: User, db: AsyncSession) -> RecommendationJobResults:
+        db_job = await self._load_recommendation_job(job_id, current_user, db)
+        db_items = await db.scalars(select(DBRecommendationJobItem).where(
+            DBRecommendationJobItem.job_id == job_id
+        ).order_by(DBRecommendationJobItem.position))
+        
+        items = [
+            RecommendationJobItem(
+                position=db_item.position,
+                label=db_item.label,
+                conversation_id=db_item.conversation_id,
+                status=db_item.status,
+                attempts=db_item.attempts,
+                error=db_item.error or "",
+                recommendations=db_item.result
+            )
+            for db_item in db_items
+        ]
+        return RecommendationJobResults(job=self._recommendation_job_response(db_job), items=items)
+
+    async def _load_recommendation_job(self, job_id: str, current_user: User, db: AsyncSession) -> DBRecommendationJob:
+        db_job = await db.scalar(select(DBRecommendationJob).where(
+            DBRecommendationJob.id == job_id,
+            DBRecommendationJob.user_id == current_user.id
+        ))
+        if not db_job:
+            raise HTTPException(status_code=404, detail="Recommendation job not found")
+        return db_job
+
+    def _recommendation_job_response(self, db_job: DBRecommendationJob) -> RecommendationJob:
+        return RecommendationJob(
+            id=db_job.id,
+            source=db_job.source,
+            status=db_job.status,
+            total=db_job.total,
+            completed=db_job.completed,
+            failed=db_job.failed,
+            created_at=db_job.created_at.isoformat() if db_job.created_at else None,
+            updated_at=db_job.updated_at.isoformat() if db_job.updated_at else None
+        )
+
+    async def _recommendations_stale(self, db_conversation: DBConversation, db: AsyncSession) -> bool:
+        if not db_conversation.career_recommendations:
+            return False
+        hexaco_scores, holland_scores = await load_assessment_scores(db, db_conversation.user_id)
+        return db_conversation.recommendations_fingerprint != recommendation_fingerprint(db_conversation.user_profile, hexaco_scores, holland_scores)
+
+    def _recommendations_snapshot(self, db_conversation: DBConversation, fingerprint: str) -> Optional[CareerRecommendationsResponse]:
+        """Stored recommendations if they were generated from the current profile and scores"""
+        if db_conversation.recommendations_fingerprint != fingerprint or not db_conversation.career_recommendations:
+            return None
+        return CareerRecommendationsResponse(
+            recommendations=db_conversation.career_recommendations,
+            additional_advice=db_conversation.additional_advice or "",
+            influence_breakdown=db_conversation.influence_breakdown or {}
+        )
+
+    def _save_recommendations(self, db_conversation: DBConversation, recommendations, fingerprint: Optional[str] = None):
         # Save recommendations to conversation
         db_conversation.career_recommendations = [rec.model_dump() for rec in recommendations.recommendations]
         flag_modified(db_conversation, "career_recommendations")
@@ -462,31 +837,80 @@ class CareerGuidanceRouter:
         db_conversation.influence_breakdown = recommendations.influence_breakdown
         flag_modified(db_conversation, "influence_breakdown")
         
+        # No fingerprint (e.g. a fallback response) leaves the snapshot stale
+        db_conversation.recommendations_fingerprint = fingerprint
+        db_conversation.recommendations_generated_at = datetime.utcnow()
         db_conversation.updated_at = datetime.utcnow()
-        db.commit()
-        
-        return recommendations
 
 # Initialize router
 career_router = CareerGuidanceRouter()
 
+@app.on_event("startup")
+async def register_prompts():
+    await career_router.system_prompt_id()
+
+@app.on_event("startup")
+async def start_profile_queue():
+    await career_router.profile_queue.start()
+
+@app.on_event("startup")
+async def start_recommendation_jobs():
+    await career_router.recommendation_jobs.start()
+
+@app.on_event("shutdown")
+async def stop_recommendation_jobs():
+    await career_router.recommendation_jobs.stop()
+
+@app.on_event("shutdown")
+async def stop_summarizer():
+    await career_router.summarizer.stop()
+
+@app.on_event("shutdown")
+async def stop_pregenerator():
+    await career_router.pregenerator.stop()
+
+@app.on_event("shutdown")
+async def stop_profile_queue():
+    await career_router.profile_queue.stop()
+
+@app.on_event("shutdown")
+async def close_database():
+    await dispose_engine()
+
+@app.on_event("shutdown")
+async def stop_password_hasher():
+    password_hasher.shutdown()
+
+@app.on_event("shutdown")
+async def flush_traces():
+    shutdown_tracing()
+
 # FastAPI routes
 @app.post("/register")
-async def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate, db: AsyncSession = Depends(get_db)):
     return await career_router.register_user(user, db)
 
 @app.post("/token")
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
     # Find user by email (username field contains email)
-    db_user = db.query(DBUser).filter(DBUser.email == form_data.username).first()
+    result = await db.execute(select(DBUser.id, DBUser.email, DBUser.hashed_password).where(DBUser.email == form_data.username))
+    db_user = result.first()
     
-    if not db_user or not pwd_context.verify(form_data.password, db_user.hashed_password):
+    valid, new_hash = False, None
+    if db_user:
+        valid, new_hash = await password_hasher.verify_and_update(form_data.password, db_user.hashed_password)
+    if not valid:
         raise HTTPException(
             status_code=401,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # Stored hash uses an old cost factor; upgrade it while we have the password
+    if new_hash:
+        await db.execute(update(DBUser).where(DBUser.id == db_user.id).values(hashed_password=new_hash))
+        await db.commit()
+    
     access_token = career_router.create_access_token(data={"sub": db_user.email})
     return {"access_token": access_token, "token_type": "bearer"}
 
@@ -494,7 +918,7 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
 async def get_question(
     conversation_id: str,
     current_user: User = Depends(career_router.get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     response = await career_router.get_next_question(conversation_id, current_user, db)
     return response
@@ -503,22 +927,40 @@ async def get_question(
 async def submit_answer(
     answer: AnswerRequest,
     current_user: User = Depends(career_router.get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     response = await career_router.submit_answer(answer.answer, answer.conversation_id, current_user, db)
     return response
 
+@app.get("/question/stream")
+async def stream_question(
+    conversation_id: str,
+    current_user: User = Depends(career_router.get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    await career_router.ensure_conversation_exists(conversation_id, current_user, db)
+    return sse_response(career_router.stream_next_question(conversation_id, current_user))
+
+@app.post("/answer/stream")
+async def stream_answer(
+    answer: AnswerRequest,
+    current_user: User = Depends(career_router.get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    await career_router.ensure_conversation_exists(answer.conversation_id, current_user, db)
+    return sse_response(career_router.stream_answer(answer.answer, answer.conversation_id, current_user))
+
 @app.get("/profile")
-async def get_profile(current_user: User = Depends(career_router.get_current_user)):
-    return current_user.user_profile
+async def get_profile(current_user: User = Depends(career_router.get_current_user), db: AsyncSession = Depends(get_db)):
+    return await career_router.load_user_profile(current_user, db)
 
 @app.post("/hexaco_scores")
-async def set_hexaco_scores(hexaco_scores: HexacoScores, current_user: User = Depends(career_router.get_current_user), db: Session = Depends(get_db)):
+async def set_hexaco_scores(hexaco_scores: HexacoScores, current_user: User = Depends(career_router.get_current_user), db: AsyncSession = Depends(get_db)):
     # Update the user model
     current_user.hexaco_scores = hexaco_scores
     
     # Check if hexaco scores already exist for this user
-    db_hexaco = db.query(DBHexacoScores).filter(DBHexacoScores.user_id == current_user.id).first()
+    db_hexaco = await db.scalar(select(DBHexacoScores).where(DBHexacoScores.user_id == current_user.id))
     
     if db_hexaco:
         # Update existing scores
@@ -543,7 +985,8 @@ async def set_hexaco_scores(hexaco_scores: HexacoScores, current_user: User = De
         db.add(db_hexaco)
     
     # Commit changes
-    db.commit()
+    await db.commit()
+    career_router.invalidate_user(current_user.email)
     
     return {"message": "HEXACO scores set successfully"}
 
@@ -554,12 +997,12 @@ async def get_hexaco_scores(current_user: User = Depends(career_router.get_curre
     raise HTTPException(status_code=404, detail="HEXACO scores not found for this user")
 
 @app.post("/holland_scores")
-async def set_holland_scores(holland_scores: HollandScores, current_user: User = Depends(career_router.get_current_user), db: Session = Depends(get_db)):
+async def set_holland_scores(holland_scores: HollandScores, current_user: User = Depends(career_router.get_current_user), db: AsyncSession = Depends(get_db)):
     # Update the user model
     current_user.holland_scores = holland_scores
     
     # Check if holland scores already exist for this user
-    db_holland = db.query(DBHollandScores).filter(DBHollandScores.user_id == current_user.id).first()
+    db_holland = await db.scalar(select(DBHollandScores).where(DBHollandScores.user_id == current_user.id))
     
     if db_holland:
         # Update existing scores
@@ -584,7 +1027,8 @@ async def set_holland_scores(holland_scores: HollandScores, current_user: User =
         db.add(db_holland)
     
     # Commit changes
-    db.commit()
+    await db.commit()
+    career_router.invalidate_user(current_user.email)
     
     return {"message": "Holland RIASEC scores set successfully"}
 
@@ -594,86 +1038,129 @@ async def get_holland_scores(current_user: User = Depends(career_router.get_curr
         return current_user.holland_scores
     raise HTTPException(status_code=404, detail="Holland RIASEC scores not found for this user")
 
+@app.get("/careers/match", response_model=CareerMatchResponse)
+async def match_careers(
+    limit: int = Query(10, ge=1, le=100),
+    current_user: User = Depends(career_router.get_current_user)
+):
+    """Rank catalog careers against the user's HEXACO and Holland scores (no LLM call)"""
+    if not current_user.hexaco_scores and not current_user.holland_scores:
+        raise HTTPException(status_code=404, detail="HEXACO or Holland RIASEC scores are required for career matching")
+    matches = career_catalog.match(current_user.holland_scores, current_user.hexaco_scores, limit)
+    return CareerMatchResponse(matches=matches)
+
 @app.get("/users/me", response_model=User)
-async def read_users_me(current_user: User = Depends(career_router.get_current_user)):
-    return current_user
+async def read_users_me(current_user: User = Depends(career_router.get_current_user), db: AsyncSession = Depends(get_db)):
+    return await career_router.load_user(current_user, db)
 
 
 @app.post("/roadmap", response_model=Roadmap)
-async def generate_roadmap(request: RoadmapRequest, current_user: User = Depends(career_router.get_current_user), db: Session = Depends(get_db)):
+async def generate_roadmap(request: RoadmapRequest, current_user: User = Depends(career_router.get_current_user), db: AsyncSession = Depends(get_db)):
     """Generate a roadmap using conversation context when available.
 
     If `request.conversation_id` is provided and belongs to the current user, use that
     conversation's `conversation_history` and `user_profile`. Otherwise fall back to
     the authenticated user's `user_profile`.
     """
-    conversation_history = None
-    user_profile = current_user.user_profile or {}
+    conversation_history, user_profile = await career_router.load_roadmap_context(request, current_user, db)
 
-    if getattr(request, "conversation_id", None):
-        db_conversation = db.query(DBConversation).filter(
-            DBConversation.id == request.conversation_id,
-            DBConversation.user_id == current_user.id
-        ).first()
-        if db_conversation:
-            conversation_history = db_conversation.conversation_history or []
-            # prefer conversation-scoped user_profile if present
-            user_profile = db_conversation.user_profile or user_profile
+    # Repeated requests for the same goal and profile reuse the stored roadmap
+    if not request.force_refresh:
+        cached = await career_router.find_cached_roadmap(request.career_goal, user_profile, current_user, db)
+        if cached is not None:
+            return cached
 
     # Generate roadmap using conversation history + user profile context
     roadmap = await career_router.generate_career_roadmap(conversation_history, user_profile, request.career_goal)
 
-    # Persist roadmap; derive career_start from the profile if available
-    career_start = ""
-    try:
-        if isinstance(user_profile, dict):
-            career_start = user_profile.get("education_level", "") or user_profile.get("education", "")
-    except Exception:
-        career_start = ""
+    await career_router.save_roadmap(request.career_goal, user_profile, roadmap, current_user, db)
+    await db.commit()
 
-    db_roadmap = DBRoadmap(
-        id=str(uuid.uuid4()),
-        user_id=current_user.id,
-        career_goal=request.career_goal,
-        career_start=career_start,
-        nodes=[node.model_dump() for node in roadmap.nodes],
-        edges=[edge.model_dump() for edge in roadmap.edges]
-    )
+    return roadmap
 
-    db.add(db_roadmap)
-    db.commit()
+@app.post("/roadmap/stream")
+async def stream_roadmap(request: RoadmapRequest, current_user: User = Depends(career_router.get_current_user), db: AsyncSession = Depends(get_db)):
+    """Streaming version of /roadmap.
 
-    return roadmap
+    Emits `node` and `edge` events as soon as each one has been generated, then a
+    `roadmap` event with the complete roadmap once it has been saved.
+    """
+    conversation_history, user_profile = await career_router.load_roadmap_context(request, current_user, db)
+    if not request.force_refresh:
+        cached = await career_router.find_cached_roadmap(request.career_goal, user_profile, current_user, db)
+        if cached is not None:
+            return sse_response(career_router.stream_cached_roadmap(cached))
+    return sse_response(career_router.stream_career_roadmap(conversation_history, user_profile, request.career_goal, current_user))
 
 @app.get("/roadmap/step/{step_id}")
-async def get_roadmap_step_details(step_details_request: StepDetailsRequest, current_user: User = Depends(career_router.get_current_user)):
-    return await career_router.get_roadmap_step_details(step_details_request)
+async def get_roadmap_step_details(step_details_request: StepDetailsRequest, current_user: User = Depends(career_router.get_current_user), db: AsyncSession = Depends(get_db)):
+    return await career_router.get_roadmap_step_details(step_details_request, db)
 
 @app.post("/roadmap/step-details")
-async def get_roadmap_step_details(step_details_request: StepDetailsRequest, current_user: User = Depends(career_router.get_current_user)):
-    return await career_router.get_roadmap_step_details(step_details_request)
+async def get_roadmap_step_details(step_details_request: StepDetailsRequest, current_user: User = Depends(career_router.get_current_user), db: AsyncSession = Depends(get_db)):
+    return await career_router.get_roadmap_step_details(step_details_request, db)
+
+@app.get("/roadmap/step-details/cache")
+async def get_step_details_cache_stats(current_user: User = Depends(career_router.get_current_user)):
+    return career_router.step_details_cache.stats()
+
+@app.delete("/roadmap/step-details/cache")
+async def invalidate_step_details_cache(
+    title: Optional[str] = None,
+    overall_goal: Optional[str] = None,
+    skills: List[str] = Query(default=[]),
+    clear_all: bool = Query(default=False, alias="all"),
+    _: None = Depends(require_admin_token),
+    db: AsyncSession = Depends(get_db)
+):
+    """Invalidate one step's cached details (title + overall_goal [+ skills]) or, with all=true, the whole cache.
+
+    The cache is shared by all users, so this needs the X-Admin-Token header.
+    Only this worker's in-memory tier is cleared; other workers may serve their
+    copy for up to STEP_DETAILS_CACHE_TTL_SECONDS.
+    """
+    cache = career_router.step_details_cache
+    if title and overall_goal:
+        removed = await cache.invalidate(db, title, skills, overall_goal)
+    elif clear_all:
+        removed = await cache.clear(db)
+    else:
+        raise HTTPException(status_code=400, detail="Give title and overall_goal, or all=true")
+    return {
+        "message": "Step details cache invalidated",
+        "removed": removed,
+        "other_workers_expire_in_seconds": cache.memory.ttl_seconds
+    }
 
 # Conversation endpoints
 @app.post("/conversations", response_model=ConversationResponse)
 async def create_conversation(
     conversation: ConversationCreate,
     current_user: User = Depends(career_router.get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     return await career_router.create_conversation(conversation.title or "New Chat", current_user, db)
 
 @app.get("/conversations", response_model=list[ConversationResponse])
 async def list_conversations(
+    response: Response,
+    limit: int = Query(CONVERSATION_PAGE_SIZE, ge=1, le=CONVERSATION_PAGE_SIZE_MAX),
+    cursor: Optional[str] = None,
     current_user: User = Depends(career_router.get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    return await career_router.list_conversations(current_user, db)
+    """List conversations. Pass the X-Next-Cursor response header back as
+    `cursor` to fetch the next page; the header is absent on the last page."""
+    conversations, next_cursor = await career_router.list_conversations(current_user, db, limit, cursor)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return conversations
 
 @app.get("/conversations/{conversation_id}", response_model=Conversation)
 async def get_conversation(
     conversation_id: str,
     current_user: User = Depends(career_router.get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     return await career_router.get_conversation(conversation_id, current_user, db)
 
@@ -681,31 +1168,94 @@ async def get_conversation(
 async def generate_recommendations(
     conversation_id: str,
     current_user: User = Depends(career_router.get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     return await career_router.generate_recommendations_for_conversation(conversation_id, current_user, db)
 
+@app.post("/conversations/{conversation_id}/generate-recommendations/stream")
+async def stream_recommendations(
+    conversation_id: str,
+    current_user: User = Depends(career_router.get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    await career_router.ensure_conversation_exists(conversation_id, current_user, db)
+    return sse_response(career_router.stream_recommendations_for_conversation(conversation_id, current_user))
+
+@app.post("/recommendation-jobs", response_model=RecommendationJob, status_code=202)
+async def create_recommendation_job(
+    request: RecommendationJobRequest,
+    current_user: User = Depends(career_router.get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    return await career_router.create_recommendation_job(request.conversation_ids, current_user, db)
+
+@app.post("/recommendation-jobs/csv", response_model=RecommendationJob, status_code=202)
+async def create_csv_recommendation_job(
+    file: UploadFile = File(...),
+    current_user: User = Depends(career_router.get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    try:
+        csv_text = (await file.read()).decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="CSV must be UTF-8 encoded")
+    return await career_router.create_csv_recommendation_job(csv_text, current_user, db)
+
+@app.get("/recommendation-jobs/{job_id}", response_model=RecommendationJob)
+async def get_recommendation_job(
+    job_id: str,
+    current_user: User = Depends(career_router.get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    return await career_router.get_recommendation_job(job_id, current_user, db)
+
+@app.get("/recommendation-jobs/{job_id}/results", response_model=RecommendationJobResults)
+async def get_recommendation_job_results(
+    job_id: str,
+    current_user: User = Depends(career_router.get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    return await career_router.get_recommendation_job_results(job_id, current_user, db)
+
 @app.delete("/conversations/{conversation_id}")
 async def delete_conversation(
     conversation_id: str,
     current_user: User = Depends(career_router.get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     # Find the conversation
-    db_conversation = db.query(DBConversation).filter(
+    db_conversation = await db.scalar(select(DBConversation).where(
         DBConversation.id == conversation_id,
         DBConversation.user_id == current_user.id
-    ).first()
+    ))
     
     if not db_conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
     
-    # Delete the conversation
-    db.delete(db_conversation)
-    db.commit()
+    # Delete the conversation along with its message log and extraction jobs
+    await ConversationLog(db, db_conversation.id).delete_all()
+    await db.execute(delete(DBProfileExtractionJob).where(
+        DBProfileExtractionJob.conversation_id == db_conversation.id
+    ))
+    await db.delete(db_conversation)
+    await db.commit()
     
     return {"message": "Conversation deleted successfully"}
 
+@app.exception_handler(CircuitOpenError)
+async def llm_unavailable(request, exc: CircuitOpenError):
+    # Fail fast while the model is down instead of holding the request open
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Career guidance model is temporarily unavailable, please try again shortly"},
+        headers={"Retry-After": str(max(1, round(exc.retry_after)))}
+    )
+
 @app.get("/health")
 async def health_check():
-    return {"status": "OK"}
\ No newline at end of file
+    return {"status": "OK", "database": pool_status(), "llm": llm_client.status()}
+
+@app.get("/metrics")
+async def metrics():
+    body, content_type = metrics_response()
+    return Response(content=body, media_type=content_type)
\ No newline at end of file
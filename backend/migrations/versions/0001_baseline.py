@@ -0,0 +1,156 @@
+"""Baseline schema
+
+Databases created before migrations existed were built by create_all() and
+may be missing any of the later tables, columns or indexes. Everything here
+is created only if it is not there yet, so this revision brings both new and
+existing databases to the same starting point.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-16
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _create_table(inspector, name, *columns):
+    if not inspector.has_table(name):
+        op.create_table(name, *columns)
+
+
+def _create_index(inspector, name, table, columns, unique=False):
+    if name not in {index["name"] for index in inspector.get_indexes(table)}:
+        op.create_index(name, table, columns, unique=unique)
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    _create_table(
+        inspector, "users",
+        sa.Column("id", sa.String, primary_key=True),
+        sa.Column("username", sa.String, nullable=False),
+        sa.Column("email", sa.String, nullable=False, unique=True),
+        sa.Column("hashed_password", sa.String, nullable=False),
+        sa.Column("conversation_history", sa.JSON),
+        sa.Column("user_profile", sa.JSON),
+        sa.Column("career_recommendations", sa.JSON),
+        sa.Column("additional_advice", sa.Text),
+    )
+    _create_table(
+        inspector, "hexaco_scores",
+        sa.Column("id", sa.String, primary_key=True),
+        sa.Column("user_id", sa.String, sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("honesty_humility", sa.Float),
+        sa.Column("emotionality", sa.Float),
+        sa.Column("extraversion", sa.Float),
+        sa.Column("agreeableness", sa.Float),
+        sa.Column("conscientiousness", sa.Float),
+        sa.Column("openness_to_experience", sa.Float),
+    )
+    _create_table(
+        inspector, "holland_scores",
+        sa.Column("id", sa.String, primary_key=True),
+        sa.Column("user_id", sa.String, sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("realistic", sa.Float),
+        sa.Column("investigative", sa.Float),
+        sa.Column("artistic", sa.Float),
+        sa.Column("social", sa.Float),
+        sa.Column("enterprising", sa.Float),
+        sa.Column("conventional", sa.Float),
+    )
+    _create_table(
+        inspector, "roadmaps",
+        sa.Column("id", sa.String, primary_key=True),
+        sa.Column("user_id", sa.String, sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("career_goal", sa.String, nullable=False),
+        sa.Column("career_start", sa.String, nullable=False),
+        sa.Column("nodes", sa.JSON),
+        sa.Column("edges", sa.JSON),
+    )
+    _create_table(
+        inspector, "conversations",
+        sa.Column("id", sa.String, primary_key=True),
+        sa.Column("user_id", sa.String, sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("title", sa.String, nullable=False),
+        sa.Column("messages", sa.JSON),
+        sa.Column("conversation_history", sa.JSON),
+        sa.Column("user_profile", sa.JSON),
+        sa.Column("career_recommendations", sa.JSON),
+        sa.Column("additional_advice", sa.Text),
+        sa.Column("influence_breakdown", sa.JSON),
+        sa.Column("created_at", sa.DateTime),
+        sa.Column("updated_at", sa.DateTime),
+    )
+    _create_index(inspector, "ix_conversations_user_id_updated_at", "conversations", ["user_id", "updated_at"])
+
+    _create_table(
+        inspector, "prompts",
+        sa.Column("id", sa.String, primary_key=True),
+        sa.Column("name", sa.String, nullable=False),
+        sa.Column("version", sa.Integer, nullable=False),
+        sa.Column("content_hash", sa.String(64), nullable=False),
+        sa.Column("content", sa.Text, nullable=False),
+        sa.Column("created_at", sa.DateTime),
+    )
+    _create_index(inspector, "ix_prompts_name_content_hash", "prompts", ["name", "content_hash"], unique=True)
+
+    if inspector.has_table("conversation_messages"):
+        if "prompt_id" not in {column["name"] for column in inspector.get_columns("conversation_messages")}:
+            op.add_column("conversation_messages", sa.Column("prompt_id", sa.String, nullable=True))
+    else:
+        op.create_table(
+            "conversation_messages",
+            sa.Column("conversation_id", sa.String, sa.ForeignKey("conversations.id", ondelete="CASCADE"), primary_key=True),
+            sa.Column("seq", sa.Integer, primary_key=True),
+            sa.Column("message_id", sa.String, nullable=False),
+            sa.Column("role", sa.String, nullable=False),
+            sa.Column("content", sa.Text, nullable=False),
+            sa.Column("prompt_id", sa.String, sa.ForeignKey("prompts.id"), nullable=True),
+            sa.Column("created_at", sa.DateTime),
+        )
+
+    _create_table(
+        inspector, "profile_extraction_jobs",
+        sa.Column("id", sa.String, primary_key=True),
+        sa.Column("conversation_id", sa.String, sa.ForeignKey("conversations.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("question", sa.Text),
+        sa.Column("answer", sa.Text, nullable=False),
+        sa.Column("status", sa.String, nullable=False),
+        sa.Column("attempts", sa.Integer, nullable=False),
+        sa.Column("error", sa.Text),
+        sa.Column("created_at", sa.DateTime),
+        sa.Column("updated_at", sa.DateTime),
+    )
+    _create_index(inspector, "ix_profile_extraction_jobs_conversation_id", "profile_extraction_jobs", ["conversation_id"])
+    _create_index(inspector, "ix_profile_extraction_jobs_status", "profile_extraction_jobs", ["status"])
+
+    _create_table(
+        inspector, "step_details_cache",
+        sa.Column("key", sa.String(64), primary_key=True),
+        sa.Column("step_title", sa.String, nullable=False),
+        sa.Column("overall_goal", sa.String, nullable=False),
+        sa.Column("payload", sa.JSON, nullable=False),
+        sa.Column("created_at", sa.DateTime),
+        sa.Column("expires_at", sa.DateTime, nullable=True),
+    )
+    _create_table(
+        inspector, "roadmap_cache",
+        sa.Column("id", sa.String, primary_key=True),
+        sa.Column("user_id", sa.String, sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("cache_key", sa.String(64), nullable=False),
+        sa.Column("roadmap_id", sa.String, sa.ForeignKey("roadmaps.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("created_at", sa.DateTime),
+    )
+    _create_index(inspector, "ix_roadmap_cache_user_id_cache_key", "roadmap_cache", ["user_id", "cache_key"])
+
+
+def downgrade():
+    for table in ["roadmap_cache", "step_details_cache", "profile_extraction_jobs", "conversation_messages",
+                  "prompts", "conversations", "roadmaps", "holland_scores", "hexaco_scores", "users"]:
+        op.drop_table(table)
@@ -0,0 +1,47 @@
+"""Index user-scoped lookups; one score row per user
+
+conversations.user_id is already covered by ix_conversations_user_id_updated_at,
+whose leading column serves plain user_id filters too.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-16
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def _delete_older_duplicates(table: str):
+    """Keep the most recently written score row per user.
+
+    Ids are random UUIDs and the tables have no timestamps, so recency comes
+    from SQLite's rowid or the writing transaction (xmin) in PostgreSQL.
+    """
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute(sa.text(
+            f"DELETE FROM {table} a USING {table} b WHERE a.user_id = b.user_id AND "
+            f"(a.xmin::text::bigint, a.ctid) < (b.xmin::text::bigint, b.ctid)"
+        ))
+    else:
+        op.execute(sa.text(
+            f"DELETE FROM {table} WHERE rowid NOT IN (SELECT MAX(rowid) FROM {table} GROUP BY user_id)"
+        ))
+
+
+def upgrade():
+    for table in ["hexaco_scores", "holland_scores"]:
+        # Keep a single row per user before enforcing uniqueness
+        _delete_older_duplicates(table)
+        op.create_index(f"ix_{table}_user_id", table, ["user_id"], unique=True)
+    op.create_index("ix_roadmaps_user_id", "roadmaps", ["user_id"])
+
+
+def downgrade():
+    op.drop_index("ix_roadmaps_user_id", table_name="roadmaps")
+    op.drop_index("ix_holland_scores_user_id", table_name="holland_scores")
+    op.drop_index("ix_hexaco_scores_user_id", table_name="hexaco_scores")
@@ -0,0 +1,50 @@
+"""Bulk recommendation jobs
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-16
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "recommendation_jobs",
+        sa.Column("id", sa.String, primary_key=True),
+        sa.Column("user_id", sa.String, sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("source", sa.String, nullable=False),
+        sa.Column("status", sa.String, nullable=False),
+        sa.Column("total", sa.Integer, nullable=False),
+        sa.Column("completed", sa.Integer, nullable=False),
+        sa.Column("failed", sa.Integer, nullable=False),
+        sa.Column("created_at", sa.DateTime),
+        sa.Column("updated_at", sa.DateTime),
+    )
+    op.create_index("ix_recommendation_jobs_user_id", "recommendation_jobs", ["user_id"])
+    op.create_index("ix_recommendation_jobs_status", "recommendation_jobs", ["status"])
+    op.create_table(
+        "recommendation_job_items",
+        sa.Column("id", sa.String, primary_key=True),
+        sa.Column("job_id", sa.String, sa.ForeignKey("recommendation_jobs.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("position", sa.Integer, nullable=False),
+        sa.Column("label", sa.String, nullable=False),
+        sa.Column("conversation_id", sa.String, sa.ForeignKey("conversations.id", ondelete="SET NULL"), nullable=True),
+        sa.Column("inputs", sa.JSON, nullable=True),
+        sa.Column("status", sa.String, nullable=False),
+        sa.Column("attempts", sa.Integer, nullable=False),
+        sa.Column("error", sa.Text),
+        sa.Column("result", sa.JSON, nullable=True),
+        sa.Column("updated_at", sa.DateTime),
+    )
+    op.create_index("ix_recommendation_job_items_job_id_status", "recommendation_job_items", ["job_id", "status"])
+
+
+def downgrade():
+    op.drop_table("recommendation_job_items")
+    op.drop_table("recommendation_jobs")
@@ -0,0 +1,25 @@
+"""Rolling conversation summary
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-16
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("conversations") as batch:
+        batch.add_column(sa.Column("history_summary", sa.Text, nullable=False, server_default=""))
+        batch.add_column(sa.Column("summary_through_seq", sa.Integer, nullable=False, server_default="-1"))
+
+
+def downgrade():
+    with op.batch_alter_table("conversations") as batch:
+        batch.drop_column("summary_through_seq")
+        batch.drop_column("history_summary")
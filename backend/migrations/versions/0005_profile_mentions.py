@@ -0,0 +1,23 @@
+"""Profile mention counts
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-16
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("conversations") as batch:
+        batch.add_column(sa.Column("profile_mentions", sa.JSON, nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("conversations") as batch:
+        batch.drop_column("profile_mentions")
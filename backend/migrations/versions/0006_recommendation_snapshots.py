@@ -0,0 +1,25 @@
+"""Recommendation snapshot fingerprints
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-16
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("conversations") as batch:
+        batch.add_column(sa.Column("recommendations_fingerprint", sa.String(64), nullable=True))
+        batch.add_column(sa.Column("recommendations_generated_at", sa.DateTime, nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("conversations") as batch:
+        batch.drop_column("recommendations_generated_at")
+        batch.drop_column("recommendations_fingerprint")
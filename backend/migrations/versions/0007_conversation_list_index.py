@@ -0,0 +1,25 @@
+"""Conversation list index covers the id tiebreak
+
+The list is ordered by (updated_at, id); without id in the index SQLite sorts
+each page in a temporary B-tree.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-16
+"""
+from alembic import op
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_conversations_user_id_updated_at_id", "conversations", ["user_id", "updated_at", "id"])
+    op.drop_index("ix_conversations_user_id_updated_at", table_name="conversations")
+
+
+def downgrade():
+    op.create_index("ix_conversations_user_id_updated_at", "conversations", ["user_id", "updated_at"])
+    op.drop_index("ix_conversations_user_id_updated_at_id", table_name="conversations")
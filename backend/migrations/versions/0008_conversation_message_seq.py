@@ -0,0 +1,27 @@
+"""Per-conversation message seq counter
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-16
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("conversations") as batch:
+        batch.add_column(sa.Column("next_message_seq", sa.Integer, nullable=False, server_default="0"))
+    op.execute(sa.text(
+        "UPDATE conversations SET next_message_seq = COALESCE("
+        "(SELECT MAX(seq) + 1 FROM conversation_messages WHERE conversation_messages.conversation_id = conversations.id), 0)"
+    ))
+
+
+def downgrade():
+    with op.batch_alter_table("conversations") as batch:
+        batch.drop_column("next_message_seq")
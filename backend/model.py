@@ -24,6 +24,18 @@ class CareerRecommendationsResponse(BaseModel):
 class CareerKeywordsResponse(BaseModel):
     keywords: List[str]
 
+class CareerMatch(BaseModel):
+    onet_code: str
+    title: str
+    holland_code: str
+    # Weighted profile correlation in [-1, 1]; the per-assessment fits are None when not taken
+    score: float
+    holland_fit: Optional[float] = None
+    hexaco_fit: Optional[float] = None
+
+class CareerMatchResponse(BaseModel):
+    matches: List[CareerMatch]
+
 # User models
 class HexacoScores(BaseModel):
     honesty_humility: float = 0.0
@@ -123,6 +135,8 @@ class RoadmapRequest(BaseModel):
     # Optional: provide a specific conversation id so the server can use the
     # conversation history and any extracted user_profile when generating the roadmap
     conversation_id: Optional[str] = None
+    # Skip the roadmap cache and always generate a fresh roadmap
+    force_refresh: bool = False
 
 class StepDetailsRequest(BaseModel):
     step: RoadmapStep
@@ -161,6 +175,8 @@ class Conversation(BaseModel):
     career_recommendations: List[Dict] = []
     additional_advice: str = ""
     influence_breakdown: Dict[str, float] = {}
+    # The profile or assessment scores changed since career_recommendations were generated
+    recommendations_stale: bool = False
     created_at: Optional[str] = None
     updated_at: Optional[str] = None
 
@@ -175,3 +191,30 @@ class ConversationResponse(BaseModel):
 
 class GenerateRecommendationsRequest(BaseModel):
     conversation_id: str
+
+# Bulk recommendation job models
+class RecommendationJobRequest(BaseModel):
+    conversation_ids: List[str]
+
+class RecommendationJob(BaseModel):
+    id: str
+    source: str
+    status: str
+    total: int
+    completed: int
+    failed: int
+    created_at: Optional[str] = None
+    updated_at: Optional[str] = None
+
+class RecommendationJobItem(BaseModel):
+    position: int
+    label: str
+    conversation_id: Optional[str] = None
+    status: str
+    attempts: int = 0
+    error: str = ""
+    recommendations: Optional[CareerRecommendationsResponse] = None
+
+class RecommendationJobResults(BaseModel):
+    job: RecommendationJob
+    items: List[RecommendationJobItem]
@@ -0,0 +1,39 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from passlib.context import CryptContext
+
+load_dotenv()
+
+# bcrypt cost factor; stored hashes with a different cost are rehashed on login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Threads available for hashing; bcrypt releases the GIL, so these run in parallel
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+
+class PasswordHasher:
+    """Runs bcrypt on a bounded thread pool so hashing never blocks the event loop"""
+
+    def __init__(self, context: CryptContext = pwd_context, workers: int = PASSWORD_HASH_WORKERS):
+        self.context = context
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+
+    async def hash(self, password: str) -> str:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self.context.hash, password)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> tuple[bool, str | None]:
+        """Returns (valid, new_hash); new_hash is set when the stored hash should be
+        replaced, e.g. because BCRYPT_ROUNDS changed"""
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, self.context.verify_and_update, password, hashed_password
+        )
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+password_hasher = PasswordHasher()
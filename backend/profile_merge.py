@@ -0,0 +1,160 @@
+import re
+from model import Profile
+
+# Most values kept per list field; the least mentioned are dropped first
+PROFILE_FIELD_CAPS = {
+    "interests": 12,
+    "skills": 12,
+    "personality_traits": 8,
+    "values": 8,
+    "dislikes": 8
+}
+# Mention counts are kept for this many times the cap, so a dropped value can climb back
+PROFILE_MENTIONS_FACTOR = 4
+PROFILE_VALUE_MAX_CHARS = 80
+# Fields where the latest non-empty value replaces the previous one
+PROFILE_SCALAR_FIELDS = ["education", "experience_level"]
+# Older spellings of profile fields (users.user_profile was created with education_level)
+PROFILE_FIELD_ALIASES = {"education_level": "education"}
+
+_STOPWORDS = {"a", "an", "the", "of", "in", "on", "and", "or", "to", "for", "with", "at", "by", "my", "i"}
+_TOKEN = re.compile(r"[a-z0-9+#]+")
+
+
+def empty_profile() -> dict:
+    """Default conversation-scoped user profile"""
+    return {
+        "interests": [],
+        "skills": [],
+        "personality_traits": [],
+        "values": [],
+        "education": "",
+        "experience_level": "",
+        "dislikes": []
+    }
+
+
+def _stem(word: str) -> str:
+    """Crude suffix stripping, enough to line up "games"/"game" and "coding"/"code" """
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    for suffix in ("ing", "ed", "es", "s"):
+        if len(word) > len(suffix) + 2 and word.endswith(suffix) and not word.endswith("ss"):
+            word = word[:-len(suffix)]
+            break
+    if len(word) > 3 and word[-1] == word[-2] and word[-1] not in "aeiou":
+        word = word[:-1]
+    if len(word) > 3 and word.endswith("e"):
+        word = word[:-1]
+    return word
+
+
+def normalize_value(value: str) -> str:
+    """Dedupe key for a profile value: case, word order, filler words and
+    plural/verb endings are ignored ("Coding in Python" == "python coding")"""
+    words = [_stem(word) for word in _TOKEN.findall(value.lower()) if word not in _STOPWORDS]
+    return " ".join(sorted(words)) or value.strip().lower()
+
+
+def _clean(value) -> str:
+    if not isinstance(value, str):
+        return ""
+    return " ".join(value.split())[:PROFILE_VALUE_MAX_CHARS]
+
+
+def merge_profile(user_profile: dict, extracted: dict, mentions: dict | None = None) -> bool:
+    """Merge an extract_profile_info result into user_profile in place.
+
+    Values are deduplicated by normalize_value(); each one counts as a mention in
+    `mentions` ({field: {key: count}}, updated in place when given), and every
+    list is kept ordered by mention count and capped at PROFILE_FIELD_CAPS.
+    Returns True if the profile or the mention counts changed.
+    """
+    if mentions is None:
+        mentions = {}
+    before = {key: list(value) if isinstance(value, list) else value for key, value in user_profile.items()}
+    mentions_before = {key: dict(counts) for key, counts in mentions.items()}
+
+    for key, value in extracted.items():
+        if key not in user_profile:
+            continue
+        if key in PROFILE_SCALAR_FIELDS:
+            value = _clean(value if isinstance(value, str) else ", ".join(v for v in value or [] if isinstance(v, str)))
+            if value:
+                user_profile[key] = value
+            continue
+        values = value if isinstance(value, list) else [value]
+        # A value repeated within one extraction is still one mention
+        seen = set()
+        for item in values:
+            item = _clean(item)
+            norm = normalize_value(item) if item else ""
+            if norm and norm not in seen:
+                seen.add(norm)
+                _mention(user_profile, mentions, key, item, norm)
+
+    for key in PROFILE_FIELD_CAPS:
+        if key in user_profile:
+            _rank(user_profile, mentions, key)
+
+    return user_profile != before or mentions != mentions_before
+
+
+def canonical_profile(user_profile: dict | None, mentions: dict | None = None) -> tuple[dict, dict]:
+    """Rebuild a stored profile in canonical form.
+
+    Duplicates collapse into one value whose mention count is the number of
+    variants seen, lists are capped, unknown keys are dropped and the result is
+    validated against model.Profile. Returns (profile, mentions).
+    """
+    profile = empty_profile()
+    mentions = {key: dict(counts) for key, counts in (mentions or {}).items()}
+    known_counts = {key: dict(counts) for key, counts in mentions.items()}
+    for key, value in (user_profile or {}).items():
+        key = PROFILE_FIELD_ALIASES.get(key, key)
+        if key not in profile:
+            continue
+        if key in PROFILE_SCALAR_FIELDS:
+            profile[key] = _clean(value) or profile[key]
+            continue
+        for item in value if isinstance(value, list) else [value]:
+            item = _clean(item)
+            norm = normalize_value(item) if item else ""
+            if not norm:
+                continue
+            if norm in known_counts.get(key, {}):
+                # Counts carried over from an earlier merge already include this value
+                if not any(normalize_value(existing) == norm for existing in profile[key]):
+                    profile[key].append(item)
+                continue
+            _mention(profile, mentions, key, item, norm)
+
+    for key in PROFILE_FIELD_CAPS:
+        _rank(profile, mentions, key)
+    return Profile(**profile).model_dump(), mentions
+
+
+def _mention(user_profile: dict, mentions: dict, key: str, item: str, norm: str):
+    counts = mentions.setdefault(key, {})
+    counts[norm] = counts.get(norm, 0) + 1
+    if not isinstance(user_profile.get(key), list):
+        user_profile[key] = []
+    if not any(normalize_value(existing) == norm for existing in user_profile[key]):
+        user_profile[key].append(item)
+
+
+def _rank(user_profile: dict, mentions: dict, key: str):
+    """Order a list field by mention count (earlier first on ties) and apply its cap"""
+    counts = mentions.get(key, {})
+    values = user_profile.get(key) or []
+    # Keep the first spelling of each value
+    unique = {}
+    for item in values:
+        unique.setdefault(normalize_value(item), item)
+    ranked = sorted(unique.items(), key=lambda entry: -counts.get(entry[0], 1))
+    user_profile[key] = [item for _, item in ranked[:PROFILE_FIELD_CAPS[key]]]
+
+    limit = PROFILE_FIELD_CAPS[key] * PROFILE_MENTIONS_FACTOR
+    if len(counts) > limit:
+        kept = set(unique) | {norm for norm, _ in sorted(counts.items(), key=lambda entry: -entry[1])[:limit]}
+        mentions[key] = {norm: count for norm, count in counts.items() if norm in kept}
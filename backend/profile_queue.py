@@ -0,0 +1,201 @@
+import asyncio
+import os
+import uuid
+import weakref
+from datetime import datetime, timedelta
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import flag_modified
+from dotenv import load_dotenv
+from db import AsyncSessionLocal, DBConversation, DBProfileExtractionJob
+from profile_merge import empty_profile, merge_profile
+from local_extractor import local_extractor
+
+load_dotenv()
+
+# When enabled, /answer only generates the next question and profile extraction
+# runs in the background from the queue below
+DEFERRED_PROFILE_EXTRACTION = os.getenv("DEFERRED_PROFILE_EXTRACTION", "false").lower() in ("1", "true", "yes")
+PROFILE_EXTRACTION_WORKERS = int(os.getenv("PROFILE_EXTRACTION_WORKERS", "2"))
+PROFILE_EXTRACTION_MAX_ATTEMPTS = int(os.getenv("PROFILE_EXTRACTION_MAX_ATTEMPTS", "3"))
+PROFILE_EXTRACTION_WAIT_SECONDS = float(os.getenv("PROFILE_EXTRACTION_WAIT_SECONDS", "30"))
+# Jobs left "running" longer than this (e.g. by a crashed worker) are picked up again
+PROFILE_EXTRACTION_LEASE_SECONDS = int(os.getenv("PROFILE_EXTRACTION_LEASE_SECONDS", "300"))
+
+
+class ProfileExtractionQueue:
+    """In-process work queue for extract_profile_info backed by profile_extraction_jobs.
+
+    Jobs are written to the database in the same commit as the user's answer, so
+    anything not finished when the process stops is picked up again on start().
+    """
+
+    def __init__(self, agent, session_factory=AsyncSessionLocal, workers: int = PROFILE_EXTRACTION_WORKERS, max_attempts: int = PROFILE_EXTRACTION_MAX_ATTEMPTS):
+        self.agent = agent
+        self.session_factory = session_factory
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self._queue: asyncio.Queue | None = None
+        self._tasks: list[asyncio.Task] = []
+        # conversation_id -> {job_id: future resolved when the job settles}
+        self._inflight: dict[str, dict[str, asyncio.Future]] = {}
+        self._conversation_locks = weakref.WeakValueDictionary()
+
+    async def start(self):
+        """Start the workers and re-queue jobs left over from a previous run"""
+        self._queue = asyncio.Queue()
+        async with self.session_factory() as db:
+            stale_before = datetime.utcnow() - timedelta(seconds=PROFILE_EXTRACTION_LEASE_SECONDS)
+            await db.execute(update(DBProfileExtractionJob).where(
+                DBProfileExtractionJob.status == "running",
+                DBProfileExtractionJob.updated_at < stale_before
+            ).values(status="pending"))
+            await db.commit()
+            leftover = (await db.execute(select(DBProfileExtractionJob.id, DBProfileExtractionJob.conversation_id).where(
+                DBProfileExtractionJob.status == "pending"
+            ).order_by(DBProfileExtractionJob.created_at))).all()
+
+        for job_id, conversation_id in leftover:
+            self.submit(job_id, conversation_id)
+        if leftover:
+            print(f"Re-queued {len(leftover)} pending profile extraction jobs")
+
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        self._queue = None
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def enqueue(self, db: AsyncSession, conversation_id: str, question: str, answer: str) -> DBProfileExtractionJob:
+        """Add a job row to the caller's session. Call submit() once it is committed."""
+        job = DBProfileExtractionJob(
+            id=str(uuid.uuid4()),
+            conversation_id=conversation_id,
+            question=question,
+            answer=answer,
+            status="pending",
+            attempts=0
+        )
+        db.add(job)
+        return job
+
+    def submit(self, job_id: str, conversation_id: str):
+        """Hand a committed job to the workers"""
+        if self._queue is None:
+            # Not started; the job stays pending and runs from wait_for_conversation()
+            return
+        jobs = self._inflight.setdefault(conversation_id, {})
+        if job_id not in jobs:
+            jobs[job_id] = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((job_id, conversation_id))
+
+    async def wait_for_conversation(self, conversation_id: str, timeout: float = PROFILE_EXTRACTION_WAIT_SECONDS) -> bool:
+        """Block until no extraction jobs are outstanding for a conversation.
+
+        In-flight jobs are awaited; anything still pending in the database
+        (queued behind other work or written by another process) is run inline.
+        Returns True if there was anything to wait for.
+        """
+        futures = list(self._inflight.get(conversation_id, {}).values())
+        if futures:
+            await asyncio.wait(futures, timeout=timeout)
+
+        async with self.session_factory() as db:
+            pending = list(await db.scalars(select(DBProfileExtractionJob.id).where(
+                DBProfileExtractionJob.conversation_id == conversation_id,
+                DBProfileExtractionJob.status == "pending"
+            ).order_by(DBProfileExtractionJob.created_at)))
+
+        for job_id in pending:
+            await self._run(job_id, conversation_id)
+
+        return bool(futures or pending)
+
+    async def _worker(self):
+        while True:
+            job_id, conversation_id = await self._queue.get()
+            try:
+                await self._run(job_id, conversation_id)
+            except Exception as e:
+                print(f"Profile extraction worker error: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str, conversation_id: str):
+        # Serialize merges per conversation so concurrent jobs don't overwrite each other
+        lock = self._conversation_locks.get(conversation_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._conversation_locks[conversation_id] = lock
+        async with lock:
+            attempt = await self._process(job_id)
+        if attempt is None:
+            # Claimed elsewhere; whoever runs it settles it
+            return
+        if attempt:
+            asyncio.get_running_loop().call_later(2 ** attempt, self.submit, job_id, conversation_id)
+        else:
+            self._settle(job_id, conversation_id)
+
+    async def _process(self, job_id: str) -> int | None:
+        """Run one job. Returns the attempt number if it should be retried,
+        None if it could not be claimed, else 0."""
+        async with self.session_factory() as db:
+            # Claim the job; another worker or process may already have it
+            claimed = await db.execute(update(DBProfileExtractionJob).where(
+                DBProfileExtractionJob.id == job_id,
+                DBProfileExtractionJob.status == "pending"
+            ).values(status="running"))
+            await db.commit()
+            if not claimed.rowcount:
+                return None
+
+            job = await db.get(DBProfileExtractionJob, job_id)
+            try:
+                extracted = await self.agent.extract_profile_info(job.question, job.answer, fallback=False)
+            except Exception as e:
+                job.attempts += 1
+                job.error = str(e) or type(e).__name__
+                if job.attempts < self.max_attempts:
+                    job.status = "pending"
+                    await db.commit()
+                    return job.attempts
+                # Out of attempts: keep whatever the rules can find rather than dropping the answer
+                job.status = "failed"
+                await self._merge(db, job.conversation_id, local_extractor.extract(job.question, job.answer, best_effort=True))
+                await db.commit()
+                return 0
+
+            # Merge and completion are committed together
+            await self._merge(db, job.conversation_id, extracted)
+            job.attempts += 1
+            job.status = "done"
+            await db.commit()
+            return 0
+
+    async def _merge(self, db: AsyncSession, conversation_id: str, extracted: dict | None):
+        db_conversation = await db.scalar(select(DBConversation).where(
+            DBConversation.id == conversation_id
+        ).with_for_update())
+        if db_conversation is None or extracted is None:
+            return
+        if not db_conversation.user_profile:
+            db_conversation.user_profile = empty_profile()
+        if db_conversation.profile_mentions is None:
+            db_conversation.profile_mentions = {}
+        if merge_profile(db_conversation.user_profile, extracted, db_conversation.profile_mentions):
+            flag_modified(db_conversation, "user_profile")
+            flag_modified(db_conversation, "profile_mentions")
+
+    def _settle(self, job_id: str, conversation_id: str):
+        jobs = self._inflight.get(conversation_id)
+        if not jobs:
+            return
+        future = jobs.pop(job_id, None)
+        if future is not None and not future.done():
+            future.set_result(None)
+        if not jobs:
+            self._inflight.pop(conversation_id, None)
@@ -0,0 +1,141 @@
+import math
+import os
+from dataclasses import dataclass
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Token budgets per prompt; the conversation section gets whatever the fixed text leaves
+QUESTION_PROMPT_TOKEN_BUDGET = int(os.getenv("QUESTION_PROMPT_TOKEN_BUDGET", "1500"))
+ROADMAP_PROMPT_TOKEN_BUDGET = int(os.getenv("ROADMAP_PROMPT_TOKEN_BUDGET", "2500"))
+# Longest a single conversation turn may be in a prompt
+PROMPT_TURN_MAX_TOKENS = int(os.getenv("PROMPT_TURN_MAX_TOKENS", "150"))
+
+# Gemini averages about four characters per token; close enough for budgeting
+# without a count_tokens round trip per call
+CHARS_PER_TOKEN = 4
+
+
+def count_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    return text[:max(max_chars - 3, 0)].rstrip() + "..."
+
+
+def summary_entry(summary: str) -> dict:
+    """History entry carrying the rolling summary of turns no longer sent verbatim"""
+    return {"role": "summary", "parts": [summary]}
+
+
+def compact_profile(user_profile: dict | None) -> str:
+    """One "key: value" line per non-empty profile field"""
+    lines = []
+    for key, value in (user_profile or {}).items():
+        if isinstance(value, list):
+            value = ", ".join(str(item) for item in value if item)
+        if value:
+            lines.append(f"{key}: {value}")
+    return "\n".join(lines)
+
+
+@dataclass
+class PromptStats:
+    name: str
+    tokens: int
+    budget: int
+    history_tokens: int = 0
+    turns: int = 0
+    dropped_turns: int = 0
+    summary_tokens: int = 0
+
+
+class PromptBuilder:
+    """Assembles a prompt from text parts and one conversation section within a token budget.
+
+    Text parts are always included. The conversation section gets the tokens
+    they leave: the rolling summary first, then the newest turns that still
+    fit, each capped at PROMPT_TURN_MAX_TOKENS. build() reports the prompt size.
+    """
+
+    def __init__(self, name: str, budget: int, separator: str = "\n"):
+        self.name = name
+        self.budget = budget
+        self.separator = separator
+        self._parts: list = []
+        self._history = None
+        self.stats: PromptStats | None = None
+
+    def add(self, *parts: str) -> "PromptBuilder":
+        self._parts.extend(parts)
+        return self
+
+    def add_history(self, history: list | None, render_turn, summary_label: str = "Summary of earlier conversation") -> "PromptBuilder":
+        """Place the conversation section here.
+
+        render_turn(role, text) returns the line for a turn, or None to skip it;
+        the entry from summary_entry() is rendered as "<summary_label>: ...".
+        """
+        self._history = len(self._parts)
+        self._parts.append("")
+        self._render_turn = render_turn
+        self._summary_label = summary_label
+        self._history_entries = history or []
+        return self
+
+    def build(self) -> str:
+        stats = PromptStats(self.name, 0, self.budget)
+        if self._history is not None:
+            fixed = self.separator.join(part for i, part in enumerate(self._parts) if i != self._history)
+            available = self.budget - count_tokens(fixed)
+            self._parts[self._history] = self._fit_history(available, stats)
+
+        prompt = self.separator.join(self._parts)
+        stats.tokens = count_tokens(prompt)
+        self.stats = stats
+        print(
+            f"Prompt {stats.name}: {stats.tokens}/{stats.budget} tokens "
+            f"(history {stats.history_tokens}: {stats.turns} turns, {stats.dropped_turns} dropped, summary {stats.summary_tokens})"
+        )
+        return prompt
+
+    def _fit_history(self, available: int, stats: PromptStats) -> str:
+        summary = ""
+        turns = []
+        for item in self._history_entries:
+            if not isinstance(item, dict) or not item.get("parts"):
+                continue
+            role, text = item.get("role", ""), item["parts"][0]
+            if role == "summary":
+                summary = text
+            elif text:
+                line = self._render_turn(role, truncate_tokens(text, PROMPT_TURN_MAX_TOKENS))
+                if line:
+                    turns.append(line)
+
+        lines = []
+        if summary and available > 0:
+            # The summary may take at most half of what is left so recent turns still fit
+            line = f"{self._summary_label}: {truncate_tokens(summary, max(available // 2, 1))}"
+            stats.summary_tokens = count_tokens(line)
+            available -= stats.summary_tokens
+            lines.append(line)
+
+        kept = []
+        for line in reversed(turns):
+            cost = count_tokens(line + self.separator)
+            if cost > available:
+                break
+            kept.append(line)
+            available -= cost
+        lines.extend(reversed(kept))
+
+        stats.turns = len(kept)
+        stats.dropped_turns = len(turns) - len(kept)
+        text = self.separator.join(lines)
+        stats.history_tokens = count_tokens(text)
+        return text
@@ -0,0 +1,94 @@
+import hashlib
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from db import AsyncSessionLocal, DBPrompt
+
+# Registry name of DynamicCareerGuidanceAgent.system_prompt
+CAREER_GUIDANCE_SYSTEM_PROMPT = "career_guidance.system"
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class PromptRegistry:
+    """Versioned prompt texts stored once in the prompts table.
+
+    Histories keep {"role": "system", "prompt_id": ...} instead of the prompt
+    text. Registering the same text again returns the existing id; changed
+    text gets the next version. Prompts never change once stored, so lookups
+    are cached for the life of the process.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal):
+        self.session_factory = session_factory
+        self._ids: dict[tuple[str, str], str] = {}
+        self._contents: dict[str, str] = {}
+
+    async def register(self, name: str, content: str) -> str:
+        """Return the id for this prompt text, storing a new version if needed"""
+        digest = content_hash(content)
+        prompt_id = self._ids.get((name, digest))
+        if prompt_id is not None:
+            return prompt_id
+
+        # Own session so a registration never commits or rolls back the caller's work
+        async with self.session_factory() as db:
+            for _ in range(3):
+                existing = await db.scalar(select(DBPrompt.id).where(
+                    DBPrompt.name == name,
+                    DBPrompt.content_hash == digest
+                ))
+                if existing is not None:
+                    prompt_id = existing
+                    break
+                version = (await db.scalar(select(func.max(DBPrompt.version)).where(DBPrompt.name == name)) or 0) + 1
+                db.add(DBPrompt(
+                    id=f"{name}@{version}",
+                    name=name,
+                    version=version,
+                    content_hash=digest,
+                    content=content
+                ))
+                try:
+                    await db.commit()
+                    prompt_id = f"{name}@{version}"
+                    break
+                except IntegrityError:
+                    # Another worker registered it (or took the version) first
+                    await db.rollback()
+            else:
+                raise RuntimeError(f"Could not register prompt {name}")
+
+        self._ids[(name, digest)] = prompt_id
+        self._contents[prompt_id] = content
+        return prompt_id
+
+    async def get(self, prompt_id: str) -> str | None:
+        if prompt_id in self._contents:
+            return self._contents[prompt_id]
+        async with self.session_factory() as db:
+            content = await db.scalar(select(DBPrompt.content).where(DBPrompt.id == prompt_id))
+        if content is not None:
+            self._contents[prompt_id] = content
+        return content
+
+    async def compact_history(self, history: list | None, name: str = CAREER_GUIDANCE_SYSTEM_PROMPT) -> bool:
+        """Replace inline system prompts in a JSON history with references, in place.
+
+        Returns True if anything changed.
+        """
+        changed = False
+        for i, item in enumerate(history or []):
+            if isinstance(item, dict) and item.get("role") == "system" and "prompt_id" not in item:
+                parts = item.get("parts") or [""]
+                history[i] = system_entry(await self.register(name, parts[0]))
+                changed = True
+        return changed
+
+
+def system_entry(prompt_id: str) -> dict:
+    return {"role": "system", "prompt_id": prompt_id}
+
+
+prompt_registry = PromptRegistry()
@@ -0,0 +1,353 @@
+import asyncio
+import csv
+import io
+import os
+import uuid
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from google.api_core.exceptions import ResourceExhausted, TooManyRequests
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from db import AsyncSessionLocal, DBConversation, DBRecommendationJob, DBRecommendationJobItem
+from model import HexacoScores, HollandScores
+from career_catalog import HEXACO_FIELDS, HOLLAND_FIELDS
+from profile_merge import empty_profile
+from recommendation_snapshots import load_assessment_scores, recommendation_fingerprint
+
+load_dotenv()
+
+# Items generated at once per job; kept below LLM_MAX_CONCURRENCY so interactive
+# requests still get model slots while a cohort is being processed
+RECOMMENDATION_JOB_CONCURRENCY = int(os.getenv("RECOMMENDATION_JOB_CONCURRENCY", "4"))
+RECOMMENDATION_JOB_MAX_ATTEMPTS = int(os.getenv("RECOMMENDATION_JOB_MAX_ATTEMPTS", "3"))
+# Items claimed, and their results committed, together
+RECOMMENDATION_JOB_BATCH_SIZE = int(os.getenv("RECOMMENDATION_JOB_BATCH_SIZE", "20"))
+RECOMMENDATION_JOB_MAX_ITEMS = int(os.getenv("RECOMMENDATION_JOB_MAX_ITEMS", "1000"))
+# How long every job worker backs off after the model reports a rate limit
+RECOMMENDATION_JOB_RATE_LIMIT_SECONDS = float(os.getenv("RECOMMENDATION_JOB_RATE_LIMIT_SECONDS", "30"))
+# Items left "running" longer than this (e.g. by a crashed worker) are picked up again
+RECOMMENDATION_JOB_LEASE_SECONDS = int(os.getenv("RECOMMENDATION_JOB_LEASE_SECONDS", "600"))
+# Delay before a job that stopped on an unexpected error (e.g. the database) is resumed
+RECOMMENDATION_JOB_RESUME_SECONDS = float(os.getenv("RECOMMENDATION_JOB_RESUME_SECONDS", "30"))
+
+# Cohort CSV columns besides the profile fields and assessment scores
+CSV_LABEL_COLUMNS = ["label", "name"]
+# Separator for list-valued profile fields, e.g. "python;robotics"
+CSV_LIST_SEPARATOR = ";"
+
+
+def parse_profiles_csv(text: str) -> list[dict]:
+    """Items for a cohort CSV, one per row.
+
+    Columns: label (or name), any user_profile field (list fields separated by
+    ";") and optionally all six HEXACO and/or all six Holland RIASEC scores.
+    Raises ValueError if the file is malformed.
+    """
+    reader = csv.DictReader(io.StringIO(text))
+    if not reader.fieldnames:
+        raise ValueError("CSV has no header row")
+    profile_fields = empty_profile()
+    columns = {name.strip() for name in reader.fieldnames if name}
+    unknown = columns - set(CSV_LABEL_COLUMNS) - set(profile_fields) - set(HEXACO_FIELDS) - set(HOLLAND_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown CSV columns: {', '.join(sorted(unknown))}")
+
+    items = []
+    for line, raw in enumerate(reader, start=2):
+        row = {key.strip(): (value or "").strip() for key, value in raw.items() if key}
+        user_profile = empty_profile()
+        for key, default in profile_fields.items():
+            if not row.get(key):
+                continue
+            if isinstance(default, list):
+                user_profile[key] = [value.strip() for value in row[key].split(CSV_LIST_SEPARATOR) if value.strip()]
+            else:
+                user_profile[key] = row[key]
+        items.append({
+            "label": next((row[column] for column in CSV_LABEL_COLUMNS if row.get(column)), f"Row {line - 1}"),
+            "inputs": {
+                "user_profile": user_profile,
+                "hexaco_scores": _csv_scores(row, HEXACO_FIELDS, "HEXACO", line),
+                "holland_scores": _csv_scores(row, HOLLAND_FIELDS, "Holland", line)
+            }
+        })
+    return items
+
+
+def _csv_scores(row: dict, fields: list[str], name: str, line: int) -> dict | None:
+    present = [field for field in fields if row.get(field)]
+    if not present:
+        return None
+    if len(present) < len(fields):
+        raise ValueError(f"Line {line}: {name} scores need all of {', '.join(fields)}")
+    try:
+        return {field: float(row[field]) for field in fields}
+    except ValueError:
+        raise ValueError(f"Line {line}: {name} scores must be numbers")
+
+
+def _is_rate_limited(e: Exception) -> bool:
+    return isinstance(e, (ResourceExhausted, TooManyRequests)) or "429" in str(e)
+
+
+class RecommendationJobRunner:
+    """Background generation of recommendations for bulk jobs.
+
+    Each job's items are claimed and committed in batches and generated with
+    bounded concurrency. Failed items are retried with backoff, and a rate-limit
+    error from the model pauses every worker of this runner. Jobs interrupted
+    by a restart resume on start(), and ones stopped by an unexpected error
+    resume after RECOMMENDATION_JOB_RESUME_SECONDS.
+    """
+
+    def __init__(self, agent, profile_queue=None, session_factory=AsyncSessionLocal,
+                 concurrency: int = RECOMMENDATION_JOB_CONCURRENCY, max_attempts: int = RECOMMENDATION_JOB_MAX_ATTEMPTS,
+                 batch_size: int = RECOMMENDATION_JOB_BATCH_SIZE):
+        self.agent = agent
+        self.profile_queue = profile_queue
+        self.session_factory = session_factory
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.batch_size = batch_size
+        self._started = False
+        self._tasks: dict[str, asyncio.Task] = {}
+        # Event-loop time before which no item is sent to the model
+        self._resume_at = 0.0
+
+    async def start(self):
+        """Start accepting jobs and resume the ones left over from a previous run"""
+        # Items a crashed run left "running" are reclaimed by _claim_batch once their lease expires
+        async with self.session_factory() as db:
+            unfinished = list(await db.scalars(select(DBRecommendationJob.id).where(
+                DBRecommendationJob.status.in_(["pending", "running"])
+            ).order_by(DBRecommendationJob.created_at)))
+
+        self._started = True
+        for job_id in unfinished:
+            self.submit(job_id)
+        if unfinished:
+            print(f"Resumed {len(unfinished)} recommendation jobs")
+
+    async def stop(self):
+        self._started = False
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def enqueue(self, db: AsyncSession, user_id: str, source: str, items: list[dict]) -> DBRecommendationJob:
+        """Add a job and its items to the caller's session. Call submit() once it is committed.
+
+        Each item is a dict of DBRecommendationJobItem columns: label and either
+        conversation_id or inputs.
+        """
+        job = DBRecommendationJob(
+            id=str(uuid.uuid4()),
+            user_id=user_id,
+            source=source,
+            status="pending",
+            total=len(items),
+            completed=0,
+            failed=0
+        )
+        db.add(job)
+        db.add_all([
+            DBRecommendationJobItem(id=str(uuid.uuid4()), job_id=job.id, position=position, status="pending", attempts=0, error="", **item)
+            for position, item in enumerate(items)
+        ])
+        return job
+
+    def submit(self, job_id: str):
+        """Start working on a committed job"""
+        if not self._started or job_id in self._tasks:
+            return
+        task = asyncio.create_task(self._run_job(job_id))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+    async def _run_job(self, job_id: str):
+        batch = []
+        try:
+            async with self.session_factory() as db:
+                job = await db.get(DBRecommendationJob, job_id)
+                if job is None:
+                    return
+                job.status = "running"
+                # Conversation items all belong to the job's owner
+                hexaco_scores, holland_scores = await load_assessment_scores(db, job.user_id)
+                await db.commit()
+
+            semaphore = asyncio.Semaphore(self.concurrency)
+            while True:
+                batch = await self._claim_batch(job_id)
+                if not batch:
+                    break
+                profiles = await self._conversation_profiles(batch)
+                results = await asyncio.gather(*(
+                    self._generate(item, profiles, hexaco_scores, holland_scores, semaphore) for item in batch
+                ))
+                await self._save_batch(job_id, batch, results, profiles, hexaco_scores, holland_scores)
+                batch = []
+
+            await self._finish(job_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Recommendation job {job_id} error: {e}; resuming in {RECOMMENDATION_JOB_RESUME_SECONDS:.0f}s")
+            await self._release(batch)
+            asyncio.get_running_loop().call_later(RECOMMENDATION_JOB_RESUME_SECONDS, self.submit, job_id)
+
+    async def _release(self, batch):
+        """Hand a batch whose results were not saved back to pending"""
+        if not batch:
+            return
+        try:
+            async with self.session_factory() as db:
+                await db.execute(update(DBRecommendationJobItem).where(
+                    DBRecommendationJobItem.id.in_([item.id for item in batch]),
+                    DBRecommendationJobItem.status == "running"
+                ).values(status="pending", updated_at=datetime.utcnow()))
+                await db.commit()
+        except Exception as e:
+            # Their lease expires and _claim_batch picks them up again
+            print(f"Could not release recommendation job items: {e}")
+
+    async def _claim_batch(self, job_id: str) -> list:
+        """Mark the next batch of pending items, or running ones whose lease has
+        expired, as running and return them"""
+        claimable = or_(
+            DBRecommendationJobItem.status == "pending",
+            and_(
+                DBRecommendationJobItem.status == "running",
+                DBRecommendationJobItem.updated_at < datetime.utcnow() - timedelta(seconds=RECOMMENDATION_JOB_LEASE_SECONDS)
+            )
+        )
+        async with self.session_factory() as db:
+            item_ids = list(await db.scalars(select(DBRecommendationJobItem.id).where(
+                DBRecommendationJobItem.job_id == job_id,
+                claimable
+            ).order_by(DBRecommendationJobItem.position).limit(self.batch_size)))
+            if not item_ids:
+                return []
+            # Another process may already have claimed some of them
+            claimed = (await db.execute(update(DBRecommendationJobItem).where(
+                DBRecommendationJobItem.id.in_(item_ids),
+                claimable
+            ).values(status="running", updated_at=datetime.utcnow()).returning(
+                DBRecommendationJobItem.id,
+                DBRecommendationJobItem.conversation_id,
+                DBRecommendationJobItem.inputs,
+                DBRecommendationJobItem.attempts
+            ))).all()
+            await db.commit()
+        return claimed
+
+    async def _conversation_profiles(self, batch) -> dict[str, dict]:
+        """conversation_id -> user_profile for the batch's conversation items"""
+        conversation_ids = [item.conversation_id for item in batch if item.conversation_id]
+        if not conversation_ids:
+            return {}
+        if self.profile_queue is not None:
+            # Let background profile extraction catch up first
+            await asyncio.gather(*(self.profile_queue.wait_for_conversation(cid) for cid in conversation_ids))
+        async with self.session_factory() as db:
+            rows = await db.execute(select(DBConversation.id, DBConversation.user_profile).where(
+                DBConversation.id.in_(conversation_ids)
+            ))
+            return {conversation_id: user_profile or {} for conversation_id, user_profile in rows}
+
+    async def _generate(self, item, profiles: dict, hexaco_scores, holland_scores, semaphore: asyncio.Semaphore):
+        """Returns (recommendations or None, error, attempts)"""
+        if item.conversation_id:
+            if item.conversation_id not in profiles:
+                return None, "Conversation not found", item.attempts
+            user_profile = profiles[item.conversation_id]
+        else:
+            inputs = item.inputs or {}
+            user_profile = inputs.get("user_profile") or {}
+            hexaco_scores = HexacoScores(**inputs["hexaco_scores"]) if inputs.get("hexaco_scores") else None
+            holland_scores = HollandScores(**inputs["holland_scores"]) if inputs.get("holland_scores") else None
+
+        attempts = item.attempts
+        while True:
+            delay = 0
+            async with semaphore:
+                await self._wait_for_rate_limit()
+                attempts += 1
+                try:
+                    recommendations = await self.agent.generate_recommendations(
+                        user_profile, hexaco_scores, holland_scores, fallback=False
+                    )
+                    return recommendations, "", attempts
+                except Exception as e:
+                    if attempts >= self.max_attempts:
+                        return None, str(e) or type(e).__name__, attempts
+                    if _is_rate_limited(e):
+                        self._pause(RECOMMENDATION_JOB_RATE_LIMIT_SECONDS)
+                    else:
+                        delay = 2 ** attempts
+            # Back off without holding a slot the job's other items could use
+            await asyncio.sleep(delay)
+
+    def _pause(self, seconds: float):
+        loop = asyncio.get_running_loop()
+        if self._resume_at < loop.time() + seconds:
+            print(f"Model rate limited; pausing recommendation jobs for {seconds:.0f}s")
+            self._resume_at = loop.time() + seconds
+
+    async def _wait_for_rate_limit(self):
+        delay = self._resume_at - asyncio.get_running_loop().time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _save_batch(self, job_id: str, batch, results, profiles: dict, hexaco_scores, holland_scores):
+        """Write a batch's results, its conversations and the job's progress in one commit"""
+        item_rows, conversation_rows = [], []
+        completed = failed = 0
+        for item, (recommendations, error, attempts) in zip(batch, results):
+            item_rows.append({
+                "id": item.id,
+                "status": "done" if recommendations else "failed",
+                "attempts": attempts,
+                "error": error,
+                "result": recommendations.model_dump() if recommendations else None,
+                "updated_at": datetime.utcnow()
+            })
+            if recommendations is None:
+                failed += 1
+                continue
+            completed += 1
+            if item.conversation_id:
+                conversation_rows.append({
+                    "id": item.conversation_id,
+                    "career_recommendations": [rec.model_dump() for rec in recommendations.recommendations],
+                    "additional_advice": recommendations.additional_advice,
+                    "influence_breakdown": recommendations.influence_breakdown,
+                    "recommendations_fingerprint": recommendation_fingerprint(profiles[item.conversation_id], hexaco_scores, holland_scores),
+                    "recommendations_generated_at": datetime.utcnow(),
+                    "updated_at": datetime.utcnow()
+                })
+
+        async with self.session_factory() as db:
+            # Bulk UPDATE by primary key: one executemany per table
+            await db.execute(update(DBRecommendationJobItem), item_rows)
+            if conversation_rows:
+                await db.execute(update(DBConversation), conversation_rows)
+            await db.execute(update(DBRecommendationJob).where(DBRecommendationJob.id == job_id).values(
+                completed=DBRecommendationJob.completed + completed,
+                failed=DBRecommendationJob.failed + failed
+            ))
+            await db.commit()
+        print(f"Recommendation job {job_id}: {completed} done, {failed} failed in this batch")
+
+    async def _finish(self, job_id: str):
+        async with self.session_factory() as db:
+            # Items claimed by another process may still be running
+            remaining = await db.scalar(select(func.count()).select_from(DBRecommendationJobItem).where(
+                DBRecommendationJobItem.job_id == job_id,
+                DBRecommendationJobItem.status.in_(["pending", "running"])
+            ))
+            if not remaining:
+                await db.execute(update(DBRecommendationJob).where(DBRecommendationJob.id == job_id).values(status="done"))
+                await db.commit()
@@ -0,0 +1,153 @@
+import asyncio
+import hashlib
+import json
+import os
+from datetime import datetime
+from dotenv import load_dotenv
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from db import AsyncSessionLocal, DBConversation, DBHexacoScores, DBHollandScores
+from career_catalog import HEXACO_FIELDS, HOLLAND_FIELDS
+from model import HexacoScores, HollandScores
+from profile_merge import empty_profile, normalize_value
+
+load_dotenv()
+
+# Generate recommendations in the background once a conversation's profile is complete enough
+RECOMMENDATION_PREGENERATION = os.getenv("RECOMMENDATION_PREGENERATION", "false").lower() in ("1", "true", "yes")
+# Profile fields (of user_profile's seven) that must be filled in first
+RECOMMENDATION_PREGENERATION_MIN_FIELDS = int(os.getenv("RECOMMENDATION_PREGENERATION_MIN_FIELDS", "4"))
+# Quiet period after the latest answer, so a run of answers costs one model call
+RECOMMENDATION_PREGENERATION_DELAY_SECONDS = float(os.getenv("RECOMMENDATION_PREGENERATION_DELAY_SECONDS", "20"))
+# Bump when the recommendations prompt changes enough that old snapshots should be regenerated
+RECOMMENDATION_SNAPSHOT_VERSION = 1
+
+
+def recommendation_fingerprint(user_profile: dict | None, hexaco_scores: HexacoScores | None, holland_scores: HollandScores | None) -> str:
+    """Content hash of everything recommendations are generated from.
+
+    Profile values are compared by normalize_value(), so re-ranking or
+    respelling a value does not invalidate a snapshot; any new value or
+    changed score does.
+    """
+    profile = {}
+    for field, default in empty_profile().items():
+        value = (user_profile or {}).get(field)
+        if isinstance(default, list):
+            profile[field] = sorted({normalize_value(item) for item in value or [] if isinstance(item, str) and item.strip()})
+        else:
+            profile[field] = normalize_value(value) if isinstance(value, str) and value.strip() else ""
+    content = {
+        "version": RECOMMENDATION_SNAPSHOT_VERSION,
+        "profile": profile,
+        "hexaco": hexaco_scores.model_dump() if hexaco_scores else None,
+        "holland": holland_scores.model_dump() if holland_scores else None,
+    }
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+async def load_assessment_scores(db: AsyncSession, user_id: str) -> tuple[HexacoScores | None, HollandScores | None]:
+    """The user's current scores, read from the database.
+
+    Snapshots are fingerprinted with these rather than the scores cached
+    on the auth principal, which other workers may hold for up to
+    AUTH_CACHE_TTL_SECONDS after a score update.
+    """
+    db_hexaco = await db.scalar(select(DBHexacoScores).where(DBHexacoScores.user_id == user_id))
+    db_holland = await db.scalar(select(DBHollandScores).where(DBHollandScores.user_id == user_id))
+    hexaco_scores = HexacoScores(**{field: getattr(db_hexaco, field) for field in HEXACO_FIELDS}) if db_hexaco else None
+    holland_scores = HollandScores(**{field: getattr(db_holland, field) for field in HOLLAND_FIELDS}) if db_holland else None
+    return hexaco_scores, holland_scores
+
+
+def profile_completeness(user_profile: dict | None) -> int:
+    """Number of user_profile fields that have a value"""
+    return sum(1 for field in empty_profile() if (user_profile or {}).get(field))
+
+
+class RecommendationPregenerator:
+    """Keeps a conversation's recommendations snapshot ready before it is asked for.
+
+    schedule() is called after every answer. Once answers stop for `delay`
+    seconds and the profile has at least `min_fields` fields, recommendations
+    are generated and stored with their fingerprint, unless the stored
+    snapshot already matches. Generation failures are only logged; the
+    request path generates as usual.
+    """
+
+    def __init__(self, agent, profile_queue=None, session_factory=AsyncSessionLocal, enabled: bool = RECOMMENDATION_PREGENERATION,
+                 min_fields: int = RECOMMENDATION_PREGENERATION_MIN_FIELDS, delay: float = RECOMMENDATION_PREGENERATION_DELAY_SECONDS):
+        self.agent = agent
+        self.profile_queue = profile_queue
+        self.session_factory = session_factory
+        self.enabled = enabled
+        self.min_fields = min_fields
+        self.delay = delay
+        self._tasks: dict[str, asyncio.Task] = {}
+        # Conversations whose model call is in flight; their tasks are not cancelled
+        self._generating: set[str] = set()
+
+    def schedule(self, conversation_id: str):
+        if not self.enabled:
+            return
+        previous = self._tasks.get(conversation_id)
+        if previous is not None and conversation_id not in self._generating:
+            # Still waiting out the quiet period: start it over
+            previous.cancel()
+        task = asyncio.create_task(self._run(conversation_id))
+        self._tasks[conversation_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(conversation_id, None) if self._tasks.get(conversation_id) is task else None)
+
+    async def stop(self):
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def _run(self, conversation_id: str):
+        await asyncio.sleep(self.delay)
+        if self.profile_queue is not None:
+            await self.profile_queue.wait_for_conversation(conversation_id)
+        try:
+            async with self.session_factory() as db:
+                row = (await db.execute(select(
+                    DBConversation.user_id, DBConversation.user_profile, DBConversation.recommendations_fingerprint
+                ).where(DBConversation.id == conversation_id))).first()
+                if row is None:
+                    return
+                user_id, user_profile, stored_fingerprint = row
+                hexaco_scores, holland_scores = await load_assessment_scores(db, user_id)
+            if profile_completeness(user_profile) < self.min_fields:
+                return
+            fingerprint = recommendation_fingerprint(user_profile, hexaco_scores, holland_scores)
+            if fingerprint == stored_fingerprint:
+                return
+
+            self._generating.add(conversation_id)
+            try:
+                recommendations = await self.agent.generate_recommendations(user_profile, hexaco_scores, holland_scores, fallback=False)
+            finally:
+                self._generating.discard(conversation_id)
+
+            async with self.session_factory() as db:
+                # Skip if a request stored a snapshot in the meantime
+                result = await db.execute(update(DBConversation).where(
+                    DBConversation.id == conversation_id,
+                    DBConversation.recommendations_fingerprint == stored_fingerprint
+                ).values(
+                    career_recommendations=[rec.model_dump() for rec in recommendations.recommendations],
+                    additional_advice=recommendations.additional_advice,
+                    influence_breakdown=recommendations.influence_breakdown,
+                    recommendations_fingerprint=fingerprint,
+                    recommendations_generated_at=datetime.utcnow(),
+                    # Background work should not move the conversation up the sidebar
+                    updated_at=DBConversation.updated_at
+                ))
+                await db.commit()
+            if result.rowcount:
+                print(f"Pre-generated recommendations for conversation {conversation_id}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Recommendation pre-generation error for conversation {conversation_id}: {e}")
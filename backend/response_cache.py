@@ -0,0 +1,227 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from db import DBStepDetailsCache, DBRoadmap, DBRoadmapCacheEntry
+
+load_dotenv()
+
+STEP_DETAILS_CACHE_SIZE = int(os.getenv("STEP_DETAILS_CACHE_SIZE", "1024"))
+STEP_DETAILS_CACHE_TTL_SECONDS = int(os.getenv("STEP_DETAILS_CACHE_TTL_SECONDS", "3600"))
+# Persistent tier lifetime; 0 keeps entries until they are invalidated
+STEP_DETAILS_DB_TTL_SECONDS = int(os.getenv("STEP_DETAILS_DB_TTL_SECONDS", str(30 * 24 * 3600)))
+
+
+def _normalize(text: str) -> str:
+    return " ".join((text or "").lower().split())
+
+
+def step_details_key(title: str, skills: list[str], overall_goal: str) -> str:
+    """Content hash for a step; case, whitespace and skill order don't matter"""
+    normalized = {
+        "title": _normalize(title),
+        "skills": sorted({_normalize(skill) for skill in skills or [] if _normalize(skill)}),
+        "goal": _normalize(overall_goal),
+    }
+    return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+# Profile fields that change what a roadmap should look like
+ROADMAP_PROFILE_FIELDS = ["education", "education_level", "experience_level", "skills", "interests"]
+
+
+def roadmap_cache_key(career_goal: str, career_start: str, user_profile: dict | None) -> str:
+    """Content hash for a roadmap request: normalized goal, start and relevant profile fields"""
+    fingerprint = {}
+    for field in ROADMAP_PROFILE_FIELDS:
+        value = (user_profile or {}).get(field)
+        if isinstance(value, list):
+            fingerprint[field] = sorted({_normalize(item) for item in value if isinstance(item, str) and _normalize(item)})
+        elif isinstance(value, str) and value:
+            fingerprint[field] = _normalize(value)
+    normalized = {
+        "goal": _normalize(career_goal),
+        "start": _normalize(career_start),
+        "profile": fingerprint,
+    }
+    return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """Small in-memory LRU with a per-entry TTL"""
+
+    def __init__(self, max_size: int, ttl_seconds: int):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, tuple[float, object]] = OrderedDict()
+
+    def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class StepDetailsCache:
+    """Two-tier cache for RoadmapAgent.get_roadmap_step_details responses.
+
+    Lookups hit the in-process LRU first, then the step_details_cache table.
+    Concurrent misses for the same key share a single generation.
+    """
+
+    def __init__(self, max_size: int = STEP_DETAILS_CACHE_SIZE, ttl_seconds: int = STEP_DETAILS_CACHE_TTL_SECONDS, db_ttl_seconds: int = STEP_DETAILS_DB_TTL_SECONDS):
+        self.memory = LRUCache(max_size, ttl_seconds)
+        self.db_ttl_seconds = db_ttl_seconds
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    async def get_or_generate(self, title: str, skills: list[str], overall_goal: str, db: AsyncSession, generate) -> dict:
+        """Return the cached payload for a step, calling `generate()` on a miss.
+
+        `generate` is a coroutine function returning a JSON-serializable dict.
+        """
+        key = step_details_key(title, skills, overall_goal)
+
+        payload = self.memory.get(key)
+        if payload is not None:
+            self.memory_hits += 1
+            return payload
+
+        db_entry = await db.get(DBStepDetailsCache, key)
+        if db_entry is not None and (db_entry.expires_at is None or db_entry.expires_at > datetime.utcnow()):
+            self.db_hits += 1
+            self.memory.set(key, db_entry.payload)
+            return db_entry.payload
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            payload = await generate()
+            await self._store(key, title, overall_goal, payload, db_entry, db)
+            future.set_result(payload)
+            return payload
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody else may be waiting; mark the exception as retrieved
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _store(self, key: str, title: str, overall_goal: str, payload: dict, db_entry: DBStepDetailsCache | None, db: AsyncSession):
+        expires_at = datetime.utcnow() + timedelta(seconds=self.db_ttl_seconds) if self.db_ttl_seconds else None
+        if db_entry is None:
+            db_entry = DBStepDetailsCache(key=key)
+            db.add(db_entry)
+        db_entry.step_title = title
+        db_entry.overall_goal = overall_goal
+        db_entry.payload = payload
+        db_entry.created_at = datetime.utcnow()
+        db_entry.expires_at = expires_at
+        try:
+            await db.commit()
+        except Exception as e:
+            # Another worker stored the same key first; the memory tier still gets it
+            await db.rollback()
+            print(f"Step details cache write skipped: {e}")
+        self.memory.set(key, payload)
+
+    async def invalidate(self, db: AsyncSession, title: str, skills: list[str] | None, overall_goal: str) -> int:
+        """Drop one step. Returns rows removed.
+
+        The memory tier is per worker: other workers keep their copy until
+        it expires (STEP_DETAILS_CACHE_TTL_SECONDS).
+        """
+        key = step_details_key(title, skills or [], overall_goal)
+        self.memory.delete(key)
+        result = await db.execute(delete(DBStepDetailsCache).where(DBStepDetailsCache.key == key))
+        await db.commit()
+        return result.rowcount
+
+    async def clear(self, db: AsyncSession) -> int:
+        """Drop every step (this worker's memory tier only, as with invalidate()). Returns rows removed."""
+        self.memory.clear()
+        result = await db.execute(delete(DBStepDetailsCache))
+        await db.commit()
+        return result.rowcount
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.db_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.db_hits) / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self.memory),
+        }
+
+
+class RoadmapCache:
+    """Reuse a user's earlier roadmap when goal, start and profile fingerprint match"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    async def lookup(self, db: AsyncSession, user_id: str, cache_key: str) -> DBRoadmap | None:
+        db_roadmap = await db.scalar(select(DBRoadmap).join(
+            DBRoadmapCacheEntry, DBRoadmapCacheEntry.roadmap_id == DBRoadmap.id
+        ).where(
+            DBRoadmapCacheEntry.user_id == user_id,
+            DBRoadmapCacheEntry.cache_key == cache_key
+        ).order_by(DBRoadmapCacheEntry.created_at.desc()).limit(1))
+        if db_roadmap is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return db_roadmap
+
+    async def store(self, db: AsyncSession, user_id: str, cache_key: str, db_roadmap: DBRoadmap):
+        """Point the key at a newly saved roadmap (the caller commits)"""
+        await db.execute(delete(DBRoadmapCacheEntry).where(
+            DBRoadmapCacheEntry.user_id == user_id,
+            DBRoadmapCacheEntry.cache_key == cache_key
+        ))
+        db.add(DBRoadmapCacheEntry(
+            id=str(uuid.uuid4()),
+            user_id=user_id,
+            cache_key=cache_key,
+            roadmap_id=db_roadmap.id
+        ))
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
@@ -1,11 +1,15 @@
-from model import Roadmap, RoadmapStep, StepDetails
+from model import Roadmap, RoadmapNode, RoadmapEdge, RoadmapStep, StepDetails
 import json
-from setup import model
+from json_stream import JsonArrayStream
+from llm_client import llm_client
+from prompt_budget import PromptBuilder, compact_profile, ROADMAP_PROMPT_TOKEN_BUDGET
+from telemetry import span, traced
 
 class RoadmapAgent:
     def __init__(self):
-        self.model = model
+        self.llm = llm_client
 
+    @traced
     async def generate_career_roadmap(self, conversation_history: list | None, user_profile: dict | None, goal: str) -> Roadmap:
         """Generate a career roadmap using conversation context and user profile when available.
 
@@ -13,6 +17,42 @@ class RoadmapAgent:
         user_profile: dict extracted from the conversation (may include education, field_of_study, experience_level, skills, interests)
         goal: target career goal string
         """
+        prompt = self._build_roadmap_prompt(conversation_history, user_profile, goal)
+        
+        try:
+            response = await self.llm.generate(prompt)
+            return self._parse_roadmap(response.text)
+        except Exception as e:
+            print(f"❌ Error in generate_career_roadmap: {e}")
+            raise
+
+    @traced
+    async def stream_career_roadmap(self, conversation_history: list | None, user_profile: dict | None, goal: str):
+        """Stream a career roadmap as the model generates it.
+
+        Yields ("node", RoadmapNode) and ("edge", RoadmapEdge) as soon as each one
+        is complete in the streamed JSON, then ("roadmap", Roadmap) built from the
+        full text exactly as generate_career_roadmap would.
+        """
+        prompt = self._build_roadmap_prompt(conversation_history, user_profile, goal)
+        
+        try:
+            parser = JsonArrayStream(["nodes", "edges"])
+            async for chunk in self.llm.stream(prompt):
+                for key, item in parser.feed(chunk):
+                    try:
+                        if key == "nodes":
+                            yield "node", RoadmapNode(**self._process_node(item))
+                        else:
+                            yield "edge", RoadmapEdge(**item)
+                    except Exception as validation_error:
+                        print(f"Skipping invalid streamed roadmap {key[:-1]}: {validation_error}")
+            yield "roadmap", self._parse_roadmap(parser.text)
+        except Exception as e:
+            print(f"❌ Error in stream_career_roadmap: {e}")
+            raise
+
+    def _build_roadmap_prompt(self, conversation_history: list | None, user_profile: dict | None, goal: str) -> str:
         # Derive a sensible 'start' from the user profile if available
         start = ""
         try:
@@ -25,45 +65,21 @@ class RoadmapAgent:
         if not start:
             start = "Current position"  # friendly default
 
-        # Build conversation context string (recent exchanges) for the prompt
-        convo_context = ""
-        try:
-            if conversation_history and isinstance(conversation_history, list):
-                recent = conversation_history[-8:] if len(conversation_history) > 8 else conversation_history
-                parts = []
-                for item in recent:
-                    role = item.get("role", "")
-                    content = ""
-                    if item.get("parts") and isinstance(item.get("parts"), list) and len(item.get("parts")) > 0:
-                        content = item.get("parts")[0]
-                    if role and content:
-                        if role.lower() == "assistant":
-                            parts.append(f"Agent: {content}")
-                        elif role.lower() == "user":
-                            parts.append(f"User: {content}")
-                convo_context = "\n".join(parts)
+        # Compact "field: values" lines instead of indented JSON
+        profile_context = compact_profile(user_profile if isinstance(user_profile, dict) else None) or "{}"
 
-        except Exception:
-            convo_context = ""
-
-        # Include user_profile json for context
-        profile_json = "{}"
-        try:
-            if user_profile and isinstance(user_profile, dict):
-                profile_json = json.dumps(user_profile, indent=2)
-        except Exception:
-            profile_json = "{}"
-
-        prompt = f"""
+        prompt = PromptBuilder("roadmap", ROADMAP_PROMPT_TOKEN_BUDGET)
+        prompt.add(f"""
 You are an expert career roadmap generator creating a CONNECTED flowchart.
 Current position: "{start}"  
 Goal: "{goal}".  
 
-Conversation context (recent exchanges):
-{convo_context}
-
+Conversation context (recent exchanges):""")
+        # Summary of older turns plus as many recent exchanges as the budget allows
+        prompt.add_history(conversation_history, self._render_roadmap_turn, summary_label="Earlier")
+        prompt.add(f"""
 User profile/context:
-{profile_json}
+{profile_context}
 
 Create a step-by-step roadmap with PROPERLY CONNECTED nodes showing the career progression path.
 
@@ -117,39 +133,49 @@ POSITIONING GUIDELINES:
 - Minimum x-spacing: 300px
 - Maximum 3 nodes at same x-coordinate (different y-values)
 
-Focus on creating a VISUALLY CONNECTED roadmap that flows logically from "{start}" to "{goal}" with CLEAR SPACING."""
+Focus on creating a VISUALLY CONNECTED roadmap that flows logically from "{start}" to "{goal}" with CLEAR SPACING.""")
         
-        try:
-            response = await self.model.generate_content_async(prompt)
-            text = response.text.strip()
-            
-            # Remove any markdown formatting
-            text = text.replace("```json", "").replace("```", "").strip()
-            
+        return prompt.build()
+
+    @staticmethod
+    def _render_roadmap_turn(role: str, text: str) -> str | None:
+        if role.lower() == "assistant":
+            return f"Agent: {text}"
+        if role.lower() == "user":
+            return f"User: {text}"
+        return None
+
+    def _parse_roadmap(self, text: str) -> Roadmap:
+        text = text.strip()
+        
+        # Remove any markdown formatting
+        text = text.replace("```json", "").replace("```", "").strip()
+        
+        with span("parse", "roadmap"):
             parsed = json.loads(text)
 
-            if not parsed.get("nodes") or not parsed.get("edges"):
-                raise ValueError("❌ Roadmap missing nodes/edges")
-
-            processed_nodes = []
-            for node in parsed["nodes"]:
-                step_data = RoadmapStep(
-                    id=node["id"],
-                    title=node["data"]["label"],
-                    description=f"Learn {', '.join(node['data'].get('skills', [])) or 'required skills'} with {node['data'].get('experience', 'flexible timeline')}",
-                    duration=node["data"].get("experience", "Flexible"),
-                    skills=node["data"].get("skills", []),
-                    resources=[],
-                    milestones=[],
-                )
-                node["data"]["step"] = step_data.model_dump()
-                processed_nodes.append(node)
+        if not parsed.get("nodes") or not parsed.get("edges"):
+            raise ValueError("❌ Roadmap missing nodes/edges")
 
+        with span("validate", "roadmap"):
+            processed_nodes = [self._process_node(node) for node in parsed["nodes"]]
             return Roadmap(nodes=processed_nodes, edges=parsed["edges"])
-        except Exception as e:
-            print(f"❌ Error in generate_career_roadmap: {e}")
-            raise
 
+    def _process_node(self, node: dict) -> dict:
+        """Attach the RoadmapStep the frontend expects to a raw model node"""
+        step_data = RoadmapStep(
+            id=node["id"],
+            title=node["data"]["label"],
+            description=f"Learn {', '.join(node['data'].get('skills', [])) or 'required skills'} with {node['data'].get('experience', 'flexible timeline')}",
+            duration=node["data"].get("experience", "Flexible"),
+            skills=node["data"].get("skills", []),
+            resources=[],
+            milestones=[],
+        )
+        node["data"]["step"] = step_data.model_dump()
+        return node
+
+    @traced
     async def get_roadmap_step_details(self, step: RoadmapStep, overall_goal: str) -> dict:
         print(f"🔍 Getting detailed information for step: {step.title}")
 
@@ -215,7 +241,7 @@ Please provide a comprehensive response in JSON format with the following struct
 For each skill in the step, provide detailed learning paths, practice projects, and specific resources. Focus on actionable, practical advice that helps someone actually learn and apply these skills. Include real project ideas they can build to practice."""
 
         try:
-            response = await self.model.generate_content_async(prompt)
+            response = await self.llm.generate(prompt)
             cleaned_response = response.text.strip()
 
             # Remove markdown code blocks if present
@@ -224,7 +250,8 @@ For each skill in the step, provide detailed learning paths, practice projects,
             elif cleaned_response.startswith("```"):
                 cleaned_response = cleaned_response.replace("```", "").strip()
 
-            step_details_data = json.loads(cleaned_response)
+            with span("parse", "step_details"):
+                step_details_data = json.loads(cleaned_response)
 
             # Validate the response structure
             if (
@@ -234,7 +261,8 @@ For each skill in the step, provide detailed learning paths, practice projects,
             ):
                 raise ValueError("Invalid step details structure received from API")
 
-            return StepDetails(**step_details_data)
+            with span("validate", "step_details"):
+                return StepDetails(**step_details_data)
         except Exception as e:
             print(f"❌ Error getting step details: {e}")
             raise
\ No newline at end of file
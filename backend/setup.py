@@ -4,7 +4,7 @@ from dotenv import load_dotenv
 
 load_dotenv()
 API_KEY = os.getenv("GOOGLE_API_KEY")
-genai.configure(api_key=API_KEY)
+GEMINI_MODEL_NAME = os.getenv("GEMINI_MODEL_NAME", "gemini-2.5-flash")
 
 generation_config = {
     "temperature": 0.7,
@@ -19,8 +19,12 @@ safety_settings = [
     {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
 ]
 
-model = genai.GenerativeModel(
-    model_name="gemini-2.5-flash",
-    generation_config=generation_config,
-    safety_settings=safety_settings
-)
\ No newline at end of file
+
+def create_gemini_model() -> genai.GenerativeModel:
+    """Gemini model with the app's generation and safety settings (see llm_backends)"""
+    genai.configure(api_key=API_KEY)
+    return genai.GenerativeModel(
+        model_name=GEMINI_MODEL_NAME,
+        generation_config=generation_config,
+        safety_settings=safety_settings
+    )
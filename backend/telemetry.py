@@ -0,0 +1,239 @@
+import functools
+import inspect
+import os
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from dotenv import load_dotenv
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+from sqlalchemy import event
+
+load_dotenv()
+
+# OTLP/HTTP collector to export traces to, e.g. http://localhost:4318 (empty = Prometheus metrics only)
+OTEL_EXPORTER_OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "")
+OTEL_SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "career-advisor-backend")
+# Longest SQL statement attached to a trace span
+TRACE_STATEMENT_MAX_CHARS = 500
+
+# DB queries take well under a millisecond, model calls tens of seconds
+SPAN_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency",
+    ["method", "route", "status"], buckets=SPAN_BUCKETS
+)
+SPAN_DURATION = Histogram(
+    "span_duration_seconds", "Time spent in instrumented operations (db, llm, parse, validate, agent)",
+    ["kind", "name", "route", "operation"], buckets=SPAN_BUCKETS
+)
+LLM_TOKENS = Counter(
+    "llm_tokens_total", "Prompt and response tokens of LLM calls (estimated when the backend reports no usage)",
+    ["direction", "route", "operation"]
+)
+
+# ASGI scope of the request being handled (None in background workers)
+_scope = ContextVar("telemetry_scope", default=None)
+# Agent method being run, set by @traced
+_operation = ContextVar("telemetry_operation", default="none")
+
+tracer = None
+_server_span_kind = None
+
+
+def setup_tracing():
+    """Export spans to OTEL_EXPORTER_OTLP_ENDPOINT if it is set and the SDK is installed"""
+    global tracer, _server_span_kind
+    if not OTEL_EXPORTER_OTLP_ENDPOINT or tracer is not None:
+        return
+    try:
+        from opentelemetry import trace
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    except ImportError:
+        print("OpenTelemetry SDK not installed; trace export disabled")
+        return
+    provider = TracerProvider(resource=Resource.create({"service.name": OTEL_SERVICE_NAME}))
+    # The exporter reads OTEL_EXPORTER_OTLP_ENDPOINT and appends /v1/traces
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    trace.set_tracer_provider(provider)
+    tracer = trace.get_tracer("career-advisor")
+    _server_span_kind = trace.SpanKind.SERVER
+    print(f"Exporting traces to {OTEL_EXPORTER_OTLP_ENDPOINT}")
+
+
+def shutdown_tracing():
+    if tracer is not None:
+        from opentelemetry import trace
+        # Flushes spans still waiting in the batch processor
+        trace.get_tracer_provider().shutdown()
+
+
+def current_route() -> str:
+    """Route template of the current request, e.g. /conversations/{conversation_id}"""
+    scope = _scope.get()
+    if scope is None:
+        return "background"
+    return getattr(scope.get("route"), "path", None) or "unmatched"
+
+
+def current_operation() -> str:
+    return _operation.get()
+
+
+class Span:
+    """Handle yielded by span(); attributes only go to the trace"""
+
+    def __init__(self, otel_span=None):
+        self._otel_span = otel_span
+
+    def set(self, key: str, value):
+        if self._otel_span is not None:
+            self._otel_span.set_attribute(key, value)
+
+
+@contextmanager
+def span(kind: str, name: str, **attributes):
+    """Time a block into span_duration_seconds{kind, name, route, operation},
+    and record it as a trace span when tracing is enabled"""
+    route, operation = current_route(), current_operation()
+    started = time.perf_counter()
+    otel = tracer.start_as_current_span(f"{kind} {name}", attributes={"route": route, "operation": operation, **attributes}) \
+        if tracer is not None else nullcontext()
+    try:
+        with otel as otel_span:
+            yield Span(otel_span)
+    finally:
+        SPAN_DURATION.labels(kind, name, route, operation).observe(time.perf_counter() - started)
+
+
+def traced(fn):
+    """Tag everything an agent method does with its name as the `operation` label.
+
+    Works for coroutines and async generators (streaming methods). A
+    generator's span is recorded when it finishes rather than made current,
+    since the consumer runs in between its yields.
+    """
+    name = fn.__name__
+
+    if inspect.isasyncgenfunction(fn):
+        @functools.wraps(fn)
+        async def generator_wrapper(*args, **kwargs):
+            started, started_ns = time.perf_counter(), time.time_ns()
+            generator = fn(*args, **kwargs)
+            try:
+                while True:
+                    previous = _operation.get()
+                    _operation.set(name)
+                    try:
+                        item = await generator.__anext__()
+                    except StopAsyncIteration:
+                        break
+                    finally:
+                        _operation.set(previous)
+                    yield item
+            finally:
+                token = _operation.set(name)
+                try:
+                    # Runs the method's own cleanup if the consumer stopped early
+                    await generator.aclose()
+                    record_span("agent", name, started, started_ns)
+                finally:
+                    _operation.reset(token)
+        return generator_wrapper
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        token = _operation.set(name)
+        try:
+            with span("agent", name):
+                return await fn(*args, **kwargs)
+        finally:
+            _operation.reset(token)
+    return wrapper
+
+
+def record_span(kind: str, name: str, started: float, started_ns: int, **attributes):
+    """Record a block that has already finished; started is its perf_counter()
+    and started_ns its time_ns() at the start"""
+    route, operation = current_route(), current_operation()
+    SPAN_DURATION.labels(kind, name, route, operation).observe(time.perf_counter() - started)
+    if tracer is not None:
+        tracer.start_span(f"{kind} {name}", start_time=started_ns, attributes={
+            "route": route, "operation": operation, **attributes
+        }).end()
+
+
+def record_llm_tokens(prompt_tokens: int, response_tokens: int, handle: Span | None = None):
+    route, operation = current_route(), current_operation()
+    LLM_TOKENS.labels("prompt", route, operation).inc(prompt_tokens)
+    LLM_TOKENS.labels("response", route, operation).inc(response_tokens)
+    if handle is not None:
+        handle.set("llm.prompt_tokens", prompt_tokens)
+        handle.set("llm.response_tokens", response_tokens)
+
+
+def instrument_engine(engine):
+    """Time every statement on a (sync) engine as a db span named by its SQL verb"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._telemetry_started = time.perf_counter()
+        context._telemetry_started_ns = time.time_ns()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_telemetry_started", None)
+        if started is None:
+            return
+        verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        record_span(
+            "db", verb, started, context._telemetry_started_ns,
+            **{"db.system": conn.dialect.name, "db.statement": statement[:TRACE_STATEMENT_MAX_CHARS]}
+        )
+
+
+class TelemetryMiddleware:
+    """ASGI middleware recording http_request_duration_seconds per route template
+    and the server span every other span of the request is nested under"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        token = _scope.set(scope)
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        otel = tracer.start_as_current_span(f"{scope['method']} {scope['path']}", kind=_server_span_kind) \
+            if tracer is not None else nullcontext()
+        try:
+            with otel as server_span:
+                try:
+                    await self.app(scope, receive, send_with_status)
+                finally:
+                    if server_span is not None:
+                        # Routing has run by now, so the span can be named after the template
+                        server_span.update_name(f"{scope['method']} {current_route()}")
+                        server_span.set_attribute("http.route", current_route())
+                        server_span.set_attribute("http.response.status_code", status["code"])
+        finally:
+            REQUEST_DURATION.labels(scope["method"], current_route(), str(status["code"])).observe(time.perf_counter() - started)
+            _scope.reset(token)
+
+
+def metrics_response() -> tuple[bytes, str]:
+    """(body, content type) for GET /metrics"""
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+setup_tracing()
@@ -0,0 +1,85 @@
+import asyncio
+import os
+import tempfile
+
+# Modules read their settings at import time, so set them before anything imports db or llm_client
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='career_tests_'), 'import.sqlite')}"
+os.environ["LLM_BACKEND"] = "fake"
+os.environ["LLM_RECORD_PATH"] = ""
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """Session factory for a fresh SQLite database with every table created"""
+    from db import Base
+
+    # NullPool: each test's asyncio.run() gets its own connections
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.sqlite'}", poolclass=NullPool)
+
+    async def create_tables():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    asyncio.run(create_tables())
+    return async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+
+@pytest.fixture
+def conversation_id(session_factory):
+    """Id of a conversation (with its user) in the session_factory database"""
+    from db import DBConversation, DBUser
+
+    async def create():
+        async with session_factory() as db:
+            db.add(DBUser(id="user-1", username="test", email="user-1@example.com", hashed_password="x"))
+            db.add(DBConversation(id="conversation-1", user_id="user-1", title="Test", user_profile={}))
+            await db.commit()
+
+    asyncio.run(create())
+    return "conversation-1"
+
+
+@pytest.fixture
+def migrate(tmp_path, monkeypatch):
+    """migrate(revision) runs the Alembic migrations up to revision on a fresh
+    SQLite database and returns its (sync) engine"""
+    import db
+    from alembic import command
+    from alembic.config import Config
+    from sqlalchemy import create_engine
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrated.sqlite'}")
+    # migrations/env.py connects through db.engine
+    monkeypatch.setattr(db, "engine", engine)
+    config = Config(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini"))
+    config.attributes["configure_logging"] = False
+
+    def upgrade(revision: str = "head"):
+        command.upgrade(config, revision)
+        return engine
+
+    yield upgrade
+    engine.dispose()
+
+
+@pytest.fixture
+def api(session_factory):
+    """TestClient for the app with get_db bound to the session_factory database
+    (startup hooks and background workers are not run)"""
+    from fastapi.testclient import TestClient
+    from db import get_db
+    from main import app
+
+    async def override_get_db():
+        async with session_factory() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield TestClient(app)
+    app.dependency_overrides.clear()
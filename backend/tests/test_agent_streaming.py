@@ -0,0 +1,38 @@
+import asyncio
+import agent as agent_module
+from agent import DynamicCareerGuidanceAgent
+
+
+def collect(generator) -> list:
+    async def run():
+        return [event async for event in generator]
+    return asyncio.run(run())
+
+
+def stream_of(*chunks, error: Exception | None = None):
+    async def stream(prompt, generation_config=None):
+        for chunk in chunks:
+            yield chunk
+        if error is not None:
+            raise error
+    return stream
+
+
+def test_failure_after_tokens_resets_before_the_fallback(monkeypatch):
+    monkeypatch.setattr(agent_module.llm_client, "stream", stream_of("What do you ", error=TimeoutError("stream dropped")))
+    events = collect(DynamicCareerGuidanceAgent().stream_question([]))
+    assert [event for event, _ in events] == ["token", "reset", "question"]
+    assert events[-1][1]
+
+
+def test_failure_before_any_token_sends_only_the_fallback(monkeypatch):
+    monkeypatch.setattr(agent_module.llm_client, "stream", stream_of(error=TimeoutError("no connection")))
+    events = collect(DynamicCareerGuidanceAgent().stream_question([]))
+    assert [event for event, _ in events] == ["question"]
+
+
+def test_successful_stream_ends_with_the_cleaned_question(monkeypatch):
+    monkeypatch.setattr(agent_module.llm_client, "stream", stream_of('"What do you ', 'enjoy most?"'))
+    events = collect(DynamicCareerGuidanceAgent().stream_question([]))
+    assert events[-1] == ("question", "What do you enjoy most?")
+    assert "reset" not in [event for event, _ in events]
@@ -0,0 +1,51 @@
+import asyncio
+from datetime import datetime, timedelta
+import main
+from db import DBConversation, DBUser
+
+
+def create_conversations(session_factory):
+    """user-1 gets 7 conversations, several sharing an updated_at; user-2 gets one"""
+    base = datetime(2026, 1, 1)
+    # (id, minutes after base); c2-c5 are tied
+    rows = [("c1", 0), ("c2", 5), ("c3", 5), ("c4", 5), ("c5", 5), ("c6", 9), ("c7", 9)]
+
+    async def create():
+        async with session_factory() as db:
+            for user_id in ["user-1", "user-2"]:
+                db.add(DBUser(id=user_id, username=user_id, email=f"{user_id}@example.com", hashed_password="x"))
+            for conversation_id, minutes in rows:
+                updated_at = base + timedelta(minutes=minutes)
+                db.add(DBConversation(id=conversation_id, user_id="user-1", title=conversation_id,
+                                      created_at=updated_at, updated_at=updated_at))
+            db.add(DBConversation(id="other", user_id="user-2", title="other", created_at=base, updated_at=base))
+            await db.commit()
+
+    asyncio.run(create())
+
+
+def auth(email: str) -> dict:
+    return {"Authorization": f"Bearer {main.career_router.create_access_token({'sub': email})}"}
+
+
+def test_cursor_pages_cover_tied_conversations_once_in_order(api, session_factory):
+    create_conversations(session_factory)
+    headers = auth("user-1@example.com")
+    ids, cursor = [], None
+    # Bounded, so a cursor that stops advancing fails instead of hanging
+    for _ in range(10):
+        params = {"limit": 2} if cursor is None else {"limit": 2, "cursor": cursor}
+        response = api.get("/conversations", params=params, headers=headers)
+        assert response.status_code == 200
+        ids += [conversation["id"] for conversation in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert ids == ["c7", "c6", "c5", "c4", "c3", "c2", "c1"]
+
+
+def test_invalid_cursor_is_a_bad_request(api, session_factory):
+    create_conversations(session_factory)
+    response = api.get("/conversations", params={"cursor": "not-a-cursor"}, headers=auth("user-1@example.com"))
+    assert response.status_code == 400
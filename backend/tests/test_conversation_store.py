@@ -0,0 +1,50 @@
+import asyncio
+from sqlalchemy import select
+from db import DBConversation, DBConversationMessage
+from conversation_store import ConversationLog, backfill_conversation
+
+
+async def seqs(session_factory, conversation_id):
+    async with session_factory() as db:
+        return list(await db.execute(select(DBConversationMessage.seq, DBConversationMessage.content).where(
+            DBConversationMessage.conversation_id == conversation_id
+        ).order_by(DBConversationMessage.seq)))
+
+
+def test_overlapping_turns_get_distinct_seqs(session_factory, conversation_id):
+    async def scenario():
+        async with session_factory() as first, session_factory() as second:
+            first_log, second_log = ConversationLog(first, conversation_id), ConversationLog(second, conversation_id)
+            # Both turns read the conversation before either has written anything
+            assert await first_log.is_empty() and await second_log.is_empty()
+            await first_log.append("user", "first answer")
+            await second_log.append("user", "second answer")
+            await first_log.append("assistant", "first question")
+            await second_log.append("assistant", "second question")
+
+            await first_log.save()
+            await first.commit()
+            await second_log.save()
+            await second.commit()
+
+        assert await seqs(session_factory, conversation_id) == [
+            (0, "first answer"), (1, "first question"), (2, "second answer"), (3, "second question")
+        ]
+
+    asyncio.run(scenario())
+
+
+def test_backfilled_history_continues_the_counter(session_factory, conversation_id):
+    async def scenario():
+        async with session_factory() as db:
+            db_conversation = await db.get(DBConversation, conversation_id)
+            db_conversation.conversation_history = [{"role": "assistant", "parts": ["question"]}, {"role": "user", "parts": ["answer"]}]
+            assert await backfill_conversation(db, db_conversation)
+            log = ConversationLog(db, conversation_id)
+            await log.append("assistant", "next question")
+            await log.save()
+            await db.commit()
+
+        assert await seqs(session_factory, conversation_id) == [(0, "question"), (1, "answer"), (2, "next question")]
+
+    asyncio.run(scenario())
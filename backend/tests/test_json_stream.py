@@ -0,0 +1,50 @@
+import json
+from json_stream import JsonArrayStream
+
+DOCUMENT = {
+    "recommendations": [
+        {"career_name": "Data Scientist", "fit_explanation": 'Likes "data" and {braces} [brackets]', "required_skills_education": "Python\\\\SQL", "potential_growth": "High"},
+        {"career_name": "Robotics Engineer", "fit_explanation": "Builds robots", "required_skills_education": "Mechatronics", "potential_growth": "High"},
+    ],
+    "additional_advice": "Keep learning",
+}
+
+
+def feed_in_chunks(parser: JsonArrayStream, text: str, size: int) -> list:
+    items = []
+    for start in range(0, len(text), size):
+        items.extend(parser.feed(text[start:start + size]))
+    return items
+
+
+def test_items_split_across_chunks():
+    text = "```json\n" + json.dumps(DOCUMENT) + "\n```"
+    for size in (1, 3, 7, 64):
+        items = feed_in_chunks(JsonArrayStream(["recommendations"]), text, size)
+        assert items == [("recommendations", item) for item in DOCUMENT["recommendations"]]
+
+
+def test_quotes_braces_and_brackets_inside_strings():
+    item = {"title": 'a "quoted" } ] word', "note": "back\\\\slash \\\" and { [", "nested": {"k": ["v"]}}
+    parser = JsonArrayStream(["nodes"])
+    assert parser.feed(json.dumps({"nodes": [item], "edges": []})) == [("nodes", item)]
+
+
+def test_items_arrive_as_soon_as_they_close():
+    parser = JsonArrayStream(["nodes", "edges"])
+    assert parser.feed('{"nodes": [{"id": "1"}, {"id"') == [("nodes", {"id": "1"})]
+    assert parser.feed(': "2"}], "edges": [{"source": "1", "target": "2"}]}') == [
+        ("nodes", {"id": "2"}), ("edges", {"source": "1", "target": "2"})
+    ]
+
+
+def test_truncated_final_item_is_not_emitted():
+    parser = JsonArrayStream(["recommendations"])
+    items = parser.feed('{"recommendations": [{"career_name": "A"}, {"career_name": "B", "fit_explanation": "unfinished')
+    assert items == [("recommendations", {"career_name": "A"})]
+    assert parser.feed("") == []
+
+
+def test_arrays_under_other_keys_are_ignored():
+    parser = JsonArrayStream(["recommendations"])
+    assert parser.feed('{"other": [{"a": 1}], "recommendations": [{"b": 2}]}') == [("recommendations", {"b": 2})]
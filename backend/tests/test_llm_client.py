@@ -0,0 +1,247 @@
+import asyncio
+import pytest
+import llm_client
+from google.api_core.exceptions import InvalidArgument, ServiceUnavailable
+from llm_client import CircuitOpenError, LLMClient, TokenBucket
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class ScriptedModel:
+    """Stands in for genai.GenerativeModel; each call takes the next (latency, error) step"""
+
+    def __init__(self, *steps):
+        self.steps = list(steps)
+        self.calls = 0
+
+    async def generate_content_async(self, prompt, generation_config=None, stream=False):
+        latency, error = self.steps[min(self.calls, len(self.steps) - 1)]
+        self.calls += 1
+        await asyncio.sleep(latency)
+        if error is not None:
+            raise error
+        if stream:
+            return self._chunks(f"ok{self.calls}")
+        return FakeResponse(f"ok{self.calls}")
+
+    async def _chunks(self, text: str):
+        for char in text:
+            yield FakeResponse(char)
+
+
+OK = (0, None)
+FAIL = (0, ServiceUnavailable("down"))
+
+
+def client_for(model, **kwargs) -> LLMClient:
+    kwargs.setdefault("max_retries", 0)
+    kwargs.setdefault("failure_threshold", 2)
+    kwargs.setdefault("reset_seconds", 0.05)
+    return LLMClient(model=model, timeout=1, **kwargs)
+
+
+async def open_circuit(client: LLMClient):
+    for _ in range(client.breaker.threshold):
+        with pytest.raises(ServiceUnavailable):
+            await client.generate("prompt")
+    assert client.breaker.state == "open"
+
+
+def test_token_bucket_allows_a_burst_then_the_sustained_rate():
+    async def scenario():
+        bucket = TokenBucket(rate=20, capacity=3)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        for _ in range(3):
+            await bucket.acquire()
+        burst = loop.time() - started
+        for _ in range(2):
+            await bucket.acquire()
+        return burst, loop.time() - started
+
+    burst, total = asyncio.run(scenario())
+    assert burst < 0.02
+    # Two more tokens at 20/s take about 0.1s
+    assert 0.08 <= total < 0.5
+
+
+def test_retryable_errors_are_retried_and_others_are_not():
+    async def scenario():
+        flaky = ScriptedModel(FAIL, FAIL, OK)
+        client = client_for(flaky, max_retries=2, failure_threshold=10)
+        response = await client.generate("prompt")
+
+        invalid = ScriptedModel((0, InvalidArgument("bad prompt")))
+        strict = client_for(invalid, max_retries=2)
+        with pytest.raises(InvalidArgument):
+            await strict.generate("prompt")
+        return response.text, client.retries, invalid.calls
+
+    text, retries, invalid_calls = asyncio.run(scenario())
+    assert text == "ok3"
+    assert retries == 2
+    assert invalid_calls == 1
+
+
+def test_open_circuit_rejects_without_calling_the_model():
+    async def scenario():
+        model = ScriptedModel(FAIL)
+        client = client_for(model, reset_seconds=10)
+        await open_circuit(client)
+        with pytest.raises(CircuitOpenError):
+            await client.generate("prompt")
+        return model.calls
+
+    assert asyncio.run(scenario()) == 2
+
+
+def test_half_open_trial_success_closes_the_circuit():
+    async def scenario():
+        model = ScriptedModel(FAIL, FAIL, (0.05, None), OK)
+        client = client_for(model)
+        await open_circuit(client)
+        await asyncio.sleep(client.breaker.reset_seconds)
+        trial = asyncio.create_task(client.generate("prompt"))
+        await asyncio.sleep(0.01)
+        states = [client.breaker.state]
+        # Only the trial call goes out while half-open
+        with pytest.raises(CircuitOpenError):
+            await client.generate("prompt")
+        await trial
+        states.append(client.breaker.state)
+        await client.generate("prompt")
+        return states, client.breaker.failures
+
+    states, failures = asyncio.run(scenario())
+    assert states == ["half_open", "closed"]
+    assert failures == 0
+
+
+def test_half_open_trial_failure_reopens_the_circuit():
+    async def scenario():
+        model = ScriptedModel(FAIL)
+        client = client_for(model, failure_threshold=3)
+        await open_circuit(client)
+        await asyncio.sleep(client.breaker.reset_seconds)
+        # One failure is enough while half-open
+        with pytest.raises(ServiceUnavailable):
+            await client.generate("prompt")
+        state = client.breaker.state
+        with pytest.raises(CircuitOpenError):
+            await client.generate("prompt")
+        return state, client.breaker.opened, model.calls
+
+    assert asyncio.run(scenario()) == ("open", 2, 4)
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_cancelled_trial_does_not_leave_the_circuit_stuck(streaming):
+    async def call(client):
+        if streaming:
+            return "".join([chunk async for chunk in client.stream("prompt")])
+        return (await client.generate("prompt")).text
+
+    async def scenario():
+        model = ScriptedModel(FAIL, FAIL, OK)
+        # One token per minute: the trial call waits in the rate limiter
+        client = client_for(model, rate_per_minute=1, burst=2)
+        await open_circuit(client)
+        await asyncio.sleep(client.breaker.reset_seconds)
+        trial = asyncio.create_task(call(client))
+        await asyncio.sleep(0.01)
+        assert client.breaker.state == "half_open"
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+        client.rate_limiter.rate = 0
+        return await call(client), client.breaker.state
+
+    text, state = asyncio.run(scenario())
+    assert text == "ok3"
+    assert state == "closed"
+
+
+def test_client_errors_do_not_open_the_circuit():
+    async def scenario():
+        model = ScriptedModel((0, InvalidArgument("prompt too long")), (0, InvalidArgument("prompt too long")),
+                              (0, InvalidArgument("prompt too long")), OK)
+        client = client_for(model)
+        for _ in range(3):
+            with pytest.raises(InvalidArgument):
+                await client.generate("prompt")
+        state, failures = client.breaker.state, client.breaker.failures
+        return state, failures, (await client.generate("prompt")).text
+
+    assert asyncio.run(scenario()) == ("closed", 0, "ok4")
+
+
+def test_client_error_on_a_half_open_trial_lets_the_next_call_try():
+    async def scenario():
+        model = ScriptedModel(FAIL, FAIL, (0, InvalidArgument("bad prompt")), OK)
+        client = client_for(model)
+        await open_circuit(client)
+        await asyncio.sleep(client.breaker.reset_seconds)
+        with pytest.raises(InvalidArgument):
+            await client.generate("prompt")
+        return (await client.generate("prompt")).text, client.breaker.state
+
+    assert asyncio.run(scenario()) == ("ok4", "closed")
+
+
+def test_stream_backoff_does_not_hold_a_concurrency_slot(monkeypatch):
+    monkeypatch.setattr(llm_client, "LLM_RETRY_BASE_SECONDS", 0.2)
+    monkeypatch.setattr(llm_client.random, "uniform", lambda low, high: high)
+
+    async def scenario():
+        model = ScriptedModel(FAIL, OK, OK)
+        client = client_for(model, max_concurrency=1, max_retries=1, failure_threshold=10)
+        stream = asyncio.create_task(_collect(client.stream("prompt")))
+        await asyncio.sleep(0.05)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        # The stream is backing off for 0.4s after its 503
+        text = (await client.generate("prompt")).text
+        elapsed = loop.time() - started
+        return text, elapsed, await stream, client.status()["in_flight"]
+
+    text, elapsed, streamed, in_flight = asyncio.run(scenario())
+    assert text == "ok2"
+    assert elapsed < 0.2
+    assert streamed == "ok3"
+    assert in_flight == 0
+
+
+async def _collect(chunks) -> str:
+    return "".join([chunk async for chunk in chunks])
+
+
+def test_hedge_returns_the_faster_call():
+    async def scenario():
+        model = ScriptedModel((1, None), (0.01, None))
+        client = client_for(model, hedge_after=0.05)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        response = await client.generate("prompt")
+        return response.text, loop.time() - started, client.hedges, client.breaker.state
+
+    text, elapsed, hedges, state = asyncio.run(scenario())
+    assert text == "ok2"
+    assert elapsed < 0.5
+    assert hedges == 1
+    # The cancelled slow call is not counted as a failure
+    assert state == "closed"
+
+
+def test_stream_yields_chunks_and_closing_early_is_not_a_failure():
+    async def scenario():
+        client = client_for(ScriptedModel(OK))
+        text = "".join([chunk async for chunk in client.stream("prompt")])
+        stream = client.stream("prompt")
+        await stream.__anext__()
+        await stream.aclose()
+        return text, client.breaker.failures, client.status()["in_flight"]
+
+    assert asyncio.run(scenario()) == ("ok1", 0, 0)
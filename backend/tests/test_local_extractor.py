@@ -0,0 +1,74 @@
+import pytest
+from local_extractor import local_extractor
+
+
+def education(answer: str, best_effort: bool = False):
+    profile = local_extractor.extract("What are you studying?", answer, best_effort=best_effort)
+    return profile and profile["education"]
+
+
+@pytest.mark.parametrize("answer", ["I want to be a doctor", "I love to be outdoors", "I want to master the guitar", "ms excel"])
+def test_plain_words_are_not_degrees(answer):
+    assert education(answer, best_effort=True) == ""
+
+
+def test_be_alone_is_not_a_bachelors_degree():
+    assert education("be") in (None, "")
+
+
+@pytest.mark.parametrize("answer, expected", [
+    ("I am in 2nd grade", "2nd grade"),
+    ("1st grade", "1st grade"),
+    ("3rd standard", "3rd grade"),
+    ("12th grade", "12th grade"),
+    ("grade 12", "12th grade"),
+    ("class 2", "2nd grade"),
+    ("class 11", "11th grade"),
+])
+def test_grade_keeps_or_adds_the_right_ordinal(answer, expected):
+    assert education(answer) == expected
+
+
+@pytest.mark.parametrize("answer, expected", [
+    ("doing my bachelors", "Bachelor's degree"),
+    ("B.A. in history", "Bachelor's degree"),
+    ("final year of B.E.", "Bachelor's degree"),
+    ("btech", "Bachelor's degree"),
+    ("pursuing M.S.", "Master's degree"),
+    ("master's degree", "Master's degree"),
+    ("phd", "PhD"),
+])
+def test_degrees(answer, expected):
+    assert education(answer) == expected
+
+
+def test_negated_terms_go_to_dislikes():
+    profile = local_extractor.extract("What do you enjoy?", "I like music but I hate sales")
+    assert profile["interests"] == ["music"]
+    assert profile["dislikes"] == ["sales"]
+
+
+def test_long_or_unclear_answers_go_to_the_model():
+    assert local_extractor.extract("Tell me about yourself", "My uncle runs a bakery and I help him on weekends") is None
+
+
+@pytest.mark.parametrize("answer, expected", [
+    ("3 years of work experience", "3 years"),
+    ("I'm a fresher", "Entry level"),
+    ("an internship", "Internship"),
+])
+def test_experience(answer, expected):
+    profile = local_extractor.extract("How much experience do you have?", answer)
+    assert profile["experience_level"] == expected
+
+
+def test_skill_questions_route_interest_terms_to_skills():
+    profile = local_extractor.extract("What are you good at?", "music and python")
+    assert sorted(profile["skills"]) == ["music", "python"]
+    assert profile["interests"] == []
+
+
+def test_best_effort_extracts_from_answers_the_rules_do_not_cover():
+    answer = "My uncle runs a bakery and I help him with marketing on weekends"
+    assert local_extractor.extract("Tell me about yourself", answer) is None
+    assert local_extractor.extract("Tell me about yourself", answer, best_effort=True)["skills"] == ["marketing"]
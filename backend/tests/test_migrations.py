@@ -0,0 +1,23 @@
+from sqlalchemy import text
+
+
+def test_score_deduplication_keeps_the_latest_row(migrate):
+    engine = migrate("0001")
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO users (id, username, email, hashed_password) VALUES ('u', 'u', 'u@example.com', 'x')"))
+        # UUID order is unrelated to write order: the oldest row has the smallest id
+        for row_id, realistic in [("a-oldest", 1.0), ("c-middle", 2.0), ("b-latest", 3.0)]:
+            connection.execute(text("INSERT INTO holland_scores (id, user_id, realistic) VALUES (:id, 'u', :realistic)"), {"id": row_id, "realistic": realistic})
+
+    migrate("0002")
+    with engine.connect() as connection:
+        rows = connection.execute(text("SELECT id, realistic FROM holland_scores")).all()
+    assert rows == [("b-latest", 3.0)]
+
+
+def test_migrations_reach_head(migrate):
+    engine = migrate()
+    with engine.connect() as connection:
+        indexes = {row[0] for row in connection.execute(text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'conversations'"))}
+    assert "ix_conversations_user_id_updated_at_id" in indexes
+    assert "ix_conversations_user_id_updated_at" not in indexes
@@ -0,0 +1,71 @@
+import pytest
+from profile_merge import PROFILE_FIELD_CAPS, canonical_profile, empty_profile, merge_profile, normalize_value
+
+
+@pytest.mark.parametrize("a, b", [
+    ("Coding in Python", "python coding"),
+    ("Video Games", "video game"),
+    ("the Arts", "art"),
+    ("Helping people", "help people"),
+])
+def test_equivalent_values_normalize_alike(a, b):
+    assert normalize_value(a) == normalize_value(b)
+
+
+@pytest.mark.parametrize("a, b", [("C++", "C#"), ("design", "graphic design"), ("math", "music")])
+def test_different_values_stay_apart(a, b):
+    assert normalize_value(a) != normalize_value(b)
+
+
+def test_merge_dedupes_and_keeps_the_first_spelling():
+    profile, mentions = empty_profile(), {}
+    assert merge_profile(profile, {"interests": ["Video Games", "music"]}, mentions)
+    assert merge_profile(profile, {"interests": ["video game"]}, mentions)
+    assert profile["interests"] == ["Video Games", "music"]
+    assert mentions["interests"] == {normalize_value("video games"): 2, "music": 1}
+
+
+def test_merge_orders_by_mentions_with_ties_in_arrival_order():
+    profile, mentions = empty_profile(), {}
+    merge_profile(profile, {"skills": ["writing", "sql", "excel"]}, mentions)
+    merge_profile(profile, {"skills": ["Excel"]}, mentions)
+    assert profile["skills"] == ["excel", "writing", "sql"]
+
+
+def test_a_value_repeated_in_one_extraction_is_one_mention():
+    profile, mentions = empty_profile(), {}
+    merge_profile(profile, {"values": ["freedom", "Freedom", "honesty"]}, mentions)
+    assert mentions["values"] == {"freedom": 1, "honesty": 1}
+
+
+def test_lists_are_capped_and_a_dropped_value_can_climb_back():
+    cap = PROFILE_FIELD_CAPS["personality_traits"]
+    traits = [f"trait{i}" for i in range(cap + 1)]
+    profile, mentions = empty_profile(), {}
+    merge_profile(profile, {"personality_traits": traits}, mentions)
+    assert profile["personality_traits"] == traits[:cap]
+
+    merge_profile(profile, {"personality_traits": [traits[-1]]}, mentions)
+    assert profile["personality_traits"][0] == traits[-1]
+    assert len(profile["personality_traits"]) == cap
+
+
+def test_scalars_take_the_latest_non_empty_value():
+    profile = empty_profile()
+    merge_profile(profile, {"education": "High school"})
+    assert not merge_profile(profile, {"education": "", "unknown": ["x"]})
+    merge_profile(profile, {"education": "  College  "})
+    assert profile["education"] == "College"
+    assert "unknown" not in profile
+
+
+def test_canonical_profile_collapses_duplicates_and_old_field_names():
+    profile, mentions = canonical_profile({
+        "interests": ["music", "Music", "art", "arts"],
+        "education_level": "College",
+        "legacy": "dropped"
+    })
+    assert profile["interests"] == ["music", "art"]
+    assert profile["education"] == "College"
+    assert "legacy" not in profile
+    assert mentions["interests"] == {"music": 2, "art": 2}
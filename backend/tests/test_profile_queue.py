@@ -0,0 +1,87 @@
+import asyncio
+from db import DBConversation, DBProfileExtractionJob
+from profile_queue import ProfileExtractionQueue
+
+
+class FlakyAgent:
+    """extract_profile_info that fails the first `failures` calls"""
+
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.calls = []
+
+    async def extract_profile_info(self, question, answer, fallback=True):
+        self.calls.append(fallback)
+        if len(self.calls) <= self.failures:
+            raise TimeoutError("model timed out")
+        return {"interests": ["robotics"], "skills": [], "personality_traits": [], "values": [], "education": "", "experience_level": "", "dislikes": []}
+
+
+async def add_job(session_factory, conversation_id, answer="I like robotics and I build small robots at home") -> str:
+    queue = ProfileExtractionQueue(None, session_factory)
+    async with session_factory() as db:
+        job = queue.enqueue(db, conversation_id, "What do you enjoy?", answer)
+        await db.commit()
+    return job.id
+
+
+async def load(session_factory, job_id, conversation_id):
+    async with session_factory() as db:
+        return await db.get(DBProfileExtractionJob, job_id), await db.get(DBConversation, conversation_id)
+
+
+def test_model_errors_are_retried_then_merged(session_factory, conversation_id):
+    async def scenario():
+        agent = FlakyAgent(failures=1)
+        queue = ProfileExtractionQueue(agent, session_factory, max_attempts=3)
+        job_id = await add_job(session_factory, conversation_id)
+
+        assert await queue._process(job_id) == 1
+        job, _ = await load(session_factory, job_id, conversation_id)
+        assert (job.status, job.attempts, job.error) == ("pending", 1, "model timed out")
+
+        assert await queue._process(job_id) == 0
+        job, conversation = await load(session_factory, job_id, conversation_id)
+        assert (job.status, job.attempts) == ("done", 2)
+        assert conversation.user_profile["interests"] == ["robotics"]
+        # The queue always asks for errors rather than a silent fallback
+        assert agent.calls == [False, False]
+
+    asyncio.run(scenario())
+
+
+def test_job_fails_after_max_attempts_and_keeps_local_result(session_factory, conversation_id):
+    async def scenario():
+        queue = ProfileExtractionQueue(FlakyAgent(failures=10), session_factory, max_attempts=2)
+        job_id = await add_job(session_factory, conversation_id, answer="I love music")
+
+        assert await queue._process(job_id) == 1
+        assert await queue._process(job_id) == 0
+        job, conversation = await load(session_factory, job_id, conversation_id)
+        assert (job.status, job.attempts) == ("failed", 2)
+        assert conversation.user_profile["interests"] == ["music"]
+
+    asyncio.run(scenario())
+
+
+def test_unclaimed_run_does_not_settle_another_workers_job(session_factory, conversation_id):
+    async def scenario():
+        queue = ProfileExtractionQueue(FlakyAgent(failures=0), session_factory)
+        job_id = await add_job(session_factory, conversation_id)
+        future = asyncio.get_running_loop().create_future()
+        queue._inflight[conversation_id] = {job_id: future}
+        async with session_factory() as db:
+            # Another worker has claimed the job and is still extracting
+            (await db.get(DBProfileExtractionJob, job_id)).status = "running"
+            await db.commit()
+
+        await queue._run(job_id, conversation_id)
+        assert not future.done()
+
+        async with session_factory() as db:
+            (await db.get(DBProfileExtractionJob, job_id)).status = "pending"
+            await db.commit()
+        await queue._run(job_id, conversation_id)
+        assert future.done()
+
+    asyncio.run(scenario())
@@ -0,0 +1,14 @@
+from check_query_plans import check_plans, plan_problems
+
+
+def test_hot_queries_use_indexes(migrate):
+    with migrate().connect() as connection:
+        problems = {name: found for name, (plan, found) in check_plans(connection).items() if found}
+    assert problems == {}
+
+
+def test_sorts_and_scans_are_reported():
+    assert plan_problems(["SCAN conversations"]) == ["SCAN conversations"]
+    assert plan_problems(["SEARCH conversations USING INDEX ix (user_id=?)", "USE TEMP B-TREE FOR RIGHT PART OF ORDER BY"]) == ["USE TEMP B-TREE FOR RIGHT PART OF ORDER BY"]
+    assert plan_problems(["Limit  (cost=0.15..8.17 rows=1 width=32)", "  ->  Sort  (cost=8.16..8.17 rows=1 width=32)"]) == ["Sort  (cost=8.16..8.17 rows=1 width=32)"]
+    assert plan_problems(["Index Scan Backward using ix on conversations"]) == []
@@ -0,0 +1,108 @@
+import asyncio
+from datetime import datetime, timedelta
+from db import DBRecommendationJob, DBRecommendationJobItem
+from model import CareerRecommendationsResponse
+import recommendation_jobs
+from recommendation_jobs import RecommendationJobRunner
+
+PROFILE = {"interests": ["robotics"]}
+
+
+class ScriptedAgent:
+    """Fails the first `failures[label]` calls for an item's label"""
+
+    def __init__(self, failures: dict | None = None):
+        self.failures = dict(failures or {})
+        self.calls = []
+
+    async def generate_recommendations(self, user_profile, hexaco_scores, holland_scores, fallback=True):
+        label = user_profile["label"]
+        self.calls.append(label)
+        if self.failures.get(label):
+            self.failures[label] -= 1
+            raise RuntimeError("model error")
+        return CareerRecommendationsResponse(recommendations=[], additional_advice=label, influence_breakdown={})
+
+
+async def add_job(session_factory, runner, labels) -> str:
+    items = [{"label": label, "inputs": {"user_profile": dict(PROFILE, label=label)}} for label in labels]
+    async with session_factory() as db:
+        job = runner.enqueue(db, "user-1", "csv", items)
+        await db.commit()
+    return job.id
+
+
+async def item_statuses(session_factory, job_id) -> dict:
+    async with session_factory() as db:
+        rows = await db.execute(
+            DBRecommendationJobItem.__table__.select().where(DBRecommendationJobItem.job_id == job_id)
+        )
+        return {row.label: row.status for row in rows}
+
+
+async def job_status(session_factory, job_id) -> str:
+    async with session_factory() as db:
+        return (await db.get(DBRecommendationJob, job_id)).status
+
+
+def test_claim_reclaims_expired_leases_only(session_factory, conversation_id):
+    async def scenario():
+        runner = RecommendationJobRunner(ScriptedAgent(), session_factory=session_factory)
+        job_id = await add_job(session_factory, runner, ["expired", "leased"])
+        async with session_factory() as db:
+            for item in (await db.execute(DBRecommendationJobItem.__table__.select())).all():
+                age = timedelta(seconds=recommendation_jobs.RECOMMENDATION_JOB_LEASE_SECONDS + 1 if item.label == "expired" else 1)
+                await db.execute(DBRecommendationJobItem.__table__.update().where(DBRecommendationJobItem.id == item.id).values(
+                    status="running", updated_at=datetime.utcnow() - age
+                ))
+            await db.commit()
+
+        claimed = await runner._claim_batch(job_id)
+        assert [item.inputs["user_profile"]["label"] for item in claimed] == ["expired"]
+        assert await runner._claim_batch(job_id) == []
+
+    asyncio.run(scenario())
+
+
+def test_failed_run_releases_its_batch_and_resumes(session_factory, conversation_id, monkeypatch):
+    monkeypatch.setattr(recommendation_jobs, "RECOMMENDATION_JOB_RESUME_SECONDS", 0.01)
+
+    async def scenario():
+        runner = RecommendationJobRunner(ScriptedAgent(), session_factory=session_factory)
+        runner._started = True
+        job_id = await add_job(session_factory, runner, ["a", "b"])
+        save_batch = runner._save_batch
+
+        async def failing_save_batch(*args):
+            runner._save_batch = save_batch
+            raise RuntimeError("database went away")
+
+        runner._save_batch = failing_save_batch
+        await runner._run_job(job_id)
+        assert await item_statuses(session_factory, job_id) == {"a": "pending", "b": "pending"}
+
+        # Resubmitted after RECOMMENDATION_JOB_RESUME_SECONDS
+        await asyncio.sleep(0.05)
+        await asyncio.gather(*runner._tasks.values())
+        assert await item_statuses(session_factory, job_id) == {"a": "done", "b": "done"}
+        assert await job_status(session_factory, job_id) == "done"
+
+    asyncio.run(scenario())
+
+
+def test_backoff_does_not_hold_a_concurrency_slot(session_factory, conversation_id, monkeypatch):
+    sleep = asyncio.sleep
+    # Scale retry backoff (2 ** attempts seconds) down to milliseconds
+    monkeypatch.setattr(recommendation_jobs.asyncio, "sleep", lambda delay: sleep(delay / 100))
+
+    async def scenario():
+        agent = ScriptedAgent(failures={"flaky": 1})
+        runner = RecommendationJobRunner(agent, session_factory=session_factory, concurrency=1)
+        runner._started = True
+        job_id = await add_job(session_factory, runner, ["flaky", "steady"])
+        await runner._run_job(job_id)
+        # "steady" ran while "flaky" was backing off
+        assert agent.calls == ["flaky", "steady", "flaky"]
+        assert await job_status(session_factory, job_id) == "done"
+
+    asyncio.run(scenario())
@@ -0,0 +1,60 @@
+import asyncio
+from db import DBConversation, DBHollandScores
+from model import CareerRecommendationsResponse, HollandScores
+from recommendation_snapshots import RecommendationPregenerator, load_assessment_scores, recommendation_fingerprint
+
+PROFILE = {"interests": ["Robotics", "coding in Python"], "skills": [], "personality_traits": [], "values": [], "education": "12th grade", "experience_level": "", "dislikes": []}
+HOLLAND = dict(realistic=4, investigative=5, artistic=2, social=3, enterprising=2, conventional=1)
+
+
+class CountingAgent:
+    def __init__(self):
+        self.scores = []
+
+    async def generate_recommendations(self, user_profile, hexaco_scores, holland_scores, fallback=True):
+        self.scores.append(holland_scores)
+        return CareerRecommendationsResponse(recommendations=[], additional_advice="ok", influence_breakdown={})
+
+
+def test_fingerprint_ignores_order_and_spelling_but_not_scores():
+    reordered = dict(PROFILE, interests=["python coding", "robotics"])
+    assert recommendation_fingerprint(PROFILE, None, None) == recommendation_fingerprint(reordered, None, None)
+    assert recommendation_fingerprint(PROFILE, None, None) != recommendation_fingerprint(dict(PROFILE, skills=["drawing"]), None, None)
+    changed = HollandScores(**dict(HOLLAND, artistic=5))
+    assert recommendation_fingerprint(PROFILE, None, HollandScores(**HOLLAND)) != recommendation_fingerprint(PROFILE, None, changed)
+
+
+def test_pregenerator_uses_current_database_scores(session_factory, conversation_id):
+    async def scenario():
+        async with session_factory() as db:
+            (await db.get(DBConversation, conversation_id)).user_profile = PROFILE
+            db.add(DBHollandScores(id="holland-1", user_id="user-1", **HOLLAND))
+            await db.commit()
+        agent = CountingAgent()
+        pregenerator = RecommendationPregenerator(agent, session_factory=session_factory, enabled=True, min_fields=2, delay=0)
+
+        await pregenerator._run(conversation_id)
+        async with session_factory() as db:
+            conversation = await db.get(DBConversation, conversation_id)
+            hexaco_scores, holland_scores = await load_assessment_scores(db, "user-1")
+        assert agent.scores == [HollandScores(**HOLLAND)]
+        assert conversation.recommendations_fingerprint == recommendation_fingerprint(PROFILE, hexaco_scores, holland_scores)
+
+        # Up to date: no model call
+        await pregenerator._run(conversation_id)
+        assert len(agent.scores) == 1
+
+        async with session_factory() as db:
+            (await db.get(DBHollandScores, "holland-1")).artistic = 5
+            await db.commit()
+        await pregenerator._run(conversation_id)
+        assert agent.scores[-1].artistic == 5
+
+    asyncio.run(scenario())
+
+
+def test_pregenerator_waits_for_a_complete_enough_profile(session_factory, conversation_id):
+    agent = CountingAgent()
+    pregenerator = RecommendationPregenerator(agent, session_factory=session_factory, enabled=True, min_fields=4, delay=0)
+    asyncio.run(pregenerator._run(conversation_id))
+    assert agent.scores == []
@@ -0,0 +1,62 @@
+import asyncio
+import pytest
+import main
+from db import DBStepDetailsCache
+from sqlalchemy import func, select
+
+CACHE_URL = "/roadmap/step-details/cache"
+
+
+@pytest.fixture
+def cached_steps(session_factory):
+    """Stores two steps in the shared cache; returns a function counting cache rows"""
+    cache = main.career_router.step_details_cache
+
+    async def store():
+        async with session_factory() as db:
+            for title in ["Learn SQL", "Learn Python"]:
+                await cache.get_or_generate(title, [], "Data analyst", db, lambda title=title: _payload(title))
+
+    async def count():
+        async with session_factory() as db:
+            return await db.scalar(select(func.count()).select_from(DBStepDetailsCache))
+
+    cache.memory.clear()
+    asyncio.run(store())
+    yield lambda: asyncio.run(count())
+    cache.memory.clear()
+
+
+async def _payload(title: str) -> dict:
+    return {"title": title}
+
+
+@pytest.mark.parametrize("admin_token, header", [("", None), ("", ""), ("secret", None), ("secret", "wrong")])
+def test_invalidation_needs_the_admin_token(api, cached_steps, monkeypatch, admin_token, header):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", admin_token)
+    headers = {} if header is None else {"X-Admin-Token": header}
+    response = api.delete(CACHE_URL, params={"all": "true"}, headers=headers)
+    assert response.status_code == 403
+    assert cached_steps() == 2
+
+
+@pytest.mark.parametrize("params", [{}, {"title": "Learn SQL"}, {"overall_goal": "Data analyst"}])
+def test_partial_keys_are_rejected_instead_of_clearing_everything(api, cached_steps, monkeypatch, params):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "secret")
+    response = api.delete(CACHE_URL, params=params, headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 400
+    assert cached_steps() == 2
+
+
+def test_one_step_or_everything_can_be_invalidated(api, cached_steps, monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "secret")
+    headers = {"X-Admin-Token": "secret"}
+    cache = main.career_router.step_details_cache
+
+    response = api.delete(CACHE_URL, params={"title": " learn sql", "overall_goal": "Data Analyst"}, headers=headers)
+    assert response.json()["removed"] == 1
+    assert (cached_steps(), len(cache.memory)) == (1, 1)
+
+    response = api.delete(CACHE_URL, params={"all": "true"}, headers=headers)
+    assert response.json()["removed"] == 1
+    assert (cached_steps(), len(cache.memory)) == (0, 0)
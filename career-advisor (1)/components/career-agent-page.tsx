@@ -64,6 +64,9 @@ export function CareerAgentPage() {
   const [currentConversationId, setCurrentConversationId] = useState<string | null>(null);
   const [conversations, setConversations] = useState<Conversation[]>([]);
   const [isLoadingConversations, setIsLoadingConversations] = useState(false);
+  // Cursor for the next page of conversations (X-Next-Cursor); null on the last page
+  const [conversationsCursor, setConversationsCursor] = useState<string | null>(null);
+  const [isLoadingMoreConversations, setIsLoadingMoreConversations] = useState(false);
   const [isGeneratingRecommendations, setIsGeneratingRecommendations] = useState(false);
   const [sidebarOpen, setSidebarOpen] = useState(true);
   const [isLoadingConversation, setIsLoadingConversation] = useState(false);
@@ -96,6 +99,7 @@ export function CareerAgentPage() {
       if (response.ok) {
         const data = await response.json()
         setConversations(data)
+        setConversationsCursor(response.headers.get("X-Next-Cursor"))
         // If no conversation is selected and we have conversations, select the most recent one
         if (!currentConversationId && data.length > 0) {
           loadConversation(data[0].id)
@@ -114,6 +118,32 @@ export function CareerAgentPage() {
     }
   }
 
+  const loadMoreConversations = async () => {
+    if (!conversationsCursor) return
+    setIsLoadingMoreConversations(true)
+    try {
+      const response = await fetch(
+        `${process.env.NEXT_PUBLIC_API_URL}/conversations?cursor=${encodeURIComponent(conversationsCursor)}`,
+        {
+          method: "GET",
+          headers: {
+            "Content-Type": "application/json",
+            Authorization: `Bearer ${localStorage.getItem("access_token")}`,
+          },
+        }
+      )
+      if (response.ok) {
+        const data: Conversation[] = await response.json()
+        setConversations((prev) => [...prev, ...data.filter((conv) => !prev.some((existing) => existing.id === conv.id))])
+        setConversationsCursor(response.headers.get("X-Next-Cursor"))
+      }
+    } catch (error) {
+      console.error("Error loading more conversations:", error)
+    } finally {
+      setIsLoadingMoreConversations(false)
+    }
+  }
+
   const [isCreatingNewChat, setIsCreatingNewChat] = useState(false);
 
   const createNewConversation = async () => {
@@ -528,6 +558,16 @@ export function CareerAgentPage() {
                 </button>
               ))
             )}
+            {!isLoadingConversations && conversationsCursor && (
+              <Button
+                variant="ghost"
+                className="w-full"
+                onClick={loadMoreConversations}
+                disabled={isLoadingMoreConversations}
+              >
+                {isLoadingMoreConversations ? <Loader2 className="w-4 h-4 animate-spin" /> : "Load more"}
+              </Button>
+            )}
           </div>
         </ScrollArea>
       </div>